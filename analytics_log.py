@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Append-only analytics event log with a sidecar offset index.
+analytics/analytics.json is one JSON array, so each tracked visit rewrites the
+whole file and any question about one page re-parses every event. Events now
+go to analytics/events.ndjson, one JSON object per line, so an append is a
+single write at the end of the file. A SQLite sidecar maps each event's byte
+offset and length to its page and timestamp. Readers memory-map the log and
+decode only the lines the index points to for a page and/or time range.
+
+The index is brought up to date from the last indexed byte whenever a log is
+opened, so lines appended by the Next.js route are picked up incrementally.
+A line that is not a JSON object (a torn write, say) is copied to
+<log>.rejected and skipped rather than failing every reader; an event with
+no usable timestamp is indexed at the time it was indexed.
+
+    python analytics_log.py --import                       # move analytics.json into the log
+    python analytics_log.py --page brooke --since 2025-08-01
+    python analytics_log.py --page brooke --referrers      # visits by referrer source
+    python analytics_log.py --benchmark 1000000
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+ANALYTICS_DIR = 'analytics'
+LEGACY_PATH = os.path.join(ANALYTICS_DIR, 'analytics.json')
+LOG_PATH = os.path.join(ANALYTICS_DIR, 'events.ndjson')
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    offset INTEGER PRIMARY KEY,
+    length INTEGER NOT NULL,
+    page TEXT NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_page_ts ON entries(page, ts);
+CREATE INDEX IF NOT EXISTS idx_entries_ts ON entries(ts);
+
+CREATE TABLE IF NOT EXISTS log_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    indexed_bytes INTEGER NOT NULL
+);
+"""
+
+
+def parse_timestamp(value):
+    """Epoch seconds for an event timestamp (ISO 8601 as written by the route) or a date argument."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def open_event_log(path=LOG_PATH, sync=True):
+    """Open the log and its index (<path>.idx), creating both if needed."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    open(path, 'ab').close()
+    index = sqlite3.connect(f'{path}.idx', timeout=30)
+    index.execute('PRAGMA journal_mode=WAL')
+    index.execute('PRAGMA synchronous=NORMAL')
+    index.executescript(INDEX_SCHEMA)
+    index.execute('INSERT OR IGNORE INTO log_state (id, indexed_bytes) VALUES (1, 0)')
+    index.commit()
+    log = {'path': path, 'index': index}
+    if sync:
+        sync_index(log)
+    return log
+
+
+def close_event_log(log):
+    log['index'].close()
+
+
+def _event_time(event, fallback):
+    """The event's timestamp in epoch seconds, or fallback when it is missing or unreadable."""
+    try:
+        return parse_timestamp(event['timestamp'])
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return fallback
+
+
+def _index_lines(log, data, start_offset):
+    """
+    Index the complete lines in data (bytes read from start_offset); returns how many were indexed.
+    Malformed lines are quarantined in <log>.rejected and skipped.
+    """
+    rows = []
+    rejected = []
+    indexed_at = time.time()
+    position = 0
+    while True:
+        end = data.find(b'\n', position)
+        if end == -1:
+            break  # A partial last line is left for the next sync
+        line = data[position:end]
+        if line.strip():
+            try:
+                event = json.loads(line)
+            except ValueError:  # JSONDecodeError and UnicodeDecodeError
+                event = None
+            if isinstance(event, dict):
+                rows.append((start_offset + position, end - position, str(event.get('page') or 'unknown'),
+                             _event_time(event, indexed_at)))
+            else:
+                rejected.append(f'{start_offset + position}\t'.encode() + line + b'\n')
+        position = end + 1
+    if rejected:
+        with open(f"{log['path']}.rejected", 'ab') as f:
+            f.write(b''.join(rejected))
+        print(f"   Skipped {len(rejected)} malformed lines (offsets and bytes in {log['path']}.rejected)")
+    with log['index']:
+        log['index'].executemany('INSERT OR REPLACE INTO entries (offset, length, page, ts) VALUES (?, ?, ?, ?)',
+                                 rows)
+        log['index'].execute('UPDATE log_state SET indexed_bytes = ? WHERE id = 1', (start_offset + position,))
+    return len(rows)
+
+
+def sync_index(log):
+    """Index lines appended since the last sync (by this process or another writer). Returns how many."""
+    indexed_bytes = log['index'].execute('SELECT indexed_bytes FROM log_state WHERE id = 1').fetchone()[0]
+    size = os.path.getsize(log['path'])
+    if size < indexed_bytes:
+        raise ValueError(f"{log['path']} is shorter than its index; delete {log['path']}.idx to rebuild it")
+    if size == indexed_bytes:
+        return 0
+    with open(log['path'], 'rb') as f:
+        f.seek(indexed_bytes)
+        return _index_lines(log, f.read(size - indexed_bytes), indexed_bytes)
+
+
+def encode_event(event):
+    return json.dumps(event, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def append_events(log, events):
+    """
+    Append events at the end of the log in one write, then index everything new
+    in the file. Other writers (the Next.js route's appendFileSync) may append
+    at any moment, so offsets come from the sync, never from tell() before the
+    write. Returns how many lines were indexed, other writers' included.
+    """
+    data = b''.join(encode_event(event) for event in events)
+    if not data:
+        return 0
+    with open(log['path'], 'ab') as f:
+        f.write(data)
+    return sync_index(log)
+
+
+def append_event(log, event):
+    return append_events(log, [event])
+
+
+def _entry_query(page=None, since=None, until=None):
+    clauses, params = [], []
+    if page is not None:
+        clauses.append('page = ?')
+        params.append(page)
+    if since is not None:
+        clauses.append('ts >= ?')
+        params.append(parse_timestamp(since))
+    if until is not None:
+        clauses.append('ts < ?')
+        params.append(parse_timestamp(until))
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+    return where, params
+
+
+def read_events(log, page=None, since=None, until=None):
+    """Events for a page and/or [since, until) time range, in log order; only their bytes are decoded."""
+    where, params = _entry_query(page, since, until)
+    entries = log['index'].execute(f'SELECT offset, length FROM entries{where} ORDER BY offset', params).fetchall()
+    if not entries:
+        return []
+    with open(log['path'], 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return [json.loads(mapped[offset:offset + length]) for offset, length in entries]
+
+
+def count_events(log, page=None, since=None, until=None):
+    """Event count from the index alone."""
+    where, params = _entry_query(page, since, until)
+    return log['index'].execute(f'SELECT COUNT(*) FROM entries{where}', params).fetchone()[0]
+
+
+def page_counts(log):
+    return dict(log['index'].execute('SELECT page, COUNT(*) FROM entries GROUP BY page ORDER BY COUNT(*) DESC'))
+
+
+def import_legacy_json(log, legacy_path=LEGACY_PATH, keep=False):
+    """
+    Append every event from the old JSON array to the log. Unless keep is set the
+    array is renamed to analytics.imported.json so its events are not counted twice.
+    """
+    try:
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            events = json.load(f)
+    except FileNotFoundError:
+        print(f"   No legacy file at {legacy_path}")
+        return 0
+    append_events(log, events)
+    if not keep:
+        os.replace(legacy_path, os.path.join(os.path.dirname(legacy_path), 'analytics.imported.json'))
+    return len(events)
+
+
+def _synthetic_events(count, pages=50, days=90):
+    """Events shaped like the route's output, spread over pages and days."""
+    rng = random.Random(1)
+    start = time.time() - days * 86400
+    referrers = [('', 'Direct or unknown'), ('https://l.instagram.com/', 'Instagram'),
+                 ('https://www.tiktok.com/', 'TikTok'), ('https://t.co/abc', 'https://t.co/abc')]
+    for i in range(count):
+        referrer, readable = rng.choice(referrers)
+        stamp = datetime.fromtimestamp(start + i * days * 86400 / count, timezone.utc)
+        page = f'page{rng.randrange(pages)}'
+        yield {'page': page, 'referrer': referrer, 'readableReferrer': readable,
+               'userAgent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 Instagram',
+               'ip': f'10.0.{i % 256}.{i // 256 % 256}', 'timestamp': stamp.isoformat().replace('+00:00', 'Z'),
+               'pathname': f'/{page}', 'searchParams': ''}
+
+
+def benchmark_event_log(count=1000000, directory='analytics_bench'):
+    """One page's events for one week: full JSON array parse vs indexed mmap read, plus append cost."""
+    print("ANALYTICS LOG BENCHMARK")
+    print("=" * 60)
+    os.makedirs(directory, exist_ok=True)
+    legacy_path = os.path.join(directory, 'analytics.json')
+    log_path = os.path.join(directory, 'events.ndjson')
+    for path in (legacy_path, log_path, f'{log_path}.idx'):
+        if os.path.exists(path):
+            os.remove(path)
+
+    events = list(_synthetic_events(count))
+    with open(legacy_path, 'w', encoding='utf-8') as f:
+        json.dump(events, f, indent=2)
+    start_time = time.perf_counter()
+    log = open_event_log(log_path)
+    append_events(log, events)
+    build_time = time.perf_counter() - start_time
+    print(f"Events: {count:,} ({os.path.getsize(legacy_path) / 1048576:.0f} MiB as a JSON array, "
+          f"{os.path.getsize(log_path) / 1048576:.0f} MiB as NDJSON; log + index built in {build_time:.1f}s)")
+
+    page = events[0]['page']
+    since = events[count // 2]['timestamp']
+    until = datetime.fromtimestamp(parse_timestamp(since) + 7 * 86400, timezone.utc).isoformat()
+
+    start_time = time.perf_counter()
+    with open(legacy_path, 'r', encoding='utf-8') as f:
+        selected = [event for event in json.load(f) if event['page'] == page
+                    and parse_timestamp(since) <= parse_timestamp(event['timestamp']) < parse_timestamp(until)]
+    array_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    from_log = read_events(log, page=page, since=since, until=until)
+    log_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for event in _synthetic_events(100):
+        append_event(log, event)
+    append_time = (time.perf_counter() - start_time) / 100
+
+    print(f"   /{page}, one week ({len(selected)} events):")
+    print(f"      JSON array:  {array_time * 1000:10.1f} ms (whole file parsed)")
+    print(f"      Indexed log: {log_time * 1000:10.1f} ms ({sum(len(encode_event(e)) for e in from_log):,} bytes read)")
+    print(f"   Append one event: {append_time * 1000:.2f} ms (rewriting the JSON array costs about "
+          f"{array_time * 1000:.0f} ms to parse plus the write)")
+    print(f"   Same events: {'yes' if from_log == selected else 'NO'}")
+    close_event_log(log)
+    return {'array_read': array_time, 'log_read': log_time, 'append': append_time}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append-only analytics event log with an offset index.")
+    parser.add_argument('--log', default=LOG_PATH, help="event log path")
+    parser.add_argument('--import', dest='import_legacy', action='store_true',
+                        help=f"append the events from {LEGACY_PATH} and rename it")
+    parser.add_argument('--keep', action='store_true', help="with --import, leave the JSON array in place")
+    parser.add_argument('--page', help="only this page")
+    parser.add_argument('--since', help="ISO date/time, inclusive")
+    parser.add_argument('--until', help="ISO date/time, exclusive")
+    parser.add_argument('--referrers', action='store_true', help="count the selected events by referrer source")
+    parser.add_argument('--benchmark', type=int, metavar='EVENTS', help="compare against the JSON array")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_event_log(args.benchmark)
+    else:
+        log = open_event_log(args.log)
+        if args.import_legacy:
+            print(f"[SAVE] Imported {import_legacy_json(log, keep=args.keep)} events into: {args.log}")
+        if args.referrers:
+            from referrer_canon import referrer_counts
+            counts = referrer_counts(read_events(log, args.page, args.since, args.until))
+            print(f"\nREFERRER SOURCES:")
+            for source, count in sorted(counts.items(), key=lambda item: -item[1]):
+                print(f"   {source}: {count}")
+        elif args.page or args.since or args.until:
+            for event in read_events(log, args.page, args.since, args.until):
+                print(f"   {event.get('timestamp', '?')}  /{event.get('page') or 'unknown':<20} "
+                      f"{event.get('readableReferrer', '')}")
+        print(f"\nEVENTS BY PAGE ({count_events(log)} total):")
+        for page, count in page_counts(log).items():
+            print(f"   /{page}: {count}")
+        close_event_log(log)
@@ -5,19 +5,30 @@ import path from "path";
 export async function GET(req: NextRequest) {
   try {
     const analyticsDir = path.join(process.cwd(), 'analytics');
-    const filePath = path.join(analyticsDir, 'analytics.json');
+    const analyticsData: unknown[] = [];
     
-    // Check if analytics file exists
+    // Events not yet moved into the log by `python analytics_log.py --import`
     try {
-      await fs.access(filePath);
+      const legacyContent = await fs.readFile(path.join(analyticsDir, 'analytics.json'), 'utf8');
+      analyticsData.push(...JSON.parse(legacyContent));
     } catch {
-      // File doesn't exist, return empty array
-      return NextResponse.json([]);
+      // No legacy file
     }
     
-    // Read and parse the analytics data
-    const fileContent = await fs.readFile(filePath, 'utf8');
-    const analyticsData = JSON.parse(fileContent);
+    // Append-only log: one JSON event per line; a partly written last line is skipped
+    try {
+      const logContent = await fs.readFile(path.join(analyticsDir, 'events.ndjson'), 'utf8');
+      for (const line of logContent.split("\n")) {
+        if (!line.trim()) continue;
+        try {
+          analyticsData.push(JSON.parse(line));
+        } catch {
+          // Incomplete line from a concurrent append
+        }
+      }
+    } catch {
+      // No events logged yet
+    }
     
     return NextResponse.json(analyticsData);
   } catch (error) {
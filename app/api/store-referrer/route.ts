@@ -101,16 +101,10 @@ export async function POST(req: NextRequest) {
       fs.mkdirSync(analyticsDir, { recursive: true });
     }
     
-    const filePath = path.join(analyticsDir, 'analytics.json');
-    let existingData = [];
-    
-    if (fs.existsSync(filePath)) {
-      const fileContent = fs.readFileSync(filePath, 'utf8');
-      existingData = JSON.parse(fileContent);
-    }
-    
-    existingData.push(analyticsData);
-    fs.writeFileSync(filePath, JSON.stringify(existingData, null, 2));
+    // One JSON object per line: appending never rewrites earlier events.
+    // analytics_log.py indexes new lines by page and time when it opens the log.
+    const filePath = path.join(analyticsDir, 'events.ndjson');
+    fs.appendFileSync(filePath, JSON.stringify(analyticsData) + "\n");
 
     return NextResponse.json({ success: true, data: analyticsData });
   } catch (error) {
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Asset availability checker for crawl results.
+Image URLs are collected across every crawled page and deduplicated (Next.js
+/_next/image proxy URLs are unwrapped to the image they serve), so the
+verified badge and OnlyFans logo that appear on nearly every creator page
+are checked once. Each unique asset gets one HEAD request under the per-host
+rate controller; results are cached for a TTL and revalidated afterwards with
+If-None-Match / If-Modified-Since. Each page's images then get the result
+for their asset, so a broken preview shows up on every page that uses it.
+
+    python asset_checker.py [crawled_data.json]
+"""
+
+import json
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urljoin, urlsplit
+
+import requests
+
+from fetcher import make_session
+from rate_control import fetch_with_retry, new_rate_controller, print_controller_summary, run_controlled
+
+DEFAULT_CACHE_PATH = 'asset_cache.json'
+DEFAULT_TTL_SECONDS = 6 * 3600
+OK_STATUS_CODES = {200, 206, 304}
+
+
+def asset_url(src, page_url):
+    """Absolute URL of the asset an <img src> loads, unwrapping Next.js image proxy URLs."""
+    url = urljoin(page_url, src)
+    parts = urlsplit(url)
+    if parts.path == '/_next/image':
+        wrapped = parse_qs(parts.query).get('url')
+        if wrapped:
+            url = urljoin(page_url, wrapped[0])
+    return url.split('#')[0]
+
+
+def collect_assets(pages):
+    """Map each unique asset URL to the (page, image) pairs that reference it."""
+    assets = {}
+    for page in pages:
+        for image in page.get('images', []):
+            if not image.get('src') or image['src'].startswith('data:'):
+                continue
+            assets.setdefault(asset_url(image['src'], page['url']), []).append((page, image))
+    return assets
+
+
+def load_asset_cache(path=DEFAULT_CACHE_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_asset_cache(cache, path=DEFAULT_CACHE_PATH):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def head_asset(url, session=None, headers=None, timeout=15):
+    """
+    HEAD an asset, falling back to a one-byte ranged GET where HEAD is not allowed.
+    Returns a fetch_page-shaped dict (without a body) so it can go through fetch_with_retry.
+    """
+    session = session or make_session()
+    result = {'url': url, 'final_url': url, 'status_code': None, 'headers': {}, 'elapsed': 0.0, 'error': None}
+    start_time = time.time()
+    try:
+        response = session.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+        if response.status_code in (405, 501):
+            response = session.get(url, headers=dict(headers or {}, Range='bytes=0-0'), timeout=timeout, stream=True)
+            response.close()
+        result['final_url'] = response.url
+        result['status_code'] = response.status_code
+        result['headers'] = dict(response.headers)
+    except requests.exceptions.RequestException as e:
+        result['error'] = str(e)
+    result['elapsed'] = time.time() - start_time
+    return result
+
+
+def _conditional_headers(cached):
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+    return headers or None
+
+
+def _check_result(fetched, cached):
+    """Cache entry for a HEAD result; a 304 keeps the cached metadata."""
+    if fetched['status_code'] == 304 and cached:
+        return dict(cached, checked_at=time.time(), revalidated=True)
+    headers = fetched['headers']
+    return {
+        'ok': fetched['error'] is None and fetched['status_code'] in OK_STATUS_CODES,
+        'status_code': fetched['status_code'],
+        'error': fetched['error'],
+        'final_url': fetched['final_url'],
+        'content_type': headers.get('Content-Type'),
+        'content_length': int(headers['Content-Length']) if headers.get('Content-Length', '').isdigit() else None,
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'checked_at': time.time(),
+        'revalidated': False
+    }
+
+
+def check_assets(pages, session=None, controller=None, cache_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL_SECONDS):
+    """
+    Check every unique image asset referenced by pages (crawl result dicts) and
+    attach the result to each image as image['asset']. Returns a summary dict.
+    """
+    session = session or make_session()
+    controller = controller or new_rate_controller()
+    cache = load_asset_cache(cache_path)
+    assets = collect_assets(pages)
+
+    now = time.time()
+    stale = [url for url in assets if url not in cache or now - cache[url]['checked_at'] > ttl]
+
+    def check(url):
+        cached = cache.get(url)
+        # Assets that were broken last time are re-checked in full rather than revalidated
+        conditional = _conditional_headers(cached) if cached and cached['ok'] else None
+        fetched = fetch_with_retry(url, controller, session=session, headers=conditional, max_retries=2,
+                                   fetch=head_asset)
+        return url, _check_result(fetched, cached)
+
+    for url, result in run_controlled(stale, check, controller):
+        cache[url] = result
+    save_asset_cache(cache, cache_path)
+
+    broken = {}
+    for url, references in assets.items():
+        for page, image in references:
+            image['asset'] = {key: cache[url][key] for key in ('ok', 'status_code', 'content_type', 'checked_at')}
+        if not cache[url]['ok']:
+            broken[url] = sorted({page['url'] for page, _ in references})
+
+    return {
+        'image_references': sum(len(references) for references in assets.values()),
+        'unique_assets': len(assets),
+        'requests': len(stale),
+        'cache_hits': len(assets) - len(stale),
+        'revalidated': sum(1 for url in stale if cache[url].get('revalidated')),
+        'broken': broken
+    }
+
+
+def print_asset_summary(summary):
+    print(f"\nASSET CHECK:")
+    print(f"   Image references: {summary['image_references']}")
+    print(f"   Unique assets: {summary['unique_assets']} "
+          f"({summary['requests']} checked, {summary['cache_hits']} from cache, "
+          f"{summary['revalidated']} revalidated unchanged)")
+    if summary['broken']:
+        print(f"   Broken assets: {len(summary['broken'])}")
+        for url, page_urls in summary['broken'].items():
+            print(f"      {url[:80]}{'...' if len(url) > 80 else ''}")
+            print(f"         used on {len(page_urls)} pages: {', '.join(page_urls[:5])}")
+    else:
+        print(f"   Broken assets: none")
+
+
+if __name__ == "__main__":
+    data_path = sys.argv[1] if len(sys.argv) > 1 else 'crawled_data.json'
+    with open(data_path, 'r', encoding='utf-8') as f:
+        pages = json.load(f)
+
+    print("ASSET AVAILABILITY CHECK")
+    print("=" * 60)
+    controller = new_rate_controller()
+    summary = check_assets(pages, controller=controller)
+    print_asset_summary(summary)
+    print_controller_summary(controller)
+
+    with open(data_path, 'w', encoding='utf-8') as f:
+        json.dump(pages, f, indent=2, ensure_ascii=False)
+    print(f"\n[SAVE] Asset results attached to images in: {data_path}")
+    print(f"[SAVE] Asset cache: {DEFAULT_CACHE_PATH}")
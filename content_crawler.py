@@ -4,18 +4,43 @@ Enhanced Python script to crawl rachel links and extract visible content/data.
 This script will parse HTML and show what data is actually accessible.
 """
 
-import requests
-import time
 from bs4 import BeautifulSoup
 import json
 import re
+from pattern_engine import compile_pattern_set, scan_document
+from fetcher import BASE_URL, USER_AGENT, available_content_encodings, fetch_page, make_session
+from request_timing import flush_phase_hooks, format_phases, timed_phase, write_prometheus
+from profiling import finish_profile_run, new_profile_run, profile_page
+from results_store import finish_run, open_store, record_extraction, record_fetch, start_run
+from script_cache import format_index_stats, load_script_index, save_script_index, script_analysis
+from rate_control import PACING_INTERVAL, fetch_with_retry, new_rate_controller, print_controller_summary
+from crawl_journal import (close_journal, is_completed, journal_done, journal_failed, journal_start, open_journal,
+                           print_resume_summary)
+from crawl_frontier import (DEFAULT_MAX_DEPTH, DEFAULT_MAX_PAGES, close_frontier, format_frontier_stats, frontier_add,
+                            frontier_next, new_frontier, site_graph)
+from asset_checker import check_assets, print_asset_summary
+from extraction_records import new_intern_table, page_from_dict, page_to_dict
+from urllib.parse import urlsplit
 
 # Configuration
-BASE_URL = "https://www.viewit.bio"
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
+JOURNAL_PATH = "content_crawler.journal"
 
-def extract_content_data(html_content, url):
-    """Extract meaningful content from HTML."""
+# Analytics tracking patterns, compiled once
+ANALYTICS_PATTERNS = compile_pattern_set([
+    r'/api/track',
+    r'analytics',
+    r'tracking',
+    r'click_type',
+    r'fetch\s*\(\s*["\']/api/'
+])
+
+def fetch_for_parse(url, session=None, headers=None):
+    """fetch_page whose phase hooks wait until extract_content_data has added the parse time."""
+    return fetch_page(url, session=session, headers=headers, parse_follows=True)
+
+@timed_phase('parse')
+def extract_content_data(html_content, url, script_index=None):
+    """Extract meaningful content from HTML. Scripts not yet in script_index are counted as new."""
     soup = BeautifulSoup(html_content, 'html.parser')
     
     data = {
@@ -28,6 +53,8 @@ def extract_content_data(html_content, url):
         'text_content': [],
         'meta_data': {},
         'scripts': [],
+        'script_fingerprints': [],
+        'new_scripts': 0,
         'has_loading_screen': False,
         'has_bot_detection': False,
         'obfuscated_urls': [],
@@ -121,38 +148,42 @@ def extract_content_data(html_content, url):
         matches = re.findall(pattern, html_content)
         data['obfuscated_urls'].extend(matches)
     
-    # Extract script content
+    # Extract script content; scripts already in the index reuse their stored analysis
     script_tags = soup.find_all('script')
     for script in script_tags:
-        script_content = script.get_text().strip()
-        if script_content:
-            data['scripts'].append(script_content[:200] + '...' if len(script_content) > 200 else script_content)
+        fingerprint, analysis, is_new = script_analysis(script_index, script)
+        if fingerprint is None:
+            continue
+        data['script_fingerprints'].append(fingerprint)
+        data['new_scripts'] += is_new
+        if analysis['kind'] != 'external':
+            data['scripts'].append(analysis['preview'])
     
     # Look for analytics tracking
-    analytics_patterns = [
-        r'/api/track',
-        r'analytics',
-        r'tracking',
-        r'click_type',
-        r'fetch\s*\(\s*["\']/api/'
-    ]
-    
-    for pattern in analytics_patterns:
-        matches = re.findall(pattern, html_content, re.IGNORECASE)
-        data['analytics_tracking'].extend(matches)
+    analytics_matches = scan_document(ANALYTICS_PATTERNS, html_content, sample_limit=None)
+    for entry in analytics_matches.values():
+        data['analytics_tracking'].extend(entry['samples'])
     
     return data
 
-def crawl_rachel_links():
-    """Crawl rachel links and extract content data."""
+def crawl_rachel_links(profile=False, resume=False, follow_links=False, max_depth=DEFAULT_MAX_DEPTH,
+                       max_pages=DEFAULT_MAX_PAGES, check_images=False):
+    """
+    Crawl rachel links and extract content data. With profile=True each page's extract is profiled.
+    Progress is journaled; resume=True skips pages a previous, interrupted run already finished.
+    With follow_links=True on-site links are crawled too, up to max_depth hops and max_pages pages.
+    With check_images=True every distinct image across the crawl is checked once afterwards.
+    """
     
     endpoints = ["/rachel", "/rachelirl", "/rachsotiny"]
+    frontier = new_frontier([f"{BASE_URL}{endpoint}" for endpoint in endpoints],
+                            max_depth=max_depth if follow_links else 0, max_pages=max_pages)
     
     headers = {
         'User-Agent': USER_AGENT,
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate',
+        'Accept-Encoding': ', '.join(available_content_encodings()),
         'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1',
     }
@@ -162,26 +193,65 @@ def crawl_rachel_links():
     print(f"User-Agent: {USER_AGENT}")
     print("=" * 60)
     
-    all_results = []
+    all_results = []  # Compact PageRecords until the crawl is saved
+    strings = new_intern_table()
+    timed_requests = []
+    session = make_session(headers)
+    profile_run = new_profile_run() if profile else None
+    script_index = load_script_index()
+    controller = new_rate_controller(pacing=PACING_INTERVAL)  # Pages are fetched one at a time
+    store = open_store()
+    run_id = start_run(store, 'content_crawler', {'endpoints': endpoints, 'profile': profile, 'resume': resume,
+                                                  'follow_links': follow_links})
+    journal = open_journal(JOURNAL_PATH, resume=resume)
+    if resume:
+        print_resume_summary(journal, [f"{BASE_URL}{endpoint}" for endpoint in endpoints])
     
-    for endpoint in endpoints:
-        url = f"{BASE_URL}{endpoint}"
+    while True:
+        next_page = frontier_next(frontier)
+        if next_page is None:
+            break
+        url, depth = next_page
+        endpoint = urlsplit(url).path
+        if is_completed(journal, url):
+            content_data = journal['completed'][url]
+            all_results.append(page_from_dict(content_data, strings))
+            timed_requests.append((url, content_data['timing']))
+            for btn in content_data['buttons']:
+                frontier_add(frontier, btn['href'], depth + 1, url)
+            print(f"\nSkipping (already crawled): {url}")
+            continue
+        
         print(f"\nCrawling: {url}")
         print("-" * 40)
         
-        try:
-            start_time = time.time()
-            response = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
-            end_time = time.time()
-            
-            print(f"Status: {response.status_code}")
-            print(f"Response Time: {end_time - start_time:.2f}s")
-            print(f"Content Length: {len(response.content):,} bytes")
+        journal_start(journal, url)
+        fetched = fetch_with_retry(url, controller, session=session, fetch=fetch_for_parse)
+        timed_requests.append((url, fetched['phases']))
+        fetch_id = record_fetch(store, run_id, fetched)
+        
+        if fetched['error']:
+            print(f"ERROR: Request failed: {fetched['error']}")
+            journal_failed(journal, url, fetched['error'])
+        else:
+            print(f"Status: {fetched['status_code']}")
+            print(f"Response Time: {fetched['elapsed']:.2f}s")
+            print(f"Content Length: {len(fetched['content']):,} bytes")
             
-            if response.status_code == 200:
-                # Extract content data
-                content_data = extract_content_data(response.text, url)
-                all_results.append(content_data)
+            if fetched['status_code'] == 200:
+                # Extract content data (parse time lands in the same timing record)
+                if profile_run is not None:
+                    content_data = profile_page(profile_run, endpoint, extract_content_data, fetched['text'], url,
+                                                script_index)
+                else:
+                    content_data = extract_content_data(fetched['text'], url, script_index)
+                content_data['timing'] = fetched['phases']
+                all_results.append(page_from_dict(content_data, strings))
+                record_extraction(store, run_id, content_data, fetch_id=fetch_id)
+                for btn in content_data['buttons']:
+                    frontier_add(frontier, btn['href'], depth + 1, url)
+                journal_done(journal, url, content_data)
+                print(f"Phases: {format_phases(fetched['phases'])}")
                 
                 # Display extracted data
                 print(f"\nEXTRACTED DATA:")
@@ -191,7 +261,8 @@ def crawl_rachel_links():
                 print(f"   Images Found: {len(content_data['images'])}")
                 print(f"   Buttons/Links: {len(content_data['buttons'])}")
                 print(f"   Text Elements: {len(content_data['text_content'])}")
-                print(f"   Scripts: {len(content_data['scripts'])}")
+                print(f"   Scripts: {len(content_data['scripts'])} inline, "
+                      f"{content_data['new_scripts']}/{len(content_data['script_fingerprints'])} not seen before")
                 
                 # Show key text content
                 if content_data['text_content']:
@@ -238,37 +309,64 @@ def crawl_rachel_links():
                 # Save detailed response
                 filename = f"crawled_{endpoint.replace('/', '_')}.html"
                 with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(response.text)
+                    f.write(fetched['text'])
                 print(f"\n[SAVE] Full HTML saved to: {filename}")
                 
             else:
                 print(f"ERROR: Failed to load page")
-                
-        except requests.exceptions.RequestException as e:
-            print(f"ERROR: Request failed: {e}")
+                journal_failed(journal, url, f"status {fetched['status_code']}")
         
         print("\n" + "="*60)
-        time.sleep(2)  # Delay between requests
+    
+    flush_phase_hooks()  # The last page may not have been parsed
+    close_journal(journal)
+    save_script_index(script_index)
+    pages = [page_to_dict(record) for record in all_results]
+    asset_summary = check_assets(pages, session=session, controller=controller) if check_images else None
     
     # Save all results to JSON
     with open('crawled_data.json', 'w', encoding='utf-8') as f:
-        json.dump(all_results, f, indent=2, ensure_ascii=False)
+        json.dump(pages, f, indent=2, ensure_ascii=False)
+    
+    write_prometheus(timed_requests, 'crawl_timings.prom')
+    if follow_links:
+        with open('crawl_graph.json', 'w', encoding='utf-8') as f:
+            json.dump(site_graph(frontier), f, indent=2)
+    finish_run(store, run_id)
     
     print(f"\nSUMMARY:")
     print(f"   Total pages crawled: {len(all_results)}")
     print(f"   Successful crawls: {len([r for r in all_results if r])}")
     print(f"   Data saved to: crawled_data.json")
+    print(f"   Phase timings saved to: crawl_timings.prom")
+    print(f"   Script index: {format_index_stats(script_index)}")
+    if follow_links:
+        print(f"   Frontier: {format_frontier_stats(frontier)}")
+        print(f"   Site graph saved to: crawl_graph.json")
+    close_frontier(frontier)
+    print_controller_summary(controller)
+    if asset_summary is not None:
+        print_asset_summary(asset_summary)
+    print(f"   Run {run_id} stored in: results.db")
+    
+    if profile_run is not None:
+        finish_profile_run(profile_run)
     
-    return all_results
+    return pages
 
 if __name__ == "__main__":
-    # Install required packages if not available
-    try:
-        import bs4
-    except ImportError:
-        print("Installing BeautifulSoup4...")
-        import subprocess
-        subprocess.check_call(['pip', 'install', 'beautifulsoup4'])
-        import bs4
+    import argparse
+    parser = argparse.ArgumentParser(description="Crawl rachel links and extract content data.")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile each page's parse/extract and write reports to profiles/")
+    parser.add_argument('--resume', action='store_true',
+                        help=f"skip pages already crawled by an interrupted run (from {JOURNAL_PATH})")
+    parser.add_argument('--follow-links', action='store_true', help="also crawl on-site links found on each page")
+    parser.add_argument('--max-depth', type=int, default=DEFAULT_MAX_DEPTH, help="link hops from the start pages")
+    parser.add_argument('--max-pages', type=int, default=DEFAULT_MAX_PAGES, help="stop after this many pages")
+    parser.add_argument('--check-assets', action='store_true',
+                        help="check every distinct image once after the crawl and attach the results")
+    args = parser.parse_args()
     
-    crawl_rachel_links()
+    crawl_rachel_links(profile=args.profile, resume=args.resume, follow_links=args.follow_links,
+                       max_depth=args.max_depth, max_pages=args.max_pages, check_images=args.check_assets)
@@ -0,0 +1,226 @@
+"""
+Link-following crawl frontier.
+Links found on crawled pages are canonicalized (lowercase scheme and host,
+default ports, host aliases, trailing slash, fragments, tracking parameters,
+query order) so aliases of one page collapse to a single URL, then queued
+breadth-first within depth, page-count and host scope limits. On the crawled
+hosts /p/<slug>, which the Next.js middleware serves /<slug> from, collapses
+to /<slug>. Out-of-scope links are kept as graph edges but never fetched.
+
+The seen-set is a Bloom filter in memory backed by an exact SQLite table on
+disk (a temporary file unless a path is given, so only SQLite's small page
+cache stays in memory): URLs the filter has never seen (nearly all new ones)
+skip the table lookup, and the filter's rare false positives are settled
+exactly by the table, so no page is wrongly skipped. The link graph (each
+distinct edge as a pair of canonical URLs) and the out-of-scope URLs live in
+the same database, so nothing that grows with the site is held in memory.
+"""
+
+import hashlib
+import math
+import sqlite3
+from collections import deque
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+DEFAULT_CAPACITY = 100000
+DEFAULT_ERROR_RATE = 0.001
+DEFAULT_MAX_DEPTH = 3
+DEFAULT_MAX_PAGES = 500
+
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'igshid', 'ttclid', 'twclid', 'mc_cid', 'mc_eid',
+                   '_ga', '_gl', 'ref', 'ref_src'}
+TRACKING_PREFIXES = ('utm_',)
+FOLLOWED_SCHEMES = {'http', 'https'}
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Bare-domain and www links reach the same pages
+HOST_ALIASES = {'viewit.bio': 'www.viewit.bio'}
+
+# Next.js middleware serves /<slug> from <prefix><slug>, so both URLs are the same page
+REWRITE_PREFIXES = ('/p/',)
+
+
+def canonicalize_url(url, base_url=None, host_aliases=HOST_ALIASES):
+    """
+    Canonical absolute form of a link, or None for links that are not pages
+    (mailto:, tel:, javascript:, bare fragments). Path case is kept: Next.js
+    routes are case-sensitive (/Blondestud69).
+    """
+    url = (url or '').strip()
+    if not url or url.startswith('#'):
+        return None
+    if base_url:
+        url = urljoin(base_url, url)
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in FOLLOWED_SCHEMES or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower().rstrip('.')
+    host = host_aliases.get(host, host)
+    netloc = host if parts.port in (None, DEFAULT_PORTS[scheme]) else f'{host}:{parts.port}'
+
+    path = parts.path or '/'
+    while '//' in path:
+        path = path.replace('//', '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)]
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ''))
+
+
+def collapse_rewrites(url, prefixes=REWRITE_PREFIXES):
+    """/p/<slug> -> /<slug> for a canonical URL on the crawled site; other URLs unchanged."""
+    parts = urlsplit(url)
+    for prefix in prefixes:
+        rest = parts.path[len(prefix):]
+        if parts.path.startswith(prefix) and rest and '/' not in rest:
+            return urlunsplit(parts._replace(path='/' + rest))
+    return url
+
+
+def new_bloom(capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+    """Bloom filter sized for capacity items at the given false-positive rate."""
+    bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+    return {
+        'bits': bytearray((bits + 7) // 8),
+        'size': bits,
+        'hashes': max(1, round(bits / capacity * math.log(2))),
+        'count': 0
+    }
+
+
+def _bloom_positions(bloom, item):
+    # Double hashing: k positions from the two halves of one digest
+    digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], 'little')
+    second = int.from_bytes(digest[8:], 'little') | 1
+    return [(first + i * second) % bloom['size'] for i in range(bloom['hashes'])]
+
+
+def bloom_add(bloom, item):
+    for position in _bloom_positions(bloom, item):
+        bloom['bits'][position >> 3] |= 1 << (position & 7)
+    bloom['count'] += 1
+
+
+def bloom_contains(bloom, item):
+    """False means never added; True means probably added."""
+    return all(bloom['bits'][position >> 3] & (1 << (position & 7)) for position in _bloom_positions(bloom, item))
+
+
+def new_seen_set(capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE, path=''):
+    """
+    Bloom filter plus exact table. The default path '' is SQLite's private
+    temporary on-disk database, deleted when the connection closes.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY) WITHOUT ROWID')
+    conn.execute('CREATE TABLE IF NOT EXISTS edges (source TEXT, target TEXT, PRIMARY KEY (source, target)) '
+                 'WITHOUT ROWID')
+    conn.execute('CREATE TABLE IF NOT EXISTS out_of_scope (url TEXT PRIMARY KEY) WITHOUT ROWID')
+    return {'bloom': new_bloom(capacity, error_rate), 'conn': conn, 'exact_lookups': 0, 'false_positives': 0}
+
+
+def seen_add(seen, url):
+    """Add url; returns True if it was new."""
+    if bloom_contains(seen['bloom'], url):
+        seen['exact_lookups'] += 1
+        if seen['conn'].execute('SELECT 1 FROM seen WHERE url = ?', (url,)).fetchone():
+            return False
+        seen['false_positives'] += 1
+    bloom_add(seen['bloom'], url)
+    seen['conn'].execute('INSERT INTO seen (url) VALUES (?)', (url,))
+    return True
+
+
+def new_frontier(seeds, scope_hosts=None, max_depth=DEFAULT_MAX_DEPTH, max_pages=DEFAULT_MAX_PAGES,
+                 capacity=DEFAULT_CAPACITY, seen_path=''):
+    """
+    Frontier seeded with start URLs. scope_hosts limits which hosts are fetched
+    (default: the seeds' hosts).
+    """
+    canonical_seeds = [url for url in (canonicalize_url(seed) for seed in seeds) if url]
+    scope = set(scope_hosts or (urlsplit(url).netloc for url in canonical_seeds))
+    canonical_seeds = [_collapse_in_scope(url, scope) for url in canonical_seeds]
+    frontier = {
+        'queue': deque(),
+        'seen': new_seen_set(capacity, path=seen_path),
+        'scope_hosts': scope,
+        'max_depth': max_depth,
+        'max_pages': max_pages,
+        'dequeued': 0,
+        'aliases': 0,
+        'out_of_scope': 0,
+        'too_deep': 0
+    }
+    for url in canonical_seeds:
+        if seen_add(frontier['seen'], url):
+            frontier['queue'].append((url, 0))
+    return frontier
+
+
+def _collapse_in_scope(url, scope_hosts):
+    return collapse_rewrites(url) if urlsplit(url).netloc in scope_hosts else url
+
+
+def frontier_add(frontier, href, depth, parent_url):
+    """Queue a link found on parent_url at the given depth. Returns the canonical URL or None."""
+    url = canonicalize_url(href, parent_url)
+    if url is None:
+        return None
+    in_scope = urlsplit(url).netloc in frontier['scope_hosts']
+    if in_scope:
+        url = collapse_rewrites(url)
+    source = canonicalize_url(parent_url)
+    conn = frontier['seen']['conn']
+    conn.execute('INSERT OR IGNORE INTO edges (source, target) VALUES (?, ?)',
+                 (_collapse_in_scope(source, frontier['scope_hosts']) if source else parent_url, url))
+
+    if not in_scope:
+        frontier['out_of_scope'] += conn.execute('INSERT OR IGNORE INTO out_of_scope (url) VALUES (?)',
+                                                 (url,)).rowcount
+        return url
+    if depth > frontier['max_depth']:
+        frontier['too_deep'] += 1
+        return url
+    if seen_add(frontier['seen'], url):
+        frontier['queue'].append((url, depth))
+    else:
+        frontier['aliases'] += 1
+    return url
+
+
+def frontier_next(frontier):
+    """Next (url, depth) breadth-first, or None when empty or the page budget is spent."""
+    if not frontier['queue'] or frontier['dequeued'] >= frontier['max_pages']:
+        return None
+    frontier['dequeued'] += 1
+    return frontier['queue'].popleft()
+
+
+def close_frontier(frontier):
+    """Close the seen-set table (removing it when it is SQLite's temporary database)."""
+    frontier['seen']['conn'].close()
+
+
+def site_graph(frontier):
+    """Nodes and deduplicated edges discovered so far, for saving as JSON."""
+    conn = frontier['seen']['conn']
+    edges = conn.execute('SELECT source, target FROM edges ORDER BY source, target')
+    return {
+        'nodes': [row[0] for row in conn.execute('SELECT source FROM edges UNION SELECT target FROM edges ORDER BY 1')],
+        'edges': [{'from': source, 'to': target} for source, target in edges],
+        'out_of_scope': [row[0] for row in conn.execute('SELECT url FROM out_of_scope ORDER BY url')]
+    }
+
+
+def format_frontier_stats(frontier):
+    seen = frontier['seen']
+    return (f"{frontier['dequeued']} fetched, {len(frontier['queue'])} still queued, "
+            f"{frontier['aliases']} duplicate/alias links skipped, {frontier['out_of_scope']} out-of-scope URLs, "
+            f"{frontier['too_deep']} beyond depth {frontier['max_depth']}; seen-set {seen['bloom']['count']} URLs "
+            f"in {len(seen['bloom']['bits']):,} filter bytes, {seen['false_positives']} false positives")
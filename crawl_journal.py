@@ -0,0 +1,122 @@
+"""
+Write-ahead journal for long crawls and browser sweeps.
+Every target is logged as started before it is fetched and as done (with its
+result) or failed afterwards. Records are flushed to the OS as they are
+written, so a crash or Ctrl-C loses nothing; fsync is batched, so power loss
+can only drop the last few records, which a resume then simply redoes.
+With resume, completed targets are skipped and in-flight or failed ones retried.
+"""
+
+import json
+import os
+import time
+
+SYNC_EVERY = 16  # records between fsyncs
+SYNC_INTERVAL = 1.0  # max seconds between fsyncs
+
+
+def load_journal(path):
+    """Replay a journal and return (completed, in_flight): {target: data} and {target: error or None}."""
+    completed = {}
+    in_flight = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # Torn final record from a crash mid-write
+                target = record['target']
+                if record['event'] == 'done':
+                    completed[target] = record.get('data')
+                    in_flight.pop(target, None)
+                elif record['event'] == 'start':
+                    completed.pop(target, None)
+                    in_flight[target] = None
+                elif record['event'] == 'failed':
+                    in_flight[target] = record.get('error')
+    except FileNotFoundError:
+        pass
+    return completed, in_flight
+
+
+def open_journal(path, resume=False, sync_every=SYNC_EVERY, sync_interval=SYNC_INTERVAL):
+    """
+    Open a journal for appending. Without resume any previous journal is discarded;
+    with resume its completed targets are loaded so the caller can skip them.
+    """
+    completed, in_flight = load_journal(path) if resume else ({}, {})
+    if resume and os.path.exists(path):
+        _truncate_torn_tail(path)
+
+    journal = {
+        'path': path,
+        'file': open(path, 'a' if resume else 'w', encoding='utf-8'),
+        'sync_every': sync_every,
+        'sync_interval': sync_interval,
+        'unsynced': 0,
+        'last_sync': time.monotonic(),
+        'completed': completed,
+        'in_flight': in_flight
+    }
+    return journal
+
+
+def _truncate_torn_tail(path):
+    """Cut a partial last line so new records start on a fresh line."""
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            f.truncate(end)
+
+
+def _append(journal, record):
+    record['ts'] = time.time()
+    journal['file'].write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    journal['file'].flush()
+    journal['unsynced'] += 1
+    if (journal['unsynced'] >= journal['sync_every']
+            or time.monotonic() - journal['last_sync'] >= journal['sync_interval']):
+        sync_journal(journal)
+
+
+def sync_journal(journal):
+    """Force every written record to disk."""
+    if journal['unsynced']:
+        os.fsync(journal['file'].fileno())
+        journal['unsynced'] = 0
+    journal['last_sync'] = time.monotonic()
+
+
+def is_completed(journal, target):
+    return target in journal['completed']
+
+
+def journal_start(journal, target):
+    journal['in_flight'][target] = None
+    _append(journal, {'event': 'start', 'target': target})
+
+
+def journal_done(journal, target, data=None):
+    # The data lives on disk; keeping it here too would double what long sweeps hold in memory
+    journal['completed'][target] = None
+    journal['in_flight'].pop(target, None)
+    _append(journal, {'event': 'done', 'target': target, 'data': data})
+
+
+def journal_failed(journal, target, error):
+    journal['in_flight'][target] = error
+    _append(journal, {'event': 'failed', 'target': target, 'error': error})
+
+
+def close_journal(journal):
+    sync_journal(journal)
+    journal['file'].close()
+
+
+def print_resume_summary(journal, targets):
+    """Print how much of a target list a resumed journal already covers."""
+    done = [target for target in targets if target in journal['completed']]
+    retry = [target for target in targets if target in journal['in_flight']]
+    print(f"Resuming from {journal['path']}: {len(done)}/{len(targets)} done, {len(retry)} in-flight or failed to retry")
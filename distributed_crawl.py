@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Distributed crawl: a coordinator splits slug x user-agent x tier tasks across
+workers through a shared work queue. Workers lease a task, fetch it, write
+the result to the results store and mark the task done; leases that expire
+(crashed or stalled worker) go back on the queue for someone else.
+
+Tasks start on the HTTP tier. With the browser tier enabled, a page the HTTP
+tier cannot settle is queued again as a browser task for the same user agent,
+so the HTTP fetch is done and recorded once.
+
+While a task runs its lease is renewed in the background, and the result is
+only recorded after a renewal confirms the worker still holds it, so a slow
+(browser-tier) task is never recorded by two workers.
+
+Queues are pluggable: anything with put/lease/renew/complete/fail/counts works.
+SQLiteQueue coordinates worker processes on one host; InProcessQueue runs
+worker threads for local testing. SQLite's WAL mode relies on shared memory
+and file locks that network filesystems (NFS, SMB) do not provide reliably,
+so the queue file must not be shared between machines; spreading workers
+over several nodes needs a real queue behind the same interface.
+"""
+
+import argparse
+import heapq
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from fetcher import BASE_URL, USER_AGENT, fetch_page, load_managed_slugs, make_session
+from replay_transport import save_recordings
+from results_store import DEFAULT_DB_PATH, finish_run, open_store, record_browser_verdict, record_fetch, start_run
+from tiered_fetch import AMBIGUOUS_VERDICTS, browser_fetch, classify_page, open_browser
+
+DEFAULT_QUEUE_PATH = 'crawl_queue.db'
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+IDLE_POLL_SECONDS = 0.5
+
+# User agents every slug is checked with
+USER_AGENT_VARIANTS = {
+    'desktop_chrome': USER_AGENT,
+    'iphone_safari': ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 "
+                      "(KHTML, like Gecko) Version/17.5 Mobile/15E148 Safari/604.1"),
+    'instagram_app': ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) AppleWebKit/605.1.15 "
+                      "(KHTML, like Gecko) Mobile/15E148 Instagram 330.0.0.0"),
+    'googlebot': "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    'curl': "curl/8.5.0",
+}
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    slug TEXT NOT NULL,
+    user_agent TEXT NOT NULL,
+    tier TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    UNIQUE (run_id, slug, user_agent, tier)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(run_id, status, lease_expires);
+"""
+
+
+def make_task(slug, user_agent='desktop_chrome', tier='http'):
+    return {'slug': slug, 'user_agent': user_agent, 'tier': tier}
+
+
+class SQLiteQueue:
+    """Lease-based work queue for one run, in a SQLite file shared by every worker."""
+
+    def __init__(self, run_id, path=DEFAULT_QUEUE_PATH, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.run_id = run_id
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(QUEUE_SCHEMA)
+
+    def put(self, tasks):
+        self.conn.execute('BEGIN IMMEDIATE')
+        self.conn.executemany('INSERT OR IGNORE INTO tasks (run_id, slug, user_agent, tier) VALUES (?, ?, ?, ?)',
+                              [(self.run_id, task['slug'], task['user_agent'], task['tier']) for task in tasks])
+        self.conn.execute('COMMIT')
+
+    def lease(self, worker_id):
+        """Claim the next pending task (requeueing expired leases first), or return None."""
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            self.conn.execute("UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                              "lease_owner = NULL, error = COALESCE(error, 'lease expired') "
+                              "WHERE run_id = ? AND status = 'leased' AND lease_expires < ?",
+                              (self.max_attempts, self.run_id, now))
+            row = self.conn.execute("SELECT id, slug, user_agent, tier, attempts FROM tasks "
+                                    "WHERE run_id = ? AND status = 'pending' ORDER BY id LIMIT 1",
+                                    (self.run_id,)).fetchone()
+            if row is None:
+                self.conn.execute('COMMIT')
+                return None
+            self.conn.execute("UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                              "attempts = attempts + 1 WHERE id = ?", (worker_id, now + self.lease_seconds, row[0]))
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return {'id': row[0], 'slug': row[1], 'user_agent': row[2], 'tier': row[3], 'attempts': row[4] + 1}
+
+    def renew(self, task_id, worker_id):
+        """
+        Extend a lease worker_id still holds; returns False if it was lost. Uses its
+        own connection, so the heartbeat thread can call it.
+        """
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            cursor = conn.execute("UPDATE tasks SET lease_expires = ? WHERE id = ? AND lease_owner = ? "
+                                  "AND status = 'leased'", (time.time() + self.lease_seconds, task_id, worker_id))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, task_id, worker_id):
+        """Mark a task done. Returns False if the lease was lost to another worker."""
+        cursor = self.conn.execute("UPDATE tasks SET status = 'done', error = NULL WHERE id = ? AND lease_owner = ? "
+                                   "AND status = 'leased'", (task_id, worker_id))
+        return cursor.rowcount == 1
+
+    def fail(self, task_id, worker_id, error):
+        """Give a task back for retry, or mark it failed after max_attempts."""
+        self.conn.execute("UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                          "lease_owner = NULL, error = ? WHERE id = ? AND lease_owner = ?",
+                          (self.max_attempts, error, task_id, worker_id))
+
+    def counts(self):
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM tasks WHERE run_id = ? GROUP BY status',
+                                      (self.run_id,)).fetchall())
+
+    def close(self):
+        self.conn.close()
+
+
+class InProcessQueue:
+    """Thread-safe stand-in for SQLiteQueue with the same lease semantics."""
+
+    def __init__(self, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.tasks = {}
+        self.pending = []  # heap of task ids
+        self.leases = []  # heap of (lease_expires, task_id)
+
+    def put(self, tasks):
+        with self.lock:
+            known = {(t['slug'], t['user_agent'], t['tier']) for t in self.tasks.values()}
+            for task in tasks:
+                key = (task['slug'], task['user_agent'], task['tier'])
+                if key in known:
+                    continue
+                known.add(key)
+                task_id = len(self.tasks) + 1
+                self.tasks[task_id] = dict(task, id=task_id, status='pending', lease_owner=None,
+                                           lease_expires=None, attempts=0, error=None)
+                heapq.heappush(self.pending, task_id)
+
+    def _requeue_expired(self, now):
+        while self.leases and self.leases[0][0] < now:
+            expires, task_id = heapq.heappop(self.leases)
+            task = self.tasks[task_id]
+            if task['status'] != 'leased' or task['lease_expires'] != expires:
+                continue  # Finished or re-leased since this entry was pushed
+            task['lease_owner'] = None
+            task['error'] = task['error'] or 'lease expired'
+            if task['attempts'] >= self.max_attempts:
+                task['status'] = 'failed'
+            else:
+                task['status'] = 'pending'
+                heapq.heappush(self.pending, task_id)
+
+    def lease(self, worker_id):
+        now = time.time()
+        with self.lock:
+            self._requeue_expired(now)
+            if not self.pending:
+                return None
+            task = self.tasks[heapq.heappop(self.pending)]
+            task.update(status='leased', lease_owner=worker_id, lease_expires=now + self.lease_seconds,
+                        attempts=task['attempts'] + 1)
+            heapq.heappush(self.leases, (task['lease_expires'], task['id']))
+            return {key: task[key] for key in ('id', 'slug', 'user_agent', 'tier', 'attempts')}
+
+    def renew(self, task_id, worker_id):
+        with self.lock:
+            task = self.tasks[task_id]
+            if task['status'] != 'leased' or task['lease_owner'] != worker_id:
+                return False
+            task['lease_expires'] = time.time() + self.lease_seconds
+            heapq.heappush(self.leases, (task['lease_expires'], task_id))
+            return True
+
+    def complete(self, task_id, worker_id):
+        with self.lock:
+            task = self.tasks[task_id]
+            if task['status'] != 'leased' or task['lease_owner'] != worker_id:
+                return False
+            task.update(status='done', error=None)
+            return True
+
+    def fail(self, task_id, worker_id, error):
+        with self.lock:
+            task = self.tasks[task_id]
+            if task['lease_owner'] != worker_id:
+                return
+            task.update(lease_owner=None, error=error)
+            if task['attempts'] >= self.max_attempts:
+                task['status'] = 'failed'
+            else:
+                task['status'] = 'pending'
+                heapq.heappush(self.pending, task_id)
+
+    def counts(self):
+        with self.lock:
+            counts = {}
+            for task in self.tasks.values():
+                counts[task['status']] = counts.get(task['status'], 0) + 1
+            return counts
+
+    def close(self):
+        pass
+
+
+def build_tasks(slugs, user_agents=None):
+    """Every slug crossed with every user agent variant, on the HTTP tier."""
+    user_agents = user_agents or list(USER_AGENT_VARIANTS)
+    return [make_task(slug, user_agent) for slug in slugs for user_agent in user_agents]
+
+
+def _browser_driver(browser_state, user_agent):
+    """Headless Chrome sending this user agent variant, started on first use."""
+    drivers = browser_state.setdefault('drivers', {})
+    if user_agent not in drivers:
+        drivers[user_agent] = open_browser(USER_AGENT_VARIANTS[user_agent])
+    return drivers[user_agent]
+
+
+def process_task(task, session, store, run_id, base_url=BASE_URL, browser_state=None, lease_held=None):
+    """
+    Fetch one task on its tier and record it in the results store. Returns the verdict.
+    lease_held() is asked right before recording; if it says the lease was lost the
+    result is dropped (the task's new owner records it) and RuntimeError is raised.
+    """
+    def check_lease():
+        if lease_held is not None and not lease_held():
+            raise RuntimeError('lease lost before recording')
+
+    url = f"{base_url.rstrip('/')}/{task['slug']}"
+    if task['tier'] == 'browser':
+        start_time = time.time()
+        browser_result = browser_fetch(_browser_driver(browser_state, task['user_agent']), url)
+        check_lease()
+        record_browser_verdict(store, run_id, url, browser_result['verdict'], final_url=browser_result['final_url'],
+                               reason=browser_result['reason'], elapsed=time.time() - start_time,
+                               details=dict(browser_result, user_agent=task['user_agent']), slug=task['slug'])
+        return browser_result['verdict']
+
+    fetched = fetch_page(url, session=session, headers={'User-Agent': USER_AGENT_VARIANTS[task['user_agent']]})
+    check_lease()
+    if fetched['error']:
+        record_fetch(store, run_id, fetched, slug=task['slug'], user_agent=task['user_agent'])
+        raise RuntimeError(fetched['error'])
+
+    verdict, reason, _ = classify_page(fetched['final_url'], fetched['status_code'], fetched['text'])
+    record_fetch(store, run_id, fetched, slug=task['slug'], verdict=verdict, user_agent=task['user_agent'])
+    return verdict
+
+
+def _keep_leased(queue, task_id, worker_id, stop):
+    """Renew a lease every third of its length until stop is set or the lease is lost."""
+    while not stop.wait(queue.lease_seconds / 3):
+        if not queue.renew(task_id, worker_id):
+            return
+
+
+def run_worker(queue, run_id, worker_id=None, store_path=None, base_url=BASE_URL, exit_when_idle=True,
+               use_browser=False):
+    """
+    Lease and process tasks until the queue has nothing pending or leased.
+    With use_browser, HTTP tasks with an ambiguous verdict queue a browser task.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    store = open_store(store_path)
+    session = make_session()
+    browser_state = {}
+    processed = 0
+
+    try:
+        while True:
+            task = queue.lease(worker_id)
+            if task is None:
+                counts = queue.counts()
+                if exit_when_idle and not counts.get('pending') and not counts.get('leased'):
+                    break
+                time.sleep(IDLE_POLL_SECONDS)  # Leased tasks may still expire and come back
+                continue
+
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=_keep_leased, args=(queue, task['id'], worker_id, stop), daemon=True)
+            heartbeat.start()
+            try:
+                verdict = process_task(task, session, store, run_id, base_url=base_url, browser_state=browser_state,
+                                       lease_held=lambda: queue.renew(task['id'], worker_id))
+            except Exception as e:
+                queue.fail(task['id'], worker_id, str(e))
+                continue
+            finally:
+                stop.set()
+                heartbeat.join()
+            if use_browser and task['tier'] == 'http' and verdict in AMBIGUOUS_VERDICTS:
+                # Queued before this task completes, so idle workers never see an empty queue in between
+                queue.put([make_task(task['slug'], task['user_agent'], 'browser')])
+            if queue.complete(task['id'], worker_id):
+                processed += 1
+    finally:
+        for driver in browser_state.get('drivers', {}).values():
+            driver.quit()
+        store.close()
+    return processed
+
+
+def _process_worker(queue_path, run_id, worker_number, store_path, base_url, use_browser):
+    queue = SQLiteQueue(run_id, queue_path)
+    try:
+        run_worker(queue, run_id, worker_id=f"{socket.gethostname()}:{os.getpid()}:{worker_number}",
+                   store_path=store_path, base_url=base_url, use_browser=use_browser)
+    finally:
+        queue.close()
+        save_recordings()  # atexit handlers do not run when a worker process exits
+
+
+def run_distributed_crawl(slugs, workers=4, queue_kind='sqlite', queue_path=DEFAULT_QUEUE_PATH, user_agents=None,
+                          use_browser=False, store_path=None, base_url=BASE_URL):
+    """Queue every task, run the workers and report throughput."""
+    tasks = build_tasks(slugs, user_agents)
+
+    print("DISTRIBUTED CRAWL")
+    print("=" * 60)
+    print(f"Tasks: {len(tasks)} ({len(slugs)} slugs x {len(user_agents or USER_AGENT_VARIANTS)} user agents)")
+    print(f"Browser tier: {'ambiguous pages escalated' if use_browser else 'DISABLED'}")
+    print(f"Workers: {workers} ({queue_kind} queue)")
+    print("=" * 60)
+
+    store = open_store(store_path)
+    run_id = start_run(store, 'distributed_crawl', {'tasks': len(tasks), 'workers': workers, 'queue': queue_kind,
+                                                    'use_browser': use_browser})
+
+    queue = SQLiteQueue(run_id, queue_path) if queue_kind == 'sqlite' else InProcessQueue()
+    queue.put(tasks)
+
+    start_time = time.time()
+    if queue_kind == 'sqlite':
+        processes = [multiprocessing.Process(target=_process_worker,
+                                             args=(queue_path, run_id, i, store_path, base_url, use_browser))
+                     for i in range(workers)]
+    else:
+        processes = [threading.Thread(target=run_worker, args=(queue, run_id),
+                                      kwargs={'worker_id': f'thread-{i}', 'store_path': store_path,
+                                              'base_url': base_url, 'use_browser': use_browser})
+                     for i in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.time() - start_time
+
+    counts = queue.counts()
+    queue.close()
+    finish_run(store, run_id)
+    store.close()
+
+    done = counts.get('done', 0)
+    print(f"\nRESULTS:")
+    print(f"  Tasks: {counts}")
+    print(f"  Wall time: {elapsed:.2f}s")
+    print(f"  Throughput: {done / elapsed if elapsed else 0.0:.1f} tasks/s ({workers} workers)")
+    print(f"\n[SAVE] Run {run_id} stored in: {store_path or DEFAULT_DB_PATH}")
+
+    return {'run_id': run_id, 'counts': counts, 'elapsed': elapsed, 'throughput': done / elapsed if elapsed else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl every slug x user agent across a pool of workers.")
+    parser.add_argument('--workers', type=int, default=4, help="worker processes (or threads for --queue memory)")
+    parser.add_argument('--queue', choices=['sqlite', 'memory'], default='sqlite', help="work queue backend")
+    parser.add_argument('--queue-path', default=DEFAULT_QUEUE_PATH,
+                        help="SQLite queue file shared by workers (local disk, one host only)")
+    parser.add_argument('--worker-only', type=int, metavar='RUN_ID',
+                        help="join an existing run as another worker process on the same host")
+    parser.add_argument('--user-agents', nargs='+', choices=list(USER_AGENT_VARIANTS), help="user agent variants")
+    parser.add_argument('--browser', action='store_true',
+                        help="re-check pages the HTTP tier cannot settle in a browser with the same user agent")
+    parser.add_argument('--base-url', default=BASE_URL, help="origin to crawl")
+    args = parser.parse_args()
+
+    if args.worker_only is not None:
+        queue = SQLiteQueue(args.worker_only, args.queue_path)
+        processed = run_worker(queue, args.worker_only, base_url=args.base_url, use_browser=args.browser)
+        print(f"Worker processed {processed} tasks for run {args.worker_only}")
+    else:
+        run_distributed_crawl(load_managed_slugs(), workers=args.workers,
+                              queue_kind='sqlite' if args.queue == 'sqlite' else 'memory',
+                              queue_path=args.queue_path, user_agents=args.user_agents,
+                              use_browser=args.browser, base_url=args.base_url)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory records for extraction results.
+extract_content_data returns a dict per page holding a dict per image and per
+button and lists of strings, and the same badge URLs, alt texts, button
+labels and class-laden text repeat on nearly every page. Long sweeps hold
+pages as slotted records instead: fixed fields, tuples instead of lists, and
+every string passed through a per-crawl intern table so each distinct value
+is stored once. page_to_dict converts back to the exact JSON shape, so
+nothing downstream changes.
+
+    python extraction_records.py [pages]   # memory benchmark (default 10000 pages)
+"""
+
+import json
+import sys
+import time
+import tracemalloc
+
+# Page fields in extract_content_data order; anything else (e.g. 'timing') is kept in `extra`
+PAGE_FIELDS = ('url', 'title', 'creator_name', 'description', 'images', 'buttons', 'text_content', 'meta_data',
+               'scripts', 'script_fingerprints', 'new_scripts', 'has_loading_screen', 'has_bot_detection',
+               'obfuscated_urls', 'analytics_tracking')
+# String lists: text, script previews and pattern matches
+STRING_LIST_FIELDS = ('text_content', 'scripts', 'script_fingerprints', 'obfuscated_urls', 'analytics_tracking')
+IMAGE_FIELDS = ('src', 'alt', 'is_obfuscated')
+BUTTON_FIELDS = ('text', 'href', 'onclick', 'tag')
+
+_MISSING = object()  # Field absent from the source dict (older crawled_data.json files)
+
+
+def new_intern_table():
+    """Per-crawl string table; dropping it releases strings no record still uses."""
+    return {}
+
+
+def intern_string(strings, value):
+    if strings is None or not isinstance(value, str):
+        return value
+    return strings.setdefault(value, value)
+
+
+def _intern_value(strings, value):
+    """Intern strings inside arbitrary JSON values (meta_data, extra keys)."""
+    if isinstance(value, str):
+        return intern_string(strings, value)
+    if isinstance(value, dict):
+        return {intern_string(strings, key): _intern_value(strings, item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_intern_value(strings, item) for item in value]
+    return value
+
+
+class ImageRecord:
+    __slots__ = IMAGE_FIELDS + ('extra',)
+
+    def __init__(self, src, alt, is_obfuscated, extra=None):
+        self.src = src
+        self.alt = alt
+        self.is_obfuscated = is_obfuscated
+        self.extra = extra
+
+
+class ButtonRecord:
+    __slots__ = BUTTON_FIELDS + ('extra',)
+
+    def __init__(self, text, href, onclick, tag, extra=None):
+        self.text = text
+        self.href = href
+        self.onclick = onclick
+        self.tag = tag
+        self.extra = extra
+
+
+class PageRecord:
+    __slots__ = PAGE_FIELDS + ('extra',)
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name, _MISSING))
+
+
+def _split_fields(data, fields, strings):
+    """Values for the known fields (interned) and a dict of any other keys, or None."""
+    values = [_intern_value(strings, data[name]) if name in data else _MISSING for name in fields]
+    extra = {key: _intern_value(strings, value) for key, value in data.items() if key not in fields}
+    return values, extra or None
+
+
+def _from_item(record_type, fields, data, strings):
+    values, extra = _split_fields(data, fields, strings)
+    return record_type(*values, extra=extra)
+
+
+def _item_to_dict(record, fields):
+    data = {name: getattr(record, name) for name in fields if getattr(record, name) is not _MISSING}
+    if record.extra:
+        data.update(record.extra)
+    return data
+
+
+def page_from_dict(data, strings=None):
+    """Build a PageRecord from an extract_content_data dict, interning its strings into `strings`."""
+    fields = {}
+    for name in PAGE_FIELDS:
+        if name not in data:
+            continue
+        value = data[name]
+        if name == 'images':
+            value = tuple(_from_item(ImageRecord, IMAGE_FIELDS, image, strings) for image in value)
+        elif name == 'buttons':
+            value = tuple(_from_item(ButtonRecord, BUTTON_FIELDS, button, strings) for button in value)
+        elif name in STRING_LIST_FIELDS:
+            value = tuple(intern_string(strings, item) for item in value)
+        else:
+            value = _intern_value(strings, value)
+        fields[name] = value
+    extra = {key: _intern_value(strings, value) for key, value in data.items() if key not in PAGE_FIELDS}
+    fields['extra'] = extra or None
+    return PageRecord(**fields)
+
+
+def page_to_dict(record):
+    """The record back in extract_content_data's JSON shape (key order included)."""
+    data = {}
+    for name in PAGE_FIELDS:
+        value = getattr(record, name)
+        if value is _MISSING:
+            continue
+        if name == 'images':
+            value = [_item_to_dict(image, IMAGE_FIELDS) for image in value]
+        elif name == 'buttons':
+            value = [_item_to_dict(button, BUTTON_FIELDS) for button in value]
+        elif name in STRING_LIST_FIELDS:
+            value = list(value)
+        data[name] = value
+    if record.extra:
+        data.update(record.extra)
+    return data
+
+
+def _creator_slug(page):
+    return page['url'].rstrip('/').rsplit('/', 1)[-1]
+
+
+def _synthetic_sweep(template_pages, count):
+    """
+    count page dicts built from real crawl output, each parsed separately as a
+    crawl would. Every page stands for a different creator: the template's slug
+    (in the URL, text and script previews) becomes a numbered one, and image URLs
+    and links found on only one template page get a per-page suffix, so only what
+    pages genuinely share (badges, logos, labels, bootstrap scripts) repeats.
+    """
+    shared_srcs = {src for src in {image['src'] for page in template_pages for image in page['images']}
+                   if sum(src in {image['src'] for image in page['images']} for page in template_pages) > 1}
+    encoded = [(json.dumps(page, ensure_ascii=False), _creator_slug(page)) for page in template_pages]
+    for i in range(count):
+        text, slug = encoded[i % len(encoded)]
+        creator = f"{slug}{i}"
+        if slug:
+            text = text.replace(slug, creator).replace(slug.capitalize(), creator.capitalize())
+        page = json.loads(text)
+        page['creator_name'] = f"{page['creator_name']} {i}" if page['creator_name'] else ''
+        for image in page['images']:
+            if image['src'] not in shared_srcs:
+                image['src'] = f"{image['src']}-{i}"
+        for button in page['buttons']:
+            if button['href']:
+                button['href'] = f"{button['href']}?creator={i}"
+        yield page
+
+
+def _memory_and_time(build):
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    built = build()
+    held = tracemalloc.get_traced_memory()[0]
+    elapsed = time.perf_counter() - start_time
+    tracemalloc.stop()
+    return built, held, elapsed
+
+
+def benchmark_memory(count=10000, data_path='crawled_data.json'):
+    """
+    Compare memory held by count pages as dicts, as slotted records, and as
+    slotted records with interned strings, so the two savings are reported apart.
+    """
+    with open(data_path, 'r', encoding='utf-8') as f:
+        template_pages = json.load(f)
+
+    print("EXTRACTION RECORD MEMORY BENCHMARK")
+    print("=" * 60)
+    print(f"Pages: {count:,} (varied from {len(template_pages)} pages in {data_path})")
+
+    as_dicts, dict_bytes, dict_time = _memory_and_time(lambda: list(_synthetic_sweep(template_pages, count)))
+    del as_dicts
+    slotted, slotted_bytes, slotted_time = _memory_and_time(
+        lambda: [page_from_dict(page) for page in _synthetic_sweep(template_pages, count)])
+    del slotted
+    strings = new_intern_table()
+    as_records, record_bytes, record_time = _memory_and_time(
+        lambda: [page_from_dict(page, strings) for page in _synthetic_sweep(template_pages, count)])
+
+    originals = _synthetic_sweep(template_pages, count)
+    lossless = all(page_to_dict(record) == original for record, original in zip(as_records, originals))
+
+    for label, held, elapsed in (('Dicts', dict_bytes, dict_time), ('Records', slotted_bytes, slotted_time),
+                                 ('Interned', record_bytes, record_time)):
+        print(f"   {label + ':':<10}{held / 1048576:8.1f} MiB ({held / count:,.0f} bytes/page), "
+              f"built in {elapsed:.2f}s")
+    print(f"   Slotted records and tuples save {1 - slotted_bytes / dict_bytes:.0%} of the dicts; interning "
+          f"({len(strings):,} distinct strings) saves another {1 - record_bytes / slotted_bytes:.0%}")
+    print(f"   Total reduction: {1 - record_bytes / dict_bytes:.0%}")
+    print(f"   Round trip to JSON shape: {'lossless' if lossless else 'MISMATCH'}")
+    return {'dict_bytes': dict_bytes, 'slotted_bytes': slotted_bytes, 'record_bytes': record_bytes,
+            'lossless': lossless}
+
+
+if __name__ == "__main__":
+    benchmark_memory(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
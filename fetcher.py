@@ -0,0 +1,216 @@
+"""
+Shared HTTP fetch path for the crawler and analysis scripts.
+Holds the common configuration (base URL, user agent, headers) and returns
+every fetch as a plain dict so callers can save it straight to JSON.
+"""
+
+import importlib.util
+import os
+import re
+import time
+
+import requests
+
+from replay_transport import mount_transport
+from request_timing import mount_timing_adapter, run_phase_hooks, start_record, time_phase
+
+# Configuration (VIEWIT_BASE_URL points every script at another origin, e.g. a local dev server)
+BASE_URL = os.environ.get('VIEWIT_BASE_URL', "https://www.viewit.bio").rstrip('/')
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
+
+# Optional decoders that urllib3 and httpx pick up when installed
+OPTIONAL_ENCODINGS = [('br', ['brotli', 'brotlicffi']), ('zstd', ['zstandard'])]
+
+
+def available_content_encodings():
+    """Return the content encodings we can decode, best first."""
+    encodings = []
+    for encoding, modules in OPTIONAL_ENCODINGS:
+        if any(importlib.util.find_spec(module) for module in modules):
+            encodings.append(encoding)
+    return encodings + ['gzip', 'deflate']
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': ', '.join(available_content_encodings()),
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+MANAGED_SLUGS_PATTERN = re.compile(r'managedSlugPaths\s*=\s*\[([^\]]*)\]')
+
+
+def load_managed_slugs(middleware_path='middleware.ts'):
+    """Read the DB-backed slugs from middleware.ts, falling back to all_page_links.txt."""
+    try:
+        with open(middleware_path, 'r', encoding='utf-8') as f:
+            match = MANAGED_SLUGS_PATTERN.search(f.read())
+        if match:
+            return [path.strip('/') for path in re.findall(r"'([^']+)'", match.group(1))]
+    except FileNotFoundError:
+        pass
+
+    slugs = []
+    with open('all_page_links.txt', 'r', encoding='utf-8') as f:
+        for line in f:
+            match = re.match(r'\s*\d+\.\s+(\S+)\s+-\s+https?://', line)
+            if match:
+                slugs.append(match.group(1))
+    return slugs
+
+
+def make_session(headers=None):
+    """
+    Create a keep-alive session carrying the default headers and phase timing.
+    VIEWIT_HTTP_MODE=record/replay swaps in the archive transport (see replay_transport).
+    """
+    session = requests.Session()
+    session.headers.update(headers or DEFAULT_HEADERS)
+    mount_timing_adapter(session)
+    mount_transport(session)
+    return session
+
+
+def header_block_bytes(status_code, reason, header_pairs):
+    """Size of an HTTP/1.1 status line and header block, blank line included."""
+    size = len(f"HTTP/1.1 {status_code} {reason}\r\n") + 2
+    for name, value in header_pairs:
+        size += len(name) + len(value) + 4  # "Name: value\r\n"
+    return size
+
+
+def response_wire_bytes(response):
+    """
+    Bytes received for a response and each redirect hop before it: status line and
+    headers, plus the body as transferred (still content-encoded). Chunked framing
+    is not counted.
+    """
+    total = 0
+    for hop in list(response.history) + [response]:
+        total += header_block_bytes(hop.status_code, hop.reason, hop.raw.headers.items())
+        total += hop.raw.tell() if hasattr(hop.raw, 'tell') else len(hop.content)
+    return total
+
+
+def fetch_page(url, session=None, headers=None, timeout=30, allow_redirects=True, parse_follows=False):
+    """
+    Fetch a URL and return the response as a dict.
+    Request errors are returned in the 'error' field rather than raised.
+    'phases' holds the per-phase timings; later parse time is added to it.
+    With parse_follows=True the phase hooks wait for that parse (see request_timing).
+    """
+    result = {
+        'url': url,
+        'final_url': url,
+        'status_code': None,
+        'history': [],
+        'headers': {},
+        'content': b'',
+        'text': '',
+        'wire_bytes': 0,
+        'elapsed': 0.0,
+        'phases': start_record(),
+        'error': None
+    }
+
+    if session is None:
+        session = make_session()
+
+    start_time = time.time()
+    try:
+        response = session.get(url, headers=headers, timeout=timeout, allow_redirects=allow_redirects,
+                               stream=True)
+        with time_phase('download', result['phases']):
+            result['content'] = response.content
+        result['wire_bytes'] = response_wire_bytes(response)
+    except requests.exceptions.RequestException as e:
+        result['error'] = str(e)
+        result['elapsed'] = result['phases']['total'] = time.time() - start_time
+        run_phase_hooks(url, result['phases'])
+        return result
+
+    result['elapsed'] = result['phases']['total'] = time.time() - start_time
+    result['final_url'] = response.url
+    result['status_code'] = response.status_code
+    result['history'] = [{'status_code': r.status_code, 'url': r.url} for r in response.history]
+    result['headers'] = dict(response.headers)
+    result['text'] = response.text
+    run_phase_hooks(url, result['phases'], defer=parse_follows)
+    return result
+
+
+def _read_prefix(response, max_bytes):
+    """Read at most max_bytes of a streamed response body, then drop the connection."""
+    chunks = []
+    read = 0
+    try:
+        for chunk in response.iter_content(chunk_size=4096):
+            chunks.append(chunk)
+            read += len(chunk)
+            if read >= max_bytes:
+                break
+    finally:
+        response.close()
+    return b''.join(chunks)[:max_bytes]
+
+
+def probe_url(url, session=None, indicators=None, max_bytes=16384, max_redirects=10, timeout=30):
+    """
+    Resolve status and redirect chain without downloading the page body.
+    Each hop is a HEAD request (falling back to a ranged GET when HEAD is not
+    allowed). If indicators are given, only the first max_bytes of the final
+    page are fetched and scanned for them.
+    """
+    session = session or make_session()
+    result = {
+        'url': url,
+        'final_url': url,
+        'status_code': None,
+        'chain': [],
+        'rewrite': None,
+        'indicators_found': [],
+        'bytes_read': 0,
+        'elapsed': 0.0,
+        'phases': start_record(),
+        'error': None
+    }
+
+    start_time = time.time()
+    current = url
+    try:
+        for _ in range(max_redirects + 1):
+            response = session.head(current, timeout=timeout, allow_redirects=False)
+            if response.status_code in (405, 501):
+                response = session.get(current, timeout=timeout, allow_redirects=False, stream=True,
+                                       headers={'Range': 'bytes=0-0'})
+                response.close()
+
+            location = response.headers.get('Location')
+            result['chain'].append({'status_code': response.status_code, 'url': current, 'location': location})
+            # Next.js middleware rewrites (/slug -> /p/slug) are internal; the header is all clients see
+            result['rewrite'] = response.headers.get('x-middleware-rewrite') or result['rewrite']
+
+            if response.is_redirect and location:
+                current = requests.compat.urljoin(current, location)
+                continue
+            break
+
+        result['final_url'] = current
+        result['status_code'] = result['chain'][-1]['status_code']
+
+        if indicators:
+            response = session.get(current, timeout=timeout, stream=True,
+                                   headers={'Range': f'bytes=0-{max_bytes - 1}'})
+            prefix = _read_prefix(response, max_bytes)
+            result['bytes_read'] = len(prefix)
+            text = prefix.decode('utf-8', errors='ignore').lower()
+            result['indicators_found'] = [indicator for indicator in indicators if indicator.lower() in text]
+    except requests.exceptions.RequestException as e:
+        result['error'] = str(e)
+
+    result['elapsed'] = result['phases']['total'] = time.time() - start_time
+    run_phase_hooks(url, result['phases'])
+    return result
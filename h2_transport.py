@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Optional HTTP/2 transport for slug sweeps.
+All slug fetches are multiplexed as concurrent streams over a single
+connection per origin (httpx + h2), with brotli/zstd negotiated when their
+decoders are installed. The comparison mode reports bytes on the wire and
+connections opened against the current requests/HTTP 1.1 path.
+
+Bytes on the wire count the same things on both paths: every hop of a
+redirect chain, its response headers and its body as transferred. HTTP/2
+header blocks are sized as HPACK encodes them; framing (HTTP/1.1 chunk sizes,
+HTTP/2 frame headers) is left out of both.
+
+    python h2_transport.py --self-test   # local HTTP/1.1 and h2c servers, counts checked against bytes sent
+    python h2_transport.py --base-url https://localhost:8000 --insecure
+"""
+
+import argparse
+import asyncio
+import gzip
+import http.server
+import json
+import sys
+import threading
+import time
+
+from fetcher import (BASE_URL, DEFAULT_HEADERS, available_content_encodings, fetch_page, header_block_bytes,
+                     load_managed_slugs, make_session)
+
+
+def _require_httpx():
+    try:
+        import httpx
+        import h2  # noqa: F401  (httpx needs it for http2=True)
+    except ImportError:
+        raise ImportError("HTTP/2 transport not available. Install with: pip install 'httpx[http2]'")
+    return httpx
+
+
+def make_h2_client(verify=True, h2c=False, timeout=30):
+    """Create an async httpx client that multiplexes everything over one HTTP/2 connection."""
+    httpx = _require_httpx()
+    headers = dict(DEFAULT_HEADERS)
+    headers['Accept-Encoding'] = ', '.join(available_content_encodings())
+    headers.pop('Connection', None)  # Connection-specific headers are illegal in HTTP/2
+
+    return httpx.AsyncClient(
+        http1=not h2c,  # h2c needs prior knowledge: HTTP/2 only
+        http2=True,
+        verify=verify,
+        headers=headers,
+        timeout=timeout,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=1, max_keepalive_connections=1)
+    )
+
+
+def _header_bytes(hop, connection):
+    """
+    Response header bytes for one hop. HTTP/2 header blocks are sized with one HPACK
+    encoder per connection, fed the responses in order, so the dynamic table follows
+    the server's (exact when the server indexes headers the way hpack does by default).
+    """
+    if hop.http_version != 'HTTP/2' or connection is None:
+        return header_block_bytes(hop.status_code, hop.reason_phrase, hop.headers.multi_items())
+    if connection['encoder'] is None:
+        import hpack  # Installed with h2
+        connection['encoder'] = hpack.Encoder()
+    return len(connection['encoder'].encode([(':status', str(hop.status_code))] + hop.headers.multi_items()))
+
+
+async def _fetch_one(client, url, semaphore, connections):
+    """Fetch one URL as an HTTP/2 stream and return a fetch_page-shaped dict."""
+    result = {
+        'url': url,
+        'final_url': url,
+        'status_code': None,
+        'history': [],
+        'headers': {},
+        'content': b'',
+        'text': '',
+        'wire_bytes': 0,
+        'elapsed': 0.0,
+        'http_version': None,
+        'error': None
+    }
+
+    async with semaphore:
+        start_time = time.time()
+        try:
+            response = await client.get(url)
+        except Exception as e:
+            result['error'] = str(e)
+            result['elapsed'] = time.time() - start_time
+            return result
+        result['elapsed'] = time.time() - start_time
+
+    for hop in list(response.history) + [response]:
+        stream = hop.extensions.get('network_stream')
+        connection = None
+        if stream is not None:
+            # Keeping the stream referenced means its id is never reused
+            connection = connections.setdefault(id(stream), {'stream': stream, 'encoder': None})
+        result['wire_bytes'] += _header_bytes(hop, connection) + hop.num_bytes_downloaded
+
+    result.update({
+        'final_url': str(response.url),
+        'status_code': response.status_code,
+        'history': [{'status_code': r.status_code, 'url': str(r.url)} for r in response.history],
+        'headers': dict(response.headers),
+        'content': response.content,
+        'text': response.text,
+        'http_version': response.http_version
+    })
+    return result
+
+
+async def fetch_many_h2(urls, verify=True, h2c=False, max_streams=100):
+    """Fetch every URL concurrently over shared HTTP/2 connections."""
+    semaphore = asyncio.Semaphore(max_streams)
+    connections = {}
+    async with make_h2_client(verify=verify, h2c=h2c) as client:
+        results = await asyncio.gather(*[_fetch_one(client, url, semaphore, connections) for url in urls])
+    return results, len(connections)
+
+
+def sweep_http1(urls):
+    """Fetch URLs one after another over the current requests path."""
+    session = make_session()
+    results = [fetch_page(url, session=session) for url in urls]
+    connections = sum(result['phases']['new_connections'] for result in results)
+    return results, connections
+
+
+def sweep_http2(urls, verify=True, h2c=False, max_streams=100):
+    """Fetch URLs multiplexed over HTTP/2."""
+    return asyncio.run(fetch_many_h2(urls, verify=verify, h2c=h2c, max_streams=max_streams))
+
+
+def _transport_summary(name, results, connections, elapsed):
+    ok = [r for r in results if r['error'] is None]
+    return {
+        'transport': name,
+        'pages': len(results),
+        'successful': len(ok),
+        'wire_bytes': sum(r['wire_bytes'] for r in ok),
+        'decoded_bytes': sum(len(r['content']) for r in ok),
+        'connections': connections,
+        'elapsed': elapsed,
+        'http_versions': sorted({r.get('http_version') or 'HTTP/1.1' for r in ok})
+    }
+
+
+def compare_transports(urls, verify=True, h2c=False, max_streams=100):
+    """Run the same sweep over HTTP/1.1 and HTTP/2 and report bytes and connections."""
+    print("HTTP/1.1 vs HTTP/2 TRANSPORT COMPARISON")
+    print("=" * 60)
+    print(f"URLs: {len(urls)}")
+    print(f"Accept-Encoding: {', '.join(available_content_encodings())}")
+    print("=" * 60)
+
+    summaries = []
+
+    start_time = time.time()
+    results, connections = sweep_http1(urls)
+    summaries.append(_transport_summary('requests/http1.1', results, connections, time.time() - start_time))
+
+    try:
+        start_time = time.time()
+        results, connections = sweep_http2(urls, verify=verify, h2c=h2c, max_streams=max_streams)
+        summaries.append(_transport_summary('httpx/http2', results, connections, time.time() - start_time))
+    except ImportError as e:
+        print(f"\n{e}")
+
+    print(f"\nRESULTS:")
+    for summary in summaries:
+        print(f"  {summary['transport']}:")
+        print(f"    Pages: {summary['successful']}/{summary['pages']} ({', '.join(summary['http_versions'])})")
+        print(f"    Bytes on wire: {summary['wire_bytes']:,} (decoded {summary['decoded_bytes']:,})")
+        print(f"    Connections opened: {summary['connections']}")
+        print(f"    Wall time: {summary['elapsed']:.2f}s")
+
+    with open('transport_comparison.json', 'w', encoding='utf-8') as f:
+        json.dump(summaries, f, indent=2)
+    print(f"\n[SAVE] Comparison saved to: transport_comparison.json")
+
+    return summaries
+
+
+def _self_test_response(path):
+    """(status, reason, headers, body) served by both self-test servers: two pages and a redirect."""
+    if path == '/old-a':
+        return 302, 'Found', [('location', '/a'), ('content-length', '0')], b''
+    html = f"<html><body><h1>{path}</h1>{'<p>viewit self-test</p>' * 200}</body></html>"
+    body = gzip.compress(html.encode('utf-8'), mtime=0)
+    return 200, 'OK', [('content-type', 'text/html; charset=utf-8'), ('content-encoding', 'gzip'),
+                       ('content-length', str(len(body)))], body
+
+
+class _SelfTestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        status, reason, headers, body = _self_test_response(self.path)
+        head = f"HTTP/1.1 {status} {reason}\r\n" + ''.join(f"{name}: {value}\r\n" for name, value in headers)
+        data = (head + "\r\n").encode('latin-1') + body
+        self.wfile.write(data)
+        self.server.bytes_sent += len(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def _serve_h2c(reader, writer, sent):
+    """Answer h2c (prior knowledge) requests on one connection, counting header block and body bytes."""
+    import h2.config
+    import h2.connection
+    import h2.events
+
+    connection = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+    connection.initiate_connection()
+    writer.write(connection.data_to_send())
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            break
+        for event in connection.receive_data(data):
+            if isinstance(event, h2.events.RequestReceived):
+                status, _, headers, body = _self_test_response(dict(event.headers)[b':path'].decode())
+                writer.write(connection.data_to_send())
+                connection.send_headers(event.stream_id, [(':status', str(status))] + headers,
+                                        end_stream=not body)
+                block = connection.data_to_send()
+                writer.write(block)
+                sent['bytes'] += len(block) - 9  # One HEADERS frame: payload is the HPACK block
+                if body:
+                    connection.send_data(event.stream_id, body, end_stream=True)  # Fits the initial window
+                    sent['bytes'] += len(body)
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                break
+        writer.write(connection.data_to_send())
+        await writer.drain()
+    writer.close()
+
+
+def self_test():
+    """Sweep local HTTP/1.1 and h2c servers and check each transport's byte count against what was sent."""
+    print("HTTP/2 TRANSPORT SELF-TEST")
+    print("=" * 60)
+    try:
+        _require_httpx()
+    except ImportError as e:
+        print(e)
+        return None
+
+    h1_server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _SelfTestHandler)
+    h1_server.bytes_sent = 0
+    threading.Thread(target=h1_server.serve_forever, daemon=True).start()
+
+    h2_sent = {'bytes': 0}
+    loop = asyncio.new_event_loop()
+    h2_server = loop.run_until_complete(
+        asyncio.start_server(lambda reader, writer: _serve_h2c(reader, writer, h2_sent), '127.0.0.1', 0))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    paths = ['/a', '/b', '/old-a']
+    try:
+        h1_results, _ = sweep_http1([f"http://127.0.0.1:{h1_server.server_port}{path}" for path in paths])
+        # One stream at a time, so responses reach the HPACK encoder in the order the server sent them
+        h2_results, _ = sweep_http2([f"http://127.0.0.1:{h2_server.sockets[0].getsockname()[1]}{path}"
+                                     for path in paths], h2c=True, max_streams=1)
+    finally:
+        h1_server.shutdown()
+        loop.call_soon_threadsafe(loop.stop)
+
+    passed = True
+    for name, results, sent in (('requests/http1.1', h1_results, h1_server.bytes_sent),
+                                ('httpx/http2', h2_results, h2_sent['bytes'])):
+        counted = sum(result['wire_bytes'] for result in results)
+        errors = [result['error'] for result in results if result['error']]
+        ok = counted == sent and not errors
+        passed = passed and ok
+        print(f"   {name:<18} counted {counted:,} bytes, server sent {sent:,}: {'OK' if ok else 'MISMATCH'}"
+              f"{'  errors: ' + '; '.join(errors) if errors else ''}")
+
+    same_pages = all(h1['content'] == h2['content'] and len(h1['history']) == len(h2['history'])
+                     for h1, h2 in zip(h1_results, h2_results))
+    print(f"   Same pages and redirect chains on both: {'yes' if same_pages else 'NO'}")
+    passed = passed and same_pages
+    print(f"\n{'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare HTTP/1.1 and multiplexed HTTP/2 slug sweeps.")
+    parser.add_argument('--base-url', default=BASE_URL, help="origin to sweep (e.g. a local h2 stand-in)")
+    parser.add_argument('--insecure', action='store_true', help="skip TLS verification (self-signed test servers)")
+    parser.add_argument('--h2c', action='store_true', help="use cleartext HTTP/2 with prior knowledge")
+    parser.add_argument('--self-test', action='store_true',
+                        help="check byte counting against local HTTP/1.1 and h2c servers")
+    parser.add_argument('--max-streams', type=int, default=100, help="concurrent streams on the connection")
+    args = parser.parse_args()
+
+    if args.self_test:
+        sys.exit(0 if self_test() is not False else 1)
+
+    urls = [f"{args.base_url.rstrip('/')}/{slug}" for slug in load_managed_slugs()]
+    compare_transports(urls, verify=not args.insecure, h2c=args.h2c, max_streams=args.max_streams)
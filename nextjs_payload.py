@@ -0,0 +1,291 @@
+"""
+Extract hydrated page content from the Next.js payload embedded in server HTML.
+Pages rendered by the App Router ship their React Server Component tree as
+"flight" chunks (self.__next_f.push(...)) so the client can hydrate. Parsing
+those chunks recovers the creator, image and button data without a browser.
+"""
+
+import json
+import re
+from html.parser import HTMLParser
+
+FLIGHT_PUSH_PATTERN = re.compile(r'self\.__next_f\.push\((\[.*?\])\)\s*</script>', re.DOTALL)
+CHUNK_SRC_PATTERN = re.compile(r'/_next/static/chunks/[^"\'\s<>]+\.js')
+TEXT_ROW_PATTERN = re.compile(r'T([0-9a-fA-F]+),')
+TYPED_ROW_PATTERN = re.compile(r'([A-Z]{1,2})(?=[\[{"])')
+
+# Image props on the DB-backed page record rendered by components/pages/public-page.tsx
+DB_PAGE_IMAGE_FIELDS = {
+    'avatar_url': None,  # alt is the page title
+    'exclusive_preview_image': 'Exclusive Content Preview'
+}
+
+# Router props holding Next's built-in error boundaries, not page content
+SKIPPED_PROPS = {'notFound', 'forbidden', 'unauthorized'}
+
+# Fields the browser path reports that we try to recover from the payload
+EXTRACTED_FIELDS = ['creator_name', 'images', 'buttons']
+
+
+def extract_flight_data(html_content):
+    """Concatenate the string chunks pushed to self.__next_f."""
+    data = []
+    for match in FLIGHT_PUSH_PATTERN.finditer(html_content):
+        try:
+            chunk = json.loads(match.group(1))
+        except ValueError:
+            continue
+        if len(chunk) > 1 and chunk[0] == 1 and isinstance(chunk[1], str):
+            data.append(chunk[1])
+    return ''.join(data)
+
+
+def parse_flight_rows(flight_data):
+    """Split flight data into {row_id: {'type': ..., 'value': ...}} rows."""
+    rows = {}
+    hints = []
+    pos = 0
+    length = len(flight_data)
+
+    while pos < length:
+        colon = flight_data.find(':', pos)
+        if colon == -1:
+            break
+        row_id = flight_data[pos:colon]
+        start = colon + 1
+
+        # Text rows carry a byte length instead of a newline terminator
+        text_match = TEXT_ROW_PATTERN.match(flight_data, start)
+        if text_match:
+            size = int(text_match.group(1), 16)
+            raw = flight_data[text_match.end():text_match.end() + size].encode('utf-8')[:size]
+            text = raw.decode('utf-8', errors='ignore')
+            rows[row_id] = {'type': 'T', 'value': text}
+            pos = text_match.end() + len(text)
+            continue
+
+        end = flight_data.find('\n', start)
+        if end == -1:
+            end = length
+        line = flight_data[start:end]
+        pos = end + 1
+
+        row_type = ''
+        typed = TYPED_ROW_PATTERN.match(line)
+        if typed:
+            row_type = typed.group(1)
+            line = line[typed.end():]
+
+        try:
+            value = json.loads(line)
+        except ValueError:
+            value = line
+
+        if row_type == 'HL' or not row_id:
+            hints.append(value)
+        else:
+            rows[row_id] = {'type': row_type, 'value': value}
+
+    return rows, hints
+
+
+def _resolve(value, rows, seen):
+    """Follow $<id>, $L<id> and $@<id> references into the row table."""
+    if not isinstance(value, str) or not value.startswith('$') or value.startswith('$$'):
+        return value
+    for prefix in ('$L', '$@', '$'):
+        if value.startswith(prefix):
+            row_id = value[len(prefix):]
+            break
+    row = rows.get(row_id)
+    if row is None or row_id in seen:
+        return value
+    seen.add(row_id)
+    return row['value']
+
+
+def _walk(node, rows, visit, seen):
+    """Depth-first walk over React elements, calling visit(type, props) for each."""
+    node = _resolve(node, rows, seen)
+
+    if isinstance(node, list):
+        if len(node) == 4 and node[0] == '$' and isinstance(node[1], str) and isinstance(node[3], dict):
+            visit(node[1], node[3])
+            for key, value in node[3].items():
+                if key not in SKIPPED_PROPS:
+                    _walk(value, rows, visit, seen)
+        else:
+            for item in node:
+                _walk(item, rows, visit, seen)
+    elif isinstance(node, dict):
+        visit(None, node)
+        for value in node.values():
+            _walk(value, rows, visit, seen)
+
+
+def _element_text(node, rows, seen):
+    """Collect the plain text rendered by an element's children."""
+    node = _resolve(node, rows, seen)
+    if isinstance(node, str):
+        return '' if node.startswith('$') else node
+    if isinstance(node, (int, float)) and not isinstance(node, bool):
+        return str(node)
+    if isinstance(node, list):
+        if len(node) == 4 and node[0] == '$' and isinstance(node[3], dict):
+            return _element_text(node[3].get('children'), rows, seen)
+        return ''.join(_element_text(item, rows, seen) for item in node)
+    return ''
+
+
+def _is_obfuscated(src):
+    return 'ufs.sh' in src or '2eovi9l2gc' in src
+
+
+class _ServerHtmlCollector(HTMLParser):
+    """Collects h1 text, images and buttons/links from server-rendered HTML."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.headings = []
+        self.images = []
+        self.buttons = []
+        self._open = []  # [tag, text parts, attrs] for h1/a/button being read
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'img' and attrs.get('src'):
+            self.images.append((attrs['src'], attrs.get('alt') or ''))
+        elif tag in ('h1', 'a', 'button'):
+            self._open.append([tag, [], attrs])
+
+    def handle_data(self, data):
+        for entry in self._open:
+            entry[1].append(data)
+
+    def handle_endtag(self, tag):
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i][0] == tag:
+                tag, parts, attrs = self._open.pop(i)
+                text = ''.join(parts).strip()
+                if tag == 'h1':
+                    if text:
+                        self.headings.append(text)
+                elif text or attrs.get('href') or attrs.get('onclick'):
+                    self.buttons.append({'text': text, 'href': attrs.get('href') or '',
+                                         'onclick': attrs.get('onclick') or '', 'tag': tag})
+                break
+
+
+def _fill_from_server_html(data, html_content, add_image):
+    """Fill fields the payload left empty from the server-rendered DOM; returns the fields filled."""
+    collector = _ServerHtmlCollector()
+    collector.feed(html_content)
+    collector.close()
+
+    filled = []
+    if not data['creator_name'] and collector.headings:
+        data['creator_name'] = collector.headings[0]
+        filled.append('creator_name')
+    if not data['images'] and collector.images:
+        for src, alt in collector.images:
+            add_image(src, alt)
+        filled.append('images')
+    if not data['buttons'] and collector.buttons:
+        data['buttons'] = collector.buttons
+        filled.append('buttons')
+    return filled
+
+
+def extract_payload_content(html_content, url=''):
+    """
+    Recover creator, image and button data from the embedded Next.js payload.
+    Fields the payload lacks are filled from the server-rendered DOM (listed in
+    server_html_fields). Returns the same field shapes as
+    content_crawler.extract_content_data, plus the client chunks involved and
+    the fields only a browser could produce.
+    """
+    flight_data = extract_flight_data(html_content)
+    rows = parse_flight_rows(flight_data)[0]
+
+    data = {
+        'url': url,
+        'title': '',
+        'creator_name': '',
+        'images': [],
+        'buttons': [],
+        'text_content': [],
+        'client_components': [],
+        'chunk_refs': sorted(set(CHUNK_SRC_PATTERN.findall(html_content))),
+        'has_payload': bool(flight_data),
+        'server_html_fields': [],
+        'browser_only_fields': []
+    }
+
+    for row in rows.values():
+        if row['type'] == 'I' and isinstance(row['value'], list) and len(row['value']) >= 3:
+            chunks = [chunk for chunk in row['value'][1][1::2] if isinstance(chunk, str)]
+            if not chunks:
+                continue  # Framework internals (router, boundaries) ship with the main bundle
+            data['client_components'].append({'export': row['value'][2] or 'default', 'chunks': chunks})
+            for chunk in chunks:
+                if f'/_next/{chunk}' not in data['chunk_refs']:
+                    data['chunk_refs'].append(f'/_next/{chunk}')
+
+    seen_images = set()
+
+    def add_image(src, alt):
+        if src and src not in seen_images:
+            seen_images.add(src)
+            data['images'].append({'src': src, 'alt': alt or '', 'is_obfuscated': _is_obfuscated(src)})
+
+    def visit(element_type, props):
+        if element_type is None:
+            # Plain props objects: the DB page record and its links
+            if 'slug' in props and 'title' in props:
+                if not data['creator_name']:
+                    data['creator_name'] = props.get('title') or props.get('slug') or ''
+                for field, alt in DB_PAGE_IMAGE_FIELDS.items():
+                    if isinstance(props.get(field), str):
+                        add_image(props[field], alt or props.get('title') or props.get('slug'))
+            if 'label' in props and 'url' in props and props.get('is_active', True):
+                data['buttons'].append({
+                    'text': str(props['label']),
+                    'href': str(props['url']),
+                    'onclick': '',
+                    'tag': 'button'
+                })
+            return
+
+        if element_type == 'title' and not data['title']:
+            data['title'] = _element_text(props.get('children'), rows, set()).strip()
+        elif element_type == 'img':
+            add_image(props.get('src', ''), props.get('alt', ''))
+        elif element_type in ('a', 'button'):
+            text = _element_text(props.get('children'), rows, set()).strip()
+            href = props.get('href', '') if isinstance(props.get('href'), str) else ''
+            if text or href:
+                data['buttons'].append({'text': text, 'href': href, 'onclick': '', 'tag': element_type})
+        elif element_type in ('h1', 'h2', 'p', 'span'):
+            text = _element_text(props.get('children'), rows, set()).strip()
+            if text:
+                data['text_content'].append(text)
+                if element_type == 'h1' and not data['creator_name']:
+                    data['creator_name'] = text
+
+    # The root row holds the route tree; everything else hangs off references
+    if '0' in rows:
+        _walk(rows['0']['value'], rows, visit, {'0'})
+    else:
+        for row in rows.values():
+            _walk(row['value'], rows, visit, set())
+
+    # Fields the payload does not carry may still be in the server-rendered HTML
+    data['server_html_fields'] = _fill_from_server_html(data, html_content, add_image)
+
+    # A client component boundary means anything missing from both is rendered in the browser
+    if data['client_components']:
+        for field in EXTRACTED_FIELDS:
+            if not data[field]:
+                data['browser_only_fields'].append(field)
+
+    return data
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Fetch/parse pipeline with parsing in a process pool.
+extract_content_data (BeautifulSoup parsing plus pattern scans) is pure
+Python and holds the GIL, so threads that fetch concurrently still parse on
+one core. Here fetch threads only download; each body is copied once into a
+shared memory block and a worker process decodes it straight from there, so
+the page never goes through a pickle pipe. Two bounds give backpressure: the
+queue between fetchers and the dispatcher, and the number of parse jobs in
+flight. When parsing falls behind, fetchers block instead of piling up bodies.
+
+The pool costs a copy and a round trip per page, which only pays off with
+cores to spare: by default it gets one process per core beyond the first,
+and on a single core pages are parsed inline (the benchmark shows why).
+Workers parse without the script index; the dispatcher counts new scripts
+against the one index, so counts do not depend on which worker got a page.
+
+    python parse_pipeline.py --parse-workers 4           # crawl managed slugs
+    python parse_pipeline.py --benchmark --pages 600     # parse throughput by worker count
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+from fetcher import BASE_URL, load_managed_slugs, make_session
+from rate_control import fetch_with_retry, new_rate_controller, print_controller_summary
+from results_store import finish_run, open_store, record_extraction, record_fetch, start_run
+from script_cache import count_new_scripts, format_index_stats, load_script_index, save_script_index
+
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_QUEUE_SIZE = 32
+BENCHMARK_SAMPLES = ['crawled__rachel.html', 'crawled__rachelirl.html', 'crawled__rachsotiny.html',
+                     'rachelirl_selenium_result.html']
+
+FETCHER_DONE = None  # Put on the fetched queue by each fetch thread as it exits
+
+
+def default_parse_workers():
+    """One parse process per core beyond the first; 0 (parse inline) on a single core."""
+    return (os.cpu_count() or 1) - 1
+
+
+_process_script_index = None
+
+
+def _script_index():
+    """
+    In-memory script index for this process, so repeated scripts skip analysis
+    in the parse stage too; new_scripts is recounted against the crawl's index.
+    """
+    global _process_script_index
+    if _process_script_index is None:
+        _process_script_index = load_script_index(None)
+    return _process_script_index
+
+
+def parse_shared_body(shm_name, size, url, encoding='utf-8'):
+    """Worker side: decode a body straight from shared memory and run the extraction."""
+    from content_crawler import extract_content_data
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        with shm.buf[:size] as view:
+            html = str(view, encoding, 'replace')
+    finally:
+        shm.close()
+    return extract_content_data(html, url, script_index=_script_index())
+
+
+def _share_body(body):
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(body)))
+    shm.buf[:len(body)] = body
+    return shm
+
+
+def new_parse_stage(parse_workers=None, max_in_flight=None):
+    """
+    Process pool plus the in-flight bound that blocks submitters when parsing
+    falls behind. parse_workers=0 parses inline in the submitting thread.
+    """
+    parse_workers = default_parse_workers() if parse_workers is None else parse_workers
+    if parse_workers < 1:
+        return {'pool': None, 'workers': 0, 'slots': None}
+    # Workers must share the parent's resource tracker: with their own, each would try to
+    # clean up every block it attached to when it exits, long after the parent unlinked them
+    resource_tracker.ensure_running()
+    return {
+        'pool': ProcessPoolExecutor(max_workers=parse_workers),
+        'workers': parse_workers,
+        'slots': threading.BoundedSemaphore(max_in_flight or parse_workers * 2)
+    }
+
+
+def submit_body(stage, body, url, on_done):
+    """
+    Hand one body to the pool; blocks while the in-flight limit is reached.
+    on_done(url, data, error) runs in a pool callback thread (or right away when parsing inline).
+    """
+    if stage['pool'] is None:
+        from content_crawler import extract_content_data
+        try:
+            data, error = extract_content_data(body.decode('utf-8', errors='replace'), url,
+                                               script_index=_script_index()), None
+        except Exception as e:
+            data, error = None, e
+        on_done(url, data, error)
+        return
+
+    stage['slots'].acquire()
+    shm = _share_body(body)
+
+    def finished(future):
+        shm.close()
+        shm.unlink()
+        stage['slots'].release()
+        error = future.exception()
+        on_done(url, None if error else future.result(), error)
+
+    stage['pool'].submit(parse_shared_body, shm.name, len(body), url).add_done_callback(finished)
+
+
+def close_parse_stage(stage):
+    if stage['pool'] is not None:
+        stage['pool'].shutdown(wait=True)
+
+
+def run_pipeline(urls, parse_workers=None, fetch_workers=DEFAULT_FETCH_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 store=None, run_id=None, script_index=None):
+    """
+    Fetch urls on threads and parse them in the process pool. Returns
+    (pages, stats) with pages in completion order. With a script_index each
+    page's new_scripts is counted against it as results come back.
+    """
+    session = make_session()
+    controller = new_rate_controller()
+    fetched_queue = queue.Queue(maxsize=queue_size)
+    url_queue = queue.Queue()
+    for url in urls:
+        url_queue.put(url)
+
+    pages = []
+    errors = {}
+    lock = threading.Lock()
+    stats = {'fetch_blocked_seconds': 0.0, 'bytes': 0, 'fetch_ids': {}}
+
+    def fetch_loop():
+        try:
+            while True:
+                try:
+                    url = url_queue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    fetched = fetch_with_retry(url, controller, session=session)
+                except Exception as e:
+                    with lock:
+                        errors[url] = f"fetch failed: {e}"
+                    continue
+                wait_start = time.perf_counter()
+                fetched_queue.put(fetched)  # Blocks when the parse stage is behind
+                with lock:
+                    stats['fetch_blocked_seconds'] += time.perf_counter() - wait_start
+        finally:
+            fetched_queue.put(FETCHER_DONE)  # However the thread ends, the dispatcher stops waiting for it
+
+    def on_done(url, data, error):
+        with lock:
+            if error is not None:
+                errors[url] = str(error)
+                return
+            if script_index is not None:
+                data['new_scripts'] = count_new_scripts(script_index, data['script_fingerprints'])
+            pages.append(data)
+
+    stage = new_parse_stage(parse_workers)
+    start_time = time.perf_counter()
+    fetchers = [threading.Thread(target=fetch_loop) for _ in range(min(fetch_workers, len(urls)) or 1)]
+    for thread in fetchers:
+        thread.start()
+
+    running = len(fetchers)
+    while running:
+        fetched = fetched_queue.get()
+        if fetched is FETCHER_DONE:
+            running -= 1
+            continue
+        if store is not None:
+            stats['fetch_ids'][fetched['url']] = record_fetch(store, run_id, fetched)
+        if fetched['error'] or fetched['status_code'] != 200:
+            errors[fetched['url']] = fetched['error'] or f"status {fetched['status_code']}"
+            continue
+        stats['bytes'] += len(fetched['content'])
+        submit_body(stage, fetched['content'], fetched['url'], on_done)
+
+    for thread in fetchers:
+        thread.join()
+    close_parse_stage(stage)
+    stats['elapsed'] = time.perf_counter() - start_time
+    stats['pages'] = len(pages)
+    stats['errors'] = errors
+    stats['parse_workers'] = stage['workers']
+    print_controller_summary(controller)
+    return pages, stats
+
+
+def _load_samples(sample_paths=BENCHMARK_SAMPLES):
+    samples = []
+    for path in sample_paths:
+        try:
+            with open(path, 'rb') as f:
+                samples.append((f"{BASE_URL}/{os.path.splitext(path)[0]}", f.read()))
+        except FileNotFoundError:
+            pass
+    return samples
+
+
+def benchmark_parse_stage(pages=600, worker_counts=None):
+    """Parse throughput inline and with 1..N worker processes, on saved pages from earlier crawls."""
+    from content_crawler import extract_content_data
+
+    samples = _load_samples()
+    bodies = [samples[i % len(samples)] for i in range(pages)]
+    cores = os.cpu_count() or 1
+    worker_counts = worker_counts or sorted({1, 2, 4, cores} | ({cores * 2} if cores > 1 else set()))
+
+    print("PARSE STAGE BENCHMARK")
+    print("=" * 60)
+    print(f"Pages: {pages} ({len(samples)} saved pages, {sum(len(body) for _, body in bodies) / 1048576:.1f} MiB), "
+          f"CPU cores: {cores}")
+    print("=" * 60)
+
+    start_time = time.perf_counter()
+    for url, body in bodies:
+        extract_content_data(body.decode('utf-8', errors='replace'), url, script_index=_script_index())
+    inline = pages / (time.perf_counter() - start_time)
+    print(f"   inline (no pool)    {inline:8.1f} pages/s")
+
+    results = {'inline': inline}
+    for workers in worker_counts:
+        stage = new_parse_stage(workers)
+        # Warm the pool so process start-up is not counted
+        list(stage['pool'].map(_noop, range(workers)))
+        done = []
+        start_time = time.perf_counter()
+        for url, body in bodies:
+            submit_body(stage, body, url, lambda url, data, error: done.append(error))
+        close_parse_stage(stage)
+        rate = pages / (time.perf_counter() - start_time)
+        failed = sum(1 for error in done if error is not None)
+        results[workers] = rate
+        print(f"   {workers:>2} worker processes {rate:8.1f} pages/s  ({rate / inline:.2f}x inline"
+              f"{f', {failed} failed' if failed else ''})")
+
+    if cores == 1:
+        print("\nOnly one core here: the pool can only add overhead, so crawls parse inline by default.")
+    return results
+
+
+def _noop(value):
+    return value
+
+
+def crawl_with_parse_pool(slugs, parse_workers=None, fetch_workers=DEFAULT_FETCH_WORKERS, base_url=BASE_URL):
+    urls = [f"{base_url.rstrip('/')}/{slug}" for slug in slugs]
+    store = open_store()
+    run_id = start_run(store, 'parse_pipeline', {'pages': len(urls), 'parse_workers': parse_workers,
+                                                 'fetch_workers': fetch_workers})
+
+    print("PARSE POOL CRAWL")
+    print("=" * 60)
+    parse_workers = default_parse_workers() if parse_workers is None else parse_workers
+    print(f"Pages: {len(urls)}, fetch threads: {fetch_workers}, "
+          f"parse processes: {parse_workers or 'none (inline)'}")
+    print("=" * 60)
+
+    script_index = load_script_index()
+    pages, stats = run_pipeline(urls, parse_workers=parse_workers, fetch_workers=fetch_workers, store=store,
+                                run_id=run_id, script_index=script_index)
+    save_script_index(script_index)
+    for page in pages:
+        record_extraction(store, run_id, page, fetch_id=stats['fetch_ids'].get(page['url']))
+    finish_run(store, run_id)
+    store.close()
+
+    with open('parsed_pages.json', 'w', encoding='utf-8') as f:
+        json.dump(pages, f, indent=2, ensure_ascii=False)
+
+    print(f"\nRESULTS:")
+    print(f"   Parsed: {stats['pages']} pages ({stats['bytes'] / 1048576:.1f} MiB) in {stats['elapsed']:.2f}s "
+          f"({stats['pages'] / stats['elapsed'] if stats['elapsed'] else 0.0:.1f} pages/s)")
+    print(f"   Fetchers blocked on the parse stage: {stats['fetch_blocked_seconds']:.2f}s")
+    print(f"   Script index: {format_index_stats(script_index)}")
+    for url, error in stats['errors'].items():
+        print(f"   ERROR {url}: {error}")
+    print(f"\n[SAVE] Extractions saved to: parsed_pages.json (run {run_id} in the results store)")
+    return pages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch on threads, parse in a process pool.")
+    parser.add_argument('--parse-workers', type=int,
+                        help="parse processes (default: CPU cores - 1; 0 parses inline)")
+    parser.add_argument('--fetch-workers', type=int, default=DEFAULT_FETCH_WORKERS, help="fetch threads")
+    parser.add_argument('--benchmark', action='store_true', help="measure parse throughput by worker count")
+    parser.add_argument('--pages', type=int, default=600, help="pages for --benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_parse_stage(args.pages)
+    else:
+        crawl_with_parse_pool(load_managed_slugs(), parse_workers=args.parse_workers, fetch_workers=args.fetch_workers)
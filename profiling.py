@@ -0,0 +1,172 @@
+"""
+Profiling mode for extraction and analysis runs.
+Each page's parse/extract step runs under cProfile, tracemalloc and a stack
+sampler. Per page we write collapsed stacks (flamegraph.pl / speedscope
+input) and a peak-allocation report; at the end of the run the function
+stats of every page are merged to flag the top offenders.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+TOP_ALLOCATIONS = 15
+
+
+def new_profile_run(output_dir='profiles'):
+    """Create the state for a profiling run writing into output_dir."""
+    os.makedirs(output_dir, exist_ok=True)
+    return {
+        'output_dir': output_dir,
+        'stats': None,
+        'pages': []
+    }
+
+
+def _safe_label(label):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_') or 'page'
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _sample_stacks(thread_id, stop_event, counts):
+    """Sample the target thread's stack until stop_event is set."""
+    while not stop_event.wait(SAMPLE_INTERVAL):
+        frame = sys._current_frames().get(thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(_frame_name(frame))
+            frame = frame.f_back
+        if stack:
+            key = ';'.join(reversed(stack))
+            counts[key] = counts.get(key, 0) + 1
+
+
+def profile_page(run, label, func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) for one page under the profilers and return its result.
+    Writes <label>.collapsed, <label>.alloc.txt and <label>.pstats to the run directory.
+    """
+    label = _safe_label(label)
+    counts = {}
+    stop_event = threading.Event()
+    sampler = threading.Thread(target=_sample_stacks, args=(threading.get_ident(), stop_event, counts),
+                               daemon=True)
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(25)
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    before = tracemalloc.take_snapshot()
+
+    profiler = cProfile.Profile()
+    sampler.start()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        stop_event.set()
+        sampler.join()
+
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        if not was_tracing:
+            tracemalloc.stop()
+
+        _write_page_reports(run, label, profiler, counts, before, after, peak - baseline, elapsed)
+
+
+def _write_page_reports(run, label, profiler, counts, before, after, peak_bytes, elapsed):
+    """Write the per-page profile artifacts and fold stats into the run."""
+    base = os.path.join(run['output_dir'], label)
+
+    with open(f'{base}.collapsed', 'w', encoding='utf-8') as f:
+        for stack, count in sorted(counts.items()):
+            f.write(f'{stack} {count}\n')
+
+    profiler.dump_stats(f'{base}.pstats')
+
+    ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    differences = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), 'lineno')
+    with open(f'{base}.alloc.txt', 'w', encoding='utf-8') as f:
+        f.write(f'Page: {label}\n')
+        f.write(f'Elapsed: {elapsed:.3f}s\n')
+        f.write(f'Peak allocated during page: {peak_bytes:,} bytes\n\n')
+        f.write(f'Top {TOP_ALLOCATIONS} allocation sites (net growth):\n')
+        for stat in differences[:TOP_ALLOCATIONS]:
+            f.write(f'  {stat}\n')
+
+    if run['stats'] is None:
+        run['stats'] = pstats.Stats(profiler)
+    else:
+        run['stats'].add(profiler)
+
+    run['pages'].append({
+        'label': label,
+        'elapsed': elapsed,
+        'peak_bytes': peak_bytes,
+        'samples': sum(counts.values()),
+        'collapsed': f'{base}.collapsed',
+        'alloc_report': f'{base}.alloc.txt'
+    })
+
+
+def top_functions(run, limit=10):
+    """Return the functions with the most own time across every profiled page."""
+    if run['stats'] is None:
+        return []
+
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in run['stats'].stats.items():
+        rows.append({
+            'function': f'{os.path.basename(filename)}:{line}({name})',
+            'calls': ncalls,
+            'tottime': tottime,
+            'cumtime': cumtime
+        })
+    rows.sort(key=lambda row: row['tottime'], reverse=True)
+    return rows[:limit]
+
+
+def finish_profile_run(run, limit=10):
+    """Print the run's worst pages and functions and save profile_summary.json."""
+    offenders = top_functions(run, limit)
+    pages = sorted(run['pages'], key=lambda page: page['elapsed'], reverse=True)
+
+    print(f"\nPROFILE SUMMARY ({len(pages)} pages):")
+    for page in pages[:limit]:
+        print(f"   {page['label']}: {page['elapsed']:.3f}s, peak {page['peak_bytes']:,} bytes")
+
+    print(f"\nTOP OFFENDING FUNCTIONS (own time across run):")
+    for i, row in enumerate(offenders):
+        print(f"   {i+1}. {row['function']} - {row['tottime']:.3f}s own, "
+              f"{row['cumtime']:.3f}s cumulative, {row['calls']} calls")
+
+    if run['stats'] is not None:
+        stream = io.StringIO()
+        run['stats'].stream = stream
+        run['stats'].sort_stats('cumulative').print_stats(30)
+        with open(os.path.join(run['output_dir'], 'run_cumulative.txt'), 'w', encoding='utf-8') as f:
+            f.write(stream.getvalue())
+
+    summary_path = os.path.join(run['output_dir'], 'profile_summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump({'pages': run['pages'], 'top_functions': offenders}, f, indent=2)
+    print(f"\n[SAVE] Profiles saved to: {run['output_dir']}/ (summary: {summary_path})")
+
+    return offenders
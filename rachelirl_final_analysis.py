@@ -1,11 +1,96 @@
 #!/usr/bin/env python3
 """
-Final comprehensive analysis of viewit.bio/rachelirl
-This script provides a complete summary of what we found.
+Audit report across every slug and every stored run.
+Per-slug summaries (latest status, blocked rate, median response time,
+content changes) are read from the results store, where they are updated as
+each run records its results. The original rachelirl file analysis is kept
+behind --rachelirl-files.
 """
 
 import json
 import os
+import time
+
+from results_store import BLOCKED, DEFAULT_DB_PATH, open_store, rebuild_summaries, slug_summaries, slugs_became_blocked
+
+BLOCKED_WINDOW_DAYS = 30
+
+def _format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp)) if timestamp else 'never'
+
+def generate_audit_report(days=BLOCKED_WINDOW_DAYS, rebuild=False):
+    """
+    Print the audit report for every slug from the materialized summaries.
+    Reads one summary row per slug, so the cost does not grow with history.
+    """
+    if not os.path.exists(DEFAULT_DB_PATH):
+        print(f"\nRESULTS STORE: {DEFAULT_DB_PATH} not found (run the crawl scripts first)")
+        return None
+    
+    store = open_store()
+    has_history = store.execute('SELECT EXISTS (SELECT 1 FROM fetches) '
+                                'OR EXISTS (SELECT 1 FROM browser_verdicts)').fetchone()[0]
+    has_summaries = store.execute('SELECT EXISTS (SELECT 1 FROM slug_summaries)').fetchone()[0]
+    # Summaries written before transitions were kept have blocked counts but no transition rows
+    missing_transitions = store.execute('SELECT EXISTS (SELECT 1 FROM slug_summaries WHERE blocked > 0) '
+                                        'AND NOT EXISTS (SELECT 1 FROM blocked_transitions)').fetchone()[0]
+    if rebuild or (has_history and not has_summaries) or missing_transitions:
+        rebuilt = rebuild_summaries(store)
+        print(f"\nRebuilt slug summaries from {rebuilt:,} stored observations")
+    
+    print(f"\nAUDIT REPORT ({DEFAULT_DB_PATH}):")
+    runs = store.execute('SELECT tool, COUNT(*) AS runs, MAX(started_at) AS last FROM runs GROUP BY tool').fetchall()
+    for row in runs:
+        print(f"  {row['tool']}: {row['runs']} runs, last {_format_time(row['last'])}")
+    
+    summaries = slug_summaries(store)
+    print(f"\nPER-SLUG SUMMARY ({len(summaries)} slugs):")
+    print(f"  {'slug':<24} {'latest':<12} {'status':>6} {'blocked':>8} {'median':>8} {'changes':>8}  last seen")
+    for summary in summaries:
+        median = summary['median_response_time']
+        print(f"  {summary['slug'] or '/':<24} {(summary['latest_verdict'] or 'n/a'):<12} "
+              f"{summary['latest_status'] or '-':>6} {summary['blocked_rate']:>8.0%} "
+              f"{(f'{median * 1000:.0f}ms' if median else '-'):>8} {summary['content_changes']:>8}  "
+              f"{_format_time(summary['latest_at'])}")
+    
+    since = time.time() - days * 86400
+    became_blocked = slugs_became_blocked(store, since)
+    print(f"\nSLUGS THAT BECAME BLOCKED IN THE LAST {days} DAYS: "
+          f"{len(set(row['slug'] for row in became_blocked))}")
+    for row in became_blocked:
+        now = 'still blocked' if row['latest_verdict'] == BLOCKED else f"now {row['latest_verdict']}"
+        print(f"  /{row['slug']}: {row['previous_verdict'] or 'first seen'} -> blocked at "
+              f"{_format_time(row['became_blocked_at'])} ({now})")
+    
+    verdict_counts = {}
+    for summary in summaries:
+        verdict = summary['latest_verdict'] or 'n/a'
+        verdict_counts[verdict] = verdict_counts.get(verdict, 0) + 1
+    timed = [summary for summary in summaries if summary['median_response_time']]
+    slowest = sorted(timed, key=lambda summary: summary['median_response_time'], reverse=True)[:5]
+    
+    print(f"\nKEY FINDINGS:")
+    print(f"  • Latest verdicts: {', '.join(f'{count} {verdict}' for verdict, count in sorted(verdict_counts.items()))}")
+    print(f"  • Slugs ever blocked: {len([summary for summary in summaries if summary['blocked']])}/{len(summaries)}")
+    print(f"  • Slugs whose content changed between fetches: "
+          f"{len([summary for summary in summaries if summary['content_changes']])}")
+    if slowest:
+        slowest_text = ', '.join(f"/{summary['slug']} {summary['median_response_time'] * 1000:.0f}ms"
+                                 for summary in slowest)
+        print(f"  • Slowest median responses: {slowest_text}")
+    
+    report = {
+        'generated_at': time.time(),
+        'slugs': summaries,
+        'became_blocked': [dict(row) for row in became_blocked],
+        'latest_verdicts': verdict_counts
+    }
+    with open('audit_report.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[SAVE] Audit report saved to: audit_report.json")
+    
+    store.close()
+    return report
 
 def analyze_rachelirl_findings():
     """Analyze all the findings from our rachelirl investigation."""
@@ -91,36 +176,18 @@ def analyze_rachelirl_findings():
             print(f"  Blocked Page: YES")
         else:
             print(f"  Blocked Page: NO")
-    
-    print(f"\nKEY FINDINGS:")
-    print(f"  • The rachelirl page shows only a loading screen with basic HTTP requests")
-    print(f"  • JavaScript execution reveals the page redirects to a 'blocked' error page")
-    print(f"  • The error indicates 'ERR_QUIC_PROTOCOL_ERROR' - network/protocol issue")
-    print(f"  • No actual content (images, buttons, text) is accessible")
-    print(f"  • The page appears to have bot protection or access restrictions")
-    
-    print(f"\nTECHNICAL DETAILS:")
-    print(f"  • Next.js application with server-side rendering")
-    print(f"  • Uses React with client-side hydration")
-    print(f"  • Implements loading screens before content loads")
-    print(f"  • Has error handling that shows 'blocked' pages")
-    print(f"  • User agent is accepted but content is restricted")
-    
-    print(f"\nCONCLUSION:")
-    print(f"  The rachelirl link (https://www.viewit.bio/rachelirl) is:")
-    print(f"  [OK] Accessible with the specified user agent")
-    print(f"  [OK] Returns HTTP 200 status")
-    print(f"  [FAIL] Shows only loading screen with basic requests")
-    print(f"  [FAIL] Redirects to blocked/error page with JavaScript")
-    print(f"  [FAIL] No actual content is visible or accessible")
-    print(f"  [FAIL] Appears to have bot protection or access restrictions")
-    
-    print(f"\nRECOMMENDATIONS:")
-    print(f"  • The page may require specific conditions to load content")
-    print(f"  • Bot detection might be more sophisticated than basic user agent checking")
-    print(f"  • The page might require additional headers or cookies")
-    print(f"  • There could be geographic or time-based restrictions")
-    print(f"  • The page might be temporarily down or under maintenance")
 
 if __name__ == "__main__":
-    analyze_rachelirl_findings()
+    import argparse
+    parser = argparse.ArgumentParser(description="Audit report across every slug and run in the results store.")
+    parser.add_argument('--days', type=int, default=BLOCKED_WINDOW_DAYS, help="window for newly blocked slugs")
+    parser.add_argument('--rebuild', action='store_true', help="recompute slug summaries from raw history")
+    parser.add_argument('--rachelirl-files', action='store_true',
+                        help="also print the legacy rachelirl JSON/HTML file analysis")
+    args = parser.parse_args()
+    
+    print("VIEWIT AUDIT REPORT")
+    print("=" * 60)
+    generate_audit_report(days=args.days, rebuild=args.rebuild)
+    if args.rachelirl_files:
+        analyze_rachelirl_findings()
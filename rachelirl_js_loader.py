@@ -4,14 +4,16 @@ Script to try loading rachelirl with JavaScript execution simulation.
 This attempts to get the actual content that loads after the initial page.
 """
 
-import requests
 import time
 import json
 from bs4 import BeautifulSoup
+from fetcher import BASE_URL, USER_AGENT, fetch_page, make_session
+from tiered_fetch import AMBIGUOUS_VERDICTS, classify_page
+from results_store import (finish_run, open_store, record_browser_verdict, record_extraction, record_fetch,
+                           start_run)
 
 # Configuration
-TARGET_URL = "https://www.viewit.bio/rachelirl"
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
+TARGET_URL = f"{BASE_URL}/rachelirl"
 
 def try_load_with_selenium():
     """Try using Selenium to load the page with JavaScript execution."""
@@ -97,8 +99,13 @@ def try_load_with_selenium():
                 f.write(final_html)
             print(f"\n[SAVE] Selenium result saved to: rachelirl_selenium_result.html")
             
+            verdict, reason, _ = classify_page(driver.current_url, 200, final_html)
+            
             return {
                 'success': True,
+                'final_url': driver.current_url,
+                'verdict': verdict,
+                'reason': reason,
                 'text_content': all_text,
                 'images_count': len(images),
                 'buttons_count': len(buttons),
@@ -116,6 +123,64 @@ def try_load_with_selenium():
         print(f"Selenium error: {e}")
         return None
 
+def try_extract_from_payload(store=None, run_id=None):
+    """Fetch over plain HTTP, classify the page and read its embedded Next.js payload."""
+    print("\nHTTP TIER: EMBEDDED PAYLOAD EXTRACTION")
+    print("=" * 50)
+    
+    fetched = fetch_page(TARGET_URL)
+    if fetched['error']:
+        print(f"Payload fetch error: {fetched['error']}")
+        if store is not None:
+            record_fetch(store, run_id, fetched)
+        return None
+    
+    start_time = time.time()
+    verdict, reason, payload = classify_page(fetched['final_url'], fetched['status_code'], fetched['text'])
+    parse_time = time.time() - start_time
+    
+    print(f"Status: {fetched['status_code']}")
+    print(f"Fetch time: {fetched['elapsed']:.2f}s, classify + extract time: {parse_time:.3f}s")
+    print(f"Verdict: {verdict.upper()} ({reason})")
+    
+    result = {
+        'success': payload is not None and payload['has_payload'],
+        'status': fetched['status_code'],
+        'final_url': fetched['final_url'],
+        'elapsed': fetched['elapsed'] + parse_time,
+        'verdict': verdict,
+        'reason': reason
+    }
+    
+    if payload is not None:
+        print(f"Flight payload present: {'YES' if payload['has_payload'] else 'NO'}")
+        print(f"Creator: {payload['creator_name'] or 'N/A'}")
+        print(f"Images found: {len(payload['images'])}")
+        print(f"Buttons found: {len(payload['buttons'])}")
+        print(f"Chunk references: {len(payload['chunk_refs'])}")
+        
+        for component in payload['client_components']:
+            print(f"  Client component: {component['export']} ({component['chunks'][-1]})")
+        
+        if payload['browser_only_fields']:
+            print(f"Browser-only fields: {', '.join(payload['browser_only_fields'])}")
+        
+        result.update({
+            'creator_name': payload['creator_name'],
+            'images': payload['images'],
+            'buttons': payload['buttons'],
+            'images_count': len(payload['images']),
+            'buttons_count': len(payload['buttons']),
+            'chunk_refs': payload['chunk_refs'],
+            'browser_only_fields': payload['browser_only_fields']
+        })
+    
+    if store is not None:
+        fetch_id = record_fetch(store, run_id, fetched, verdict=verdict)
+        record_extraction(store, run_id, {**result, 'url': TARGET_URL}, fetch_id=fetch_id, kind='payload')
+    
+    return result
+
 def try_multiple_requests():
     """Try multiple requests with different approaches."""
     print("\nMULTIPLE REQUEST ATTEMPT")
@@ -139,11 +204,12 @@ def try_multiple_requests():
     ]
     
     results = []
+    session = make_session(headers)
     
     for i, test_headers in enumerate(variations):
         print(f"\nRequest {i+1}:")
         try:
-            response = requests.get(TARGET_URL, headers=test_headers, timeout=30)
+            response = session.get(TARGET_URL, headers=test_headers, timeout=30)
             soup = BeautifulSoup(response.text, 'html.parser')
             text = soup.get_text()
             
@@ -176,8 +242,22 @@ def main():
     print(f"Target: {TARGET_URL}")
     print("=" * 60)
     
-    # Try Selenium first
-    selenium_result = try_load_with_selenium()
+    store = open_store()
+    run_id = start_run(store, 'rachelirl_js_loader', {'url': TARGET_URL})
+    
+    # Read what the server already embedded before paying for a browser
+    payload_result = try_extract_from_payload(store, run_id)
+    
+    # Escalate to Selenium only when plain HTTP could not settle the page
+    if payload_result is None or payload_result['verdict'] in AMBIGUOUS_VERDICTS:
+        selenium_result = try_load_with_selenium()
+        if selenium_result:
+            record_browser_verdict(store, run_id, TARGET_URL, selenium_result['verdict'],
+                                   final_url=selenium_result['final_url'], reason=selenium_result['reason'],
+                                   details={k: v for k, v in selenium_result.items() if k != 'text_content'})
+    else:
+        print(f"\nSkipping Selenium: HTTP verdict is {payload_result['verdict'].upper()}")
+        selenium_result = None
     
     # Try multiple requests
     request_results = try_multiple_requests()
@@ -185,6 +265,7 @@ def main():
     # Save all results
     final_results = {
         'target_url': TARGET_URL,
+        'payload_result': payload_result,
         'selenium_result': selenium_result,
         'request_variations': request_results,
         'timestamp': time.time()
@@ -194,9 +275,17 @@ def main():
         json.dump(final_results, f, indent=2, ensure_ascii=False)
     
     print(f"\n[SAVE] Complete analysis saved to: rachelirl_js_analysis.json")
+    finish_run(store, run_id)
     
     # Summary
     print(f"\nSUMMARY:")
+    if payload_result and payload_result.get('success'):
+        print(f"  HTTP tier: {payload_result['verdict'].upper()} - "
+              f"{payload_result['images_count']} images, {payload_result['buttons_count']} buttons")
+        if payload_result['browser_only_fields']:
+            print(f"    Browser-only: {', '.join(payload_result['browser_only_fields'])}")
+    else:
+        print(f"  HTTP tier: no embedded payload")
     if selenium_result and selenium_result.get('success'):
         print(f"  Selenium: SUCCESS - Content loaded")
         print(f"    Images: {selenium_result.get('images_count', 0)}")
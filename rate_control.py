@@ -0,0 +1,190 @@
+"""
+Adaptive per-host rate control for sweeps.
+Each host gets a concurrency limit that grows additively while responses stay
+fast and healthy and is halved on errors, 429/5xx or a latency spike (AIMD).
+Failed fetches are retried with jittered exponential backoff, and a
+Retry-After header (capped) pauses every request to that host until it has
+passed. Sequential sweeps, which never use more than one slot, can ask for
+pacing instead: request starts to a host are spaced by pacing / limit seconds,
+so the gap widens when the host struggles and narrows while it stays healthy.
+"""
+
+import email.utils
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from fetcher import fetch_page
+
+INITIAL_LIMIT = 2.0
+MIN_LIMIT = 1.0
+MAX_LIMIT = 16.0
+DECREASE_FACTOR = 0.5
+LATENCY_SPIKE_FACTOR = 3.0  # a response this many times slower than the host's best counts as congestion
+LATENCY_SPIKE_FLOOR = 0.5  # ...but never below this many seconds
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_AFTER_MAX = 120.0  # a longer Retry-After would stall the sweep; wait this long and let the retry decide
+PACING_INTERVAL = 2.0  # seconds between requests to a host at limit 1, for sequential sweeps
+
+
+def new_rate_controller(initial_limit=INITIAL_LIMIT, max_limit=MAX_LIMIT, pacing=0.0):
+    """
+    Create controller state shared by every thread sweeping through it.
+    pacing > 0 spaces request starts to each host by pacing / limit seconds.
+    """
+    return {
+        'condition': threading.Condition(),
+        'hosts': {},
+        'initial_limit': initial_limit,
+        'max_limit': max_limit,
+        'pacing': pacing
+    }
+
+
+def _host_state(controller, host):
+    hosts = controller['hosts']
+    if host not in hosts:
+        hosts[host] = {
+            'limit': controller['initial_limit'],
+            'in_flight': 0,
+            'not_before': 0.0,
+            'next_start': 0.0,
+            'best_latency': None,
+            'last_decrease': 0.0,
+            'requests': 0,
+            'retries': 0,
+            'throttled': 0,
+            'decreases': 0
+        }
+    return hosts[host]
+
+
+def acquire(controller, host):
+    """Block until the host has a free slot under its limit and no Retry-After pause or pacing gap."""
+    with controller['condition']:
+        while True:
+            state = _host_state(controller, host)
+            wait = max(state['not_before'], state['next_start']) - time.time()
+            if wait <= 0 and state['in_flight'] < int(state['limit']):
+                state['in_flight'] += 1
+                state['next_start'] = time.time() + controller['pacing'] / state['limit']
+                return
+            controller['condition'].wait(timeout=wait if wait > 0 else None)
+
+
+def release(controller, host, fetched):
+    """Free the slot and adjust the host's limit: additive increase, multiplicative decrease."""
+    with controller['condition']:
+        state = _host_state(controller, host)
+        state['in_flight'] -= 1
+        state['requests'] += 1
+
+        if fetched is None or _is_congested(state, fetched):
+            # Halve at most once per in-flight window so one burst of failures is one signal
+            if time.time() - state['last_decrease'] > (state['best_latency'] or 1.0):
+                state['limit'] = max(MIN_LIMIT, state['limit'] * DECREASE_FACTOR)
+                state['last_decrease'] = time.time()
+                state['decreases'] += 1
+        else:
+            state['limit'] = min(controller['max_limit'], state['limit'] + 1.0 / state['limit'])
+        controller['condition'].notify_all()
+
+
+def pause_host(controller, host, seconds):
+    """Hold every request to host for the given number of seconds."""
+    with controller['condition']:
+        state = _host_state(controller, host)
+        state['not_before'] = max(state['not_before'], time.time() + seconds)
+        state['throttled'] += 1
+        controller['condition'].notify_all()
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date, at most RETRY_AFTER_MAX), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(RETRY_AFTER_MAX, float(value))
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return min(RETRY_AFTER_MAX, max(0.0, when.timestamp() - time.time()))
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _is_congested(state, fetched):
+    """Whether a fetch signals an overloaded host; also tracks the host's best latency."""
+    if fetched['error'] or fetched['status_code'] in RETRY_STATUS_CODES:
+        return True
+    latency = fetched['elapsed']
+    best = state['best_latency']
+    state['best_latency'] = latency if best is None else min(best, latency)
+    return best is not None and latency > max(LATENCY_SPIKE_FLOOR, best * LATENCY_SPIKE_FACTOR)
+
+
+def fetch_with_retry(url, controller, session=None, headers=None, max_retries=MAX_RETRIES, fetch=fetch_page):
+    """
+    fetch_page under the host's rate limit, retrying errors, 429 and 5xx.
+    Returns the last fetch result with 'attempts' added.
+    """
+    host = urlparse(url).netloc
+    for attempt in range(max_retries + 1):
+        acquire(controller, host)
+        fetched = None
+        try:
+            fetched = fetch(url, session=session, headers=headers)
+        finally:
+            release(controller, host, fetched)
+
+        fetched['attempts'] = attempt + 1
+        retryable = fetched['error'] is not None or fetched['status_code'] in RETRY_STATUS_CODES
+        if not retryable or attempt == max_retries:
+            return fetched
+
+        retry_after = parse_retry_after(fetched.get('headers', {}).get('Retry-After'))
+        if retry_after is not None:
+            pause_host(controller, host, retry_after)
+            delay = retry_after
+        else:
+            delay = backoff_delay(attempt)
+        with controller['condition']:
+            _host_state(controller, host)['retries'] += 1
+        print(f"  Retry {attempt + 1}/{max_retries} for {url} in {delay:.1f}s "
+              f"({fetched['error'] or fetched['status_code']})")
+        time.sleep(delay)
+    return fetched
+
+
+def run_controlled(items, func, controller, max_workers=None):
+    """
+    Run func(item) for every item on a thread pool sized for the largest host limit.
+    func is expected to go through fetch_with_retry, which does the actual pacing.
+    """
+    max_workers = max_workers or int(controller['max_limit'])
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(func, items))
+
+
+def controller_summary(controller):
+    """Per-host limit and counters, for printing or saving."""
+    with controller['condition']:
+        return {host: {key: value for key, value in state.items()
+                       if key not in ('not_before', 'next_start', 'last_decrease')}
+                for host, state in controller['hosts'].items()}
+
+
+def print_controller_summary(controller):
+    for host, state in controller_summary(controller).items():
+        print(f"   {host}: limit {state['limit']:.1f}, {state['requests']} requests, {state['retries']} retries, "
+              f"{state['decreases']} slowdowns, {state['throttled']} Retry-After pauses")
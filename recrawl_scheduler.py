@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Change-rate-aware recrawl scheduler.
+Each slug's page is modelled as changing at random times with its own Poisson
+rate, estimated from the content hashes of the scheduler's own past fetches
+in the results store. A page last seen t seconds ago has changed since with
+probability 1 - exp(-rate * t), so every tick the fetch budget goes to the
+pages most likely to have changed, and each page's next visit is set for when
+that probability reaches REVISIT_PROBABILITY. Stable pages drop to a visit
+every MAX_REVISIT_SECONDS; pages that change daily get checked about daily.
+
+    python recrawl_scheduler.py --budget-per-hour 60      # run as a daemon
+    python recrawl_scheduler.py --plan                    # print the schedule only
+"""
+
+import argparse
+import math
+import time
+
+from fetcher import BASE_URL, load_managed_slugs, make_session
+from rate_control import fetch_with_retry, new_rate_controller, print_controller_summary, run_controlled
+from results_store import CONTENT, DEFAULT_DB_PATH, finish_run, open_store, record_fetch, start_run
+from tiered_fetch import classify_page
+
+# Prior: one changed and one unchanged pseudo-interval of this length, i.e. ~1 change per 1.4 days
+# until a slug has history of its own
+PRIOR_INTERVAL_SECONDS = 86400.0
+MIN_RATE = 1e-8  # per second; about one change a year
+MAX_RATE = 1e-2  # per second; changes faster than this all look like "always changed"
+REVISIT_PROBABILITY = 0.5
+MIN_REVISIT_SECONDS = 15 * 60
+MAX_REVISIT_SECONDS = 7 * 86400
+DEFAULT_BUDGET_PER_HOUR = 60
+DEFAULT_TICK_SECONDS = 300
+SCHEDULER_TOOL = 'recrawl_scheduler'  # Run tool name; change rates are learned from these runs only
+
+
+def new_slug_state(slug):
+    return {
+        'slug': slug,
+        'last_visit': None,
+        'last_hash': None,
+        'changed_intervals': [],
+        'unchanged_time': 0.0,
+        'visits': 0,
+        'rate': None
+    }
+
+
+def observe_visit(state, visited_at, content_hash):
+    """Fold one fetch into the slug's history and re-estimate its change rate."""
+    if state['last_visit'] is not None and visited_at > state['last_visit']:
+        interval = visited_at - state['last_visit']
+        if content_hash != state['last_hash']:
+            state['changed_intervals'].append(interval)
+        else:
+            state['unchanged_time'] += interval
+    state['last_visit'] = visited_at
+    state['last_hash'] = content_hash
+    state['visits'] += 1
+    state['rate'] = estimate_change_rate(state['changed_intervals'], state['unchanged_time'])
+
+
+def estimate_change_rate(changed_intervals, unchanged_time, prior_interval=PRIOR_INTERVAL_SECONDS):
+    """
+    Maximum-likelihood Poisson change rate from irregular visits.
+    A visit interval t saw a change with probability 1 - exp(-rate * t), so the
+    rate solves sum(t / (exp(rate * t) - 1)) over changed intervals = total
+    unchanged time. The left side falls as the rate grows, so bisect on log(rate).
+    The prior pseudo-intervals keep the estimate finite for all-changed or
+    never-changed histories.
+    """
+    changed = list(changed_intervals) + [prior_interval]
+    unchanged = unchanged_time + prior_interval
+
+    def excess(rate):
+        return sum(t / math.expm1(min(rate * t, 700.0)) for t in changed) - unchanged
+
+    low, high = math.log(MIN_RATE), math.log(MAX_RATE)
+    if excess(math.exp(low)) <= 0:
+        return MIN_RATE
+    if excess(math.exp(high)) >= 0:
+        return MAX_RATE
+    for _ in range(60):
+        middle = (low + high) / 2
+        if excess(math.exp(middle)) > 0:
+            low = middle
+        else:
+            high = middle
+    return math.exp((low + high) / 2)
+
+
+def change_probability(state, now):
+    """Probability the page has changed since it was last fetched (1.0 if never fetched)."""
+    if state['last_visit'] is None:
+        return 1.0
+    rate = state['rate'] if state['rate'] is not None else estimate_change_rate([], 0.0)
+    return -math.expm1(-rate * max(0.0, now - state['last_visit']))
+
+
+def next_visit_at(state):
+    """When the change probability reaches REVISIT_PROBABILITY, within the revisit bounds."""
+    if state['last_visit'] is None:
+        return 0.0
+    rate = state['rate'] if state['rate'] is not None else estimate_change_rate([], 0.0)
+    wait = -math.log1p(-REVISIT_PROBABILITY) / rate
+    return state['last_visit'] + min(MAX_REVISIT_SECONDS, max(MIN_REVISIT_SECONDS, wait))
+
+
+def load_slug_states(store, slugs, tool=SCHEDULER_TOOL):
+    """
+    Rebuild every slug's change history from the scheduler's own fetches of
+    content pages. Other tools fetch with other user agents (googlebot, curl,
+    mobile variants) or at other times, and a 403, /blocked or loading-shell
+    body next to real content would read as a change.
+    """
+    states = {slug: new_slug_state(slug) for slug in slugs}
+    rows = store.execute(
+        'SELECT f.slug, f.fetched_at, f.content_hash FROM fetches f JOIN runs r ON r.id = f.run_id '
+        'WHERE r.tool = ? AND f.error IS NULL AND f.verdict = ? AND f.content_hash IS NOT NULL '
+        'ORDER BY f.slug, f.fetched_at',
+        (tool, CONTENT)
+    )
+    for row in rows:
+        if row['slug'] in states:
+            observe_visit(states[row['slug']], row['fetched_at'], row['content_hash'])
+    return states
+
+
+def plan_visits(states, now, budget):
+    """
+    Pick up to `budget` due slugs, most likely to have changed first.
+    Overdue slugs (past MAX_REVISIT_SECONDS) count as certain to have changed.
+    Returns [(slug, change_probability)].
+    """
+    due = []
+    for state in states.values():
+        if next_visit_at(state) > now:
+            continue
+        probability = change_probability(state, now)
+        if state['last_visit'] is not None and now - state['last_visit'] >= MAX_REVISIT_SECONDS:
+            probability = 1.0
+        due.append((probability, state['slug']))
+    due.sort(reverse=True)
+    return [(slug, probability) for probability, slug in due[:budget]]
+
+
+def visit_slugs(planned, states, store, run_id, session, controller, base_url=BASE_URL):
+    """Fetch the planned slugs under the rate controller, record them and update their histories."""
+    def visit(slug):
+        return slug, fetch_with_retry(f"{base_url.rstrip('/')}/{slug}", controller, session=session)
+
+    changes = 0
+    for slug, fetched in run_controlled([slug for slug, _ in planned], visit, controller):
+        verdict = None
+        if not fetched['error']:
+            verdict, _, _ = classify_page(fetched['final_url'], fetched['status_code'], fetched['text'])
+        fetch_id = record_fetch(store, run_id, fetched, slug=slug, verdict=verdict)
+        if fetched['error']:
+            print(f"   {slug}: error - {fetched['error']}")
+            continue
+        if verdict != CONTENT:
+            print(f"   {slug}: {verdict}, not counted in its change history")
+            continue
+
+        row = store.execute('SELECT fetched_at, content_hash FROM fetches WHERE id = ?', (fetch_id,)).fetchone()
+        content_hash = row['content_hash']
+        state = states[slug]
+        changed = state['last_hash'] is not None and content_hash != state['last_hash']
+        changes += changed
+        observe_visit(state, row['fetched_at'], content_hash)
+        print(f"   {slug}: {verdict}, {'CHANGED' if changed else 'unchanged'}, "
+              f"next visit in {(next_visit_at(state) - time.time()) / 3600:.1f}h")
+    return changes
+
+
+def print_schedule(states, now=None):
+    """Print every slug's estimated change interval, change probability and next visit."""
+    now = now or time.time()
+    print(f"{'SLUG':<24} {'VISITS':>6} {'CHANGES':>7} {'MEAN CHANGE':>12} {'P(CHANGED)':>10} {'NEXT VISIT':>11}")
+    ordered = sorted(states.values(), key=lambda state: next_visit_at(state))
+    for state in ordered:
+        rate = state['rate'] or estimate_change_rate([], 0.0)
+        due_in = next_visit_at(state) - now
+        print(f"{state['slug']:<24} {state['visits']:>6} {len(state['changed_intervals']):>7} "
+              f"{1 / rate / 3600:>11.1f}h {change_probability(state, now):>10.0%} "
+              f"{'due' if due_in <= 0 else f'{due_in / 3600:.1f}h':>11}")
+
+
+def run_scheduler(slugs, budget_per_hour=DEFAULT_BUDGET_PER_HOUR, tick_seconds=DEFAULT_TICK_SECONDS,
+                  once=False, store_path=None, base_url=BASE_URL):
+    """Every tick, fetch the due slugs most likely to have changed, within the hourly budget."""
+    store = open_store(store_path)
+    states = load_slug_states(store, slugs)
+    session = make_session()
+    controller = new_rate_controller()
+    run_id = start_run(store, SCHEDULER_TOOL, {'slugs': len(slugs), 'budget_per_hour': budget_per_hour,
+                                               'tick_seconds': tick_seconds})
+
+    print("RECRAWL SCHEDULER")
+    print("=" * 60)
+    print(f"Slugs: {len(slugs)}, budget: {budget_per_hour} fetches/hour, tick: {tick_seconds}s")
+    print("=" * 60)
+
+    allowance = 0.0
+    fetches = 0
+    changes = 0
+    try:
+        while True:
+            tick_start = time.time()
+            # Budget accrues per tick; a tick with nothing due keeps at most one hour's worth
+            allowance = min(budget_per_hour, allowance + budget_per_hour * tick_seconds / 3600)
+            if once:
+                allowance = max(allowance, 1)
+            planned = plan_visits(states, tick_start, int(allowance))
+            if planned:
+                expected = sum(probability for _, probability in planned)
+                print(f"\n[{time.strftime('%H:%M:%S')}] Visiting {len(planned)} slugs "
+                      f"(expected changes {expected:.1f})")
+                changes += visit_slugs(planned, states, store, run_id, session, controller, base_url=base_url)
+                fetches += len(planned)
+                allowance -= len(planned)
+
+            if once:
+                break
+            time.sleep(max(0.0, tick_seconds - (time.time() - tick_start)))
+    except KeyboardInterrupt:
+        print("\nStopping scheduler")
+    finally:
+        finish_run(store, run_id)
+        store.close()
+
+    print(f"\nRESULTS:")
+    print(f"  Fetches: {fetches}, changes detected: {changes} "
+          f"({changes / fetches if fetches else 0.0:.0%} of fetches)")
+    print_controller_summary(controller)
+    print(f"\n[SAVE] Run {run_id} stored in: {store_path or DEFAULT_DB_PATH}")
+    return {'run_id': run_id, 'fetches': fetches, 'changes': changes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recrawl slugs in order of how likely their page has changed.")
+    parser.add_argument('--budget-per-hour', type=int, default=DEFAULT_BUDGET_PER_HOUR, help="max fetches per hour")
+    parser.add_argument('--tick', type=int, default=DEFAULT_TICK_SECONDS, help="seconds between scheduling rounds")
+    parser.add_argument('--once', action='store_true', help="run a single round and exit")
+    parser.add_argument('--plan', action='store_true', help="print the current schedule without fetching")
+    parser.add_argument('--base-url', default=BASE_URL, help="origin to crawl")
+    args = parser.parse_args()
+
+    if args.plan:
+        store = open_store()
+        print_schedule(load_slug_states(store, load_managed_slugs()))
+        store.close()
+    else:
+        run_scheduler(load_managed_slugs(), budget_per_hour=args.budget_per_hour, tick_seconds=args.tick,
+                      once=args.once, base_url=args.base_url)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Referrer canonicalization for analytics aggregation.
+Every consumer maps raw referrers to the readable source names the Next.js
+routes store ("Direct or unknown", Instagram, TikTok, ...), and each does it
+with a chain of substring tests on the full URL. Here the host is parsed once
+and matched on whole labels against a suffix trie of known source domains,
+so "netflix.com" is no longer Twitter/X and "wa.me" no longer needs a
+substring test of its own. The suffix trie also covers redirector hosts
+(l.instagram.com, t.co, out.reddit.com, ...) and android-app:// referrers.
+Results are memoized by raw referrer string, and host lookups by host, so an
+aggregation over millions of events parses each distinct URL once and walks
+the trie once per distinct host.
+
+Unknown referrers come back unchanged, like getReadableReferrer in
+app/api/track/route.ts, so the results stay comparable with stored
+readable_referrer values.
+
+    python referrer_canon.py [events]   # benchmark (default 2,000,000 events)
+"""
+
+import random
+import sys
+import time
+from functools import lru_cache
+
+DIRECT = 'Direct or unknown'
+
+# Source name -> registrable domains and redirector hosts; categories follow app/api/track/route.ts
+SOURCE_DOMAINS = {
+    'Instagram': ['instagram.com', 'instagr.am', 'ig.me'],
+    'Twitter/X': ['twitter.com', 'x.com', 't.co'],
+    'Facebook': ['facebook.com', 'fb.com', 'fb.me', 'messenger.com'],
+    'TikTok': ['tiktok.com'],
+    'LinkedIn': ['linkedin.com', 'lnkd.in'],
+    'WhatsApp': ['whatsapp.com', 'wa.me'],
+    'Snapchat': ['snapchat.com'],
+    'YouTube': ['youtube.com', 'youtu.be'],
+    'Reddit': ['reddit.com', 'redd.it'],
+    'Pinterest': ['pinterest.com', 'pin.it'],
+    'Telegram': ['t.me', 'telegram.org', 'telegram.me'],
+    'Discord': ['discord.com', 'discord.gg', 'discordapp.com'],
+    'Google Search': ['google.com', 'google.co.uk', 'google.ca'],
+    'Bing Search': ['bing.com'],
+    'DuckDuckGo': ['duckduckgo.com'],
+}
+
+# android-app://<package>/ referrers sent by in-app browsers
+ANDROID_APP_SOURCES = {
+    'com.instagram.android': 'Instagram',
+    'com.twitter.android': 'Twitter/X',
+    'com.facebook.katana': 'Facebook',
+    'com.facebook.orca': 'Facebook',
+    'com.zhiliaoapp.musically': 'TikTok',
+    'com.ss.android.ugc.trill': 'TikTok',
+    'com.linkedin.android': 'LinkedIn',
+    'com.whatsapp': 'WhatsApp',
+    'com.snapchat.android': 'Snapchat',
+    'com.google.android.youtube': 'YouTube',
+    'com.reddit.frontpage': 'Reddit',
+    'com.pinterest': 'Pinterest',
+    'org.telegram.messenger': 'Telegram',
+    'com.discord': 'Discord',
+    'com.google.android.googlequicksearchbox': 'Google Search',
+}
+
+# In-app browsers often send no referrer at all but name the app in the user agent
+IN_APP_USER_AGENT_MARKERS = [
+    ('Instagram', 'Instagram'),
+    ('FBAN/', 'Facebook'),
+    ('FBAV/', 'Facebook'),
+    ('musical_ly', 'TikTok'),
+    ('BytedanceWebview', 'TikTok'),
+    ('Snapchat', 'Snapchat'),
+    ('LinkedInApp', 'LinkedIn'),
+    ('Pinterest', 'Pinterest'),
+    ('Telegram', 'Telegram'),
+]
+
+MEMO_SIZE = 65536
+_SOURCE = '$'  # Trie key marking a source name
+
+
+def build_suffix_trie(source_domains=SOURCE_DOMAINS):
+    """Nested dicts keyed by host labels from the right: com -> instagram -> {'$': 'Instagram'}."""
+    trie = {}
+    for source, domains in source_domains.items():
+        for domain in domains:
+            node = trie
+            for label in reversed(domain.split('.')):
+                node = node.setdefault(label, {})
+            node[_SOURCE] = source
+    return trie
+
+
+SUFFIX_TRIE = build_suffix_trie()
+
+
+def match_host(host, trie=SUFFIX_TRIE):
+    """Source for the longest known domain the host ends with, or None."""
+    node = trie
+    source = None
+    for label in reversed(host.split('.')):
+        node = node.get(label)
+        if node is None:
+            break
+        source = node.get(_SOURCE, source)
+    return source
+
+
+def referrer_host(referrer):
+    """Lower-cased host of a referrer without www.; bare hosts like "instagram.com/x" count as URLs."""
+    rest = referrer.split('://', 1)[1] if '://' in referrer else referrer.lstrip('/')
+    for separator in '/?#':
+        rest = rest.split(separator, 1)[0]
+    host = rest.rpartition('@')[2].split(':', 1)[0].lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _host_source(host):
+    return match_host(host)
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def canonical_referrer(referrer):
+    """Readable source name for a raw referrer string (memoized)."""
+    referrer = referrer.strip()
+    if not referrer:
+        return DIRECT
+    if referrer.startswith('android-app://'):
+        package = referrer[len('android-app://'):].split('/')[0]
+        return ANDROID_APP_SOURCES.get(package, referrer)
+    return _host_source(referrer_host(referrer)) or referrer
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _in_app_source(user_agent):
+    for marker, source in IN_APP_USER_AGENT_MARKERS:
+        if marker in user_agent:
+            return source
+    return None
+
+
+def canonical_source(referrer, user_agent=None):
+    """
+    canonical_referrer, except that an empty referrer from a recognised in-app
+    browser is credited to that app instead of "Direct or unknown".
+    """
+    source = canonical_referrer(referrer or '')
+    if source == DIRECT and user_agent:
+        return _in_app_source(user_agent) or DIRECT
+    return source
+
+
+def referrer_counts(events, use_user_agent=True):
+    """Count events per canonical source."""
+    counts = {}
+    for event in events:
+        if use_user_agent:
+            source = canonical_source(event.get('referrer'), event.get('userAgent'))
+        else:
+            source = canonical_referrer(event.get('referrer') or '')
+        counts[source] = counts.get(source, 0) + 1
+    return counts
+
+
+def substring_referrer(ref):
+    """The substring chain from app/api/track/route.ts, for comparison."""
+    if not ref:
+        return DIRECT
+    for source, needles in (('Instagram', ['instagram.com']), ('Twitter/X', ['twitter.com', 'x.com']),
+                            ('Facebook', ['facebook.com', 'fb.com']), ('TikTok', ['tiktok.com']),
+                            ('LinkedIn', ['linkedin.com']), ('WhatsApp', ['whatsapp.com', 'wa.me']),
+                            ('Snapchat', ['snapchat.com']), ('YouTube', ['youtube.com', 'youtu.be']),
+                            ('Reddit', ['reddit.com']), ('Pinterest', ['pinterest.com']),
+                            ('Telegram', ['t.me', 'telegram.org']), ('Discord', ['discord.com', 'discord.gg']),
+                            ('Google Search', ['google.com', 'google.co.uk', 'google.ca']),
+                            ('Bing Search', ['bing.com']), ('DuckDuckGo', ['duckduckgo.com'])):
+        if any(needle in ref for needle in needles):
+            return source
+    return ref
+
+
+def _synthetic_referrers(count):
+    """Referrers in a skewed mix: mostly direct and social redirectors, a long tail of one-off URLs."""
+    rng = random.Random(7)
+    common = ['', '', '', 'https://l.instagram.com/', 'https://www.instagram.com/', 'https://t.co/',
+              'https://www.tiktok.com/', 'https://m.facebook.com/', 'android-app://com.instagram.android/',
+              'https://www.google.com/', 'https://linktr.ee/', 'https://www.reddit.com/']
+    for i in range(count):
+        if rng.random() < 0.9:
+            yield rng.choice(common)
+        else:
+            # Tracking parameters make most redirector URLs distinct
+            yield f"https://l.instagram.com/?u=https%3A%2F%2Fviewit.bio%2Fp{i % 500}&e=AT{rng.randrange(5000)}"
+
+
+def benchmark_canonicalizer(count=2000000):
+    print("REFERRER CANONICALIZATION BENCHMARK")
+    print("=" * 60)
+    referrers = list(_synthetic_referrers(count))
+    print(f"Events: {count:,} ({len(set(referrers)):,} distinct referrers)")
+
+    start_time = time.perf_counter()
+    for referrer in referrers:
+        substring_referrer(referrer)
+    substring_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for referrer in referrers:
+        canonical_referrer.__wrapped__(referrer)
+        _host_source.cache_clear()
+    uncached_time = time.perf_counter() - start_time
+
+    canonical_referrer.cache_clear()
+    _host_source.cache_clear()
+    start_time = time.perf_counter()
+    for referrer in referrers:
+        canonical_referrer(referrer)
+    cached_time = time.perf_counter() - start_time
+
+    for label, elapsed in (('Substring chain (route.ts)', substring_time), ('Host + suffix trie', uncached_time),
+                           ('Host + suffix trie, memoized', cached_time)):
+        print(f"   {label:<30} {elapsed:6.2f}s ({count / elapsed / 1e6:5.2f}M events/s)")
+    info = canonical_referrer.cache_info()
+    print(f"   Memo: {info.hits:,} hits, {info.misses:,} misses")
+
+    samples = ['https://www.netflix.com/', 'https://t.co/xyz', 'https://sub.reddit.me/', 'https://l.instagram.com/',
+               'android-app://com.zhiliaoapp.musically/']
+    print("\n   Where the trie and the substring chain disagree:")
+    for referrer in samples:
+        if substring_referrer(referrer) != canonical_referrer(referrer):
+            print(f"      {referrer:<42} substring: {substring_referrer(referrer):<28} trie: "
+                  f"{canonical_referrer(referrer)}")
+    return {'substring': substring_time, 'uncached': uncached_time, 'cached': cached_time}
+
+
+if __name__ == "__main__":
+    benchmark_canonicalizer(int(sys.argv[1]) if len(sys.argv) > 1 else 2000000)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Record/replay transport for the shared fetch path.
+In record mode every request a session sends (each redirect hop included) is
+captured with its headers and decoded body; at exit the exchanges are written
+to a zip archive where identical bodies are stored once. In replay mode the
+archive is served back from memory, so crawls and analyses run offline with
+no network variance. Requests missing from the archive fail like a dropped
+connection.
+
+Bodies are captured as the caller reads them, so recording does not move the
+download into the time-to-first-byte measurement. Worker processes (which
+skip atexit handlers) call save_recordings before they exit; every save merges
+into the archive under a lock, so workers of one recording run share it.
+
+Select the mode with environment variables, for any script that builds its
+session with fetcher.make_session:
+    VIEWIT_HTTP_MODE=record VIEWIT_HTTP_ARCHIVE=site.har.zip python content_crawler.py
+    VIEWIT_HTTP_MODE=replay VIEWIT_HTTP_ARCHIVE=site.har.zip python content_crawler.py
+"""
+
+import atexit
+import hashlib
+import http.client
+import io
+import json
+import os
+import sys
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+
+from request_timing import TimingAdapter
+
+DEFAULT_ARCHIVE_PATH = 'http_archive.zip'
+ARCHIVE_VERSION = 1
+RECORD_ID_VARIABLE = 'VIEWIT_HTTP_RECORD_ID'  # Shared by a recording process and the workers it starts
+
+# Headers that describe the wire encoding; bodies are stored decoded
+WIRE_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length'}
+
+_recorders = {}
+_archives = {}
+_lock = threading.Lock()
+
+
+def transport_mode():
+    """Return (mode, archive_path) from the environment; mode is None, 'record' or 'replay'."""
+    mode = os.environ.get('VIEWIT_HTTP_MODE', '').strip().lower() or None
+    if mode not in (None, 'record', 'replay'):
+        raise ValueError(f"VIEWIT_HTTP_MODE must be 'record' or 'replay', not {mode!r}")
+    return mode, os.environ.get('VIEWIT_HTTP_ARCHIVE', DEFAULT_ARCHIVE_PATH)
+
+
+# Set on import, so worker processes started later inherit it and their saves merge into this run's archive
+if os.environ.get('VIEWIT_HTTP_MODE', '').strip().lower() == 'record':
+    os.environ.setdefault(RECORD_ID_VARIABLE, f'{os.getpid()}-{time.time()}')
+
+
+def _exchange_key(method, url, user_agent=None):
+    return f"{method.upper()} {url} {user_agent or ''}"
+
+
+def _read_manifest(path):
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read('exchanges.json'))
+        bodies = {name[len('bodies/'):]: archive.read(name) for name in archive.namelist()
+                  if name.startswith('bodies/')}
+    return manifest, bodies
+
+
+@contextmanager
+def _archive_lock(path):
+    """Exclusive lock shared by every process saving to path (fcntl on POSIX, msvcrt on Windows)."""
+    with open(f'{path}.lock', 'a+b') as lock_file:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)  # Retries for 10s, then raises
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield  # Released when the file is closed
+
+
+def save_archive(path, exchanges, record_id=None):
+    """
+    Write exchanges to a zip archive, deduplicating bodies by hash. With a
+    record_id, exchanges already saved under that id (by another process of
+    the same run) are kept and the new ones appended.
+    """
+    index = []
+    bodies = {}
+    with _archive_lock(path):
+        if record_id is not None and os.path.exists(path):
+            manifest, bodies = _read_manifest(path)
+            if manifest.get('record_id') == record_id:
+                index = manifest['exchanges']
+            else:
+                bodies = {}
+        for exchange in exchanges:
+            body = exchange['body']
+            digest = hashlib.sha256(body).hexdigest()
+            bodies[digest] = body
+            index.append({key: value for key, value in exchange.items() if key != 'body'} | {'body': digest})
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('exchanges.json', json.dumps({'version': ARCHIVE_VERSION, 'record_id': record_id,
+                                                           'exchanges': index}))
+            for digest, body in bodies.items():
+                archive.writestr(f'bodies/{digest}', body)
+        os.replace(tmp_path, path)
+    return len(index), len(bodies)
+
+
+def load_archive(path):
+    """Load an archive into memory: {key: [exchange, ...]} in recorded order."""
+    manifest, bodies = _read_manifest(path)
+    by_key = {}
+    for exchange in manifest['exchanges']:
+        exchange = dict(exchange, body=bodies[exchange['body']])
+        user_agent = exchange['request_headers'].get('User-Agent')
+        by_key.setdefault(_exchange_key(exchange['method'], exchange['url'], user_agent), []).append(exchange)
+        by_key.setdefault(_exchange_key(exchange['method'], exchange['url']), []).append(exchange)
+    return by_key
+
+
+def _get_recorder(path):
+    """One exchange list per archive path, saved when the process exits."""
+    with _lock:
+        if path not in _recorders:
+            _recorders[path] = []
+            atexit.register(_save_recorder, path)
+        return _recorders[path]
+
+
+def _save_recorder(path):
+    with _lock:
+        # Emptied in place: adapters keep appending to this list
+        exchanges = list(_recorders.get(path, []))
+        _recorders.get(path, []).clear()
+    if exchanges:
+        count, unique = save_archive(path, exchanges, os.environ.get(RECORD_ID_VARIABLE))
+        print(f"[SAVE] Recorded {len(exchanges)} exchanges ({count} in archive, {unique} unique bodies) to: {path}")
+
+
+def save_recordings():
+    """Save what this process has recorded; call it where a worker process exits (atexit does not run there)."""
+    for path in list(_recorders):
+        _save_recorder(path)
+
+
+def _get_archive(path):
+    with _lock:
+        if path not in _archives:
+            _archives[path] = {'exchanges': load_archive(path), 'served': {}}
+        return _archives[path]
+
+
+class RecordingAdapter(TimingAdapter):
+    """Send requests normally and capture each exchange for the archive."""
+
+    def __init__(self, archive_path=DEFAULT_ARCHIVE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.exchanges = _get_recorder(archive_path)
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        # Header pairs from the raw response keep repeated headers such as Set-Cookie apart
+        headers = [[key, value] for key, value in response.raw.headers.items() if key.lower() not in WIRE_HEADERS]
+        exchange = {
+            'method': request.method,
+            'url': request.url,
+            'request_headers': dict(request.headers),
+            'status_code': response.status_code,
+            'reason': response.reason,
+            'headers': headers,
+            'body': None,
+            'elapsed': time.perf_counter() - start  # Time to headers; the body is read by the caller
+        }
+        response.iter_content = self._recording_reader(response.iter_content, exchange)
+        return response
+
+    def _recording_reader(self, iter_content, exchange):
+        """
+        Wrap response.iter_content (which .content and streamed reads go through) so the
+        body is captured as the caller reads it. A body the caller stops reading early is
+        stored as far as it was read; a response closed unread is not recorded.
+        """
+        def read(*args, **kwargs):
+            chunks = []
+            try:
+                for chunk in iter_content(*args, **kwargs):
+                    chunks.append(chunk)
+                    yield chunk
+            finally:
+                body = ''.join(chunks).encode('utf-8') if chunks and isinstance(chunks[0], str) else b''.join(chunks)
+                with _lock:
+                    if exchange['body'] is None:
+                        exchange['body'] = body
+                        self.exchanges.append(exchange)
+        return read
+
+
+class _RecordedMessage:
+    """Stands in for http.client.HTTPResponse so requests can read Set-Cookie headers."""
+
+    def __init__(self, msg):
+        self.msg = msg
+
+    def isclosed(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Serve requests from a recorded archive without touching the network."""
+
+    def __init__(self, archive_path=DEFAULT_ARCHIVE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.archive = _get_archive(archive_path)
+
+    def _lookup(self, request):
+        user_agent = request.headers.get('User-Agent')
+        for key in (_exchange_key(request.method, request.url, user_agent), _exchange_key(request.method, request.url)):
+            candidates = self.archive['exchanges'].get(key)
+            if candidates:
+                # Repeated requests replay the recorded sequence, then stick to the last response
+                with _lock:
+                    served = self.archive['served'].get(key, 0)
+                    self.archive['served'][key] = served + 1
+                return candidates[min(served, len(candidates) - 1)]
+        return None
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        exchange = self._lookup(request)
+        if exchange is None:
+            raise requests.exceptions.ConnectionError(f"{request.method} {request.url} is not in the replay archive",
+                                                      request=request)
+
+        headers = [tuple(pair) for pair in exchange['headers']] + [('Content-Length', str(len(exchange['body'])))]
+        message = http.client.HTTPMessage()
+        for key, value in headers:
+            message[key] = value
+        raw = HTTPResponse(body=io.BytesIO(exchange['body']), headers=headers, status=exchange['status_code'],
+                           reason=exchange['reason'], preload_content=False, decode_content=False,
+                           request_url=request.url, original_response=_RecordedMessage(message))
+        response = self.build_response(request, raw)
+        if not stream:
+            response.content
+        return response
+
+
+def mount_transport(session):
+    """Mount the record or replay adapter selected by the environment; returns the mode."""
+    mode, archive_path = transport_mode()
+    if mode == 'record':
+        adapter = RecordingAdapter(archive_path)
+    elif mode == 'replay':
+        adapter = ReplayAdapter(archive_path)
+    else:
+        return None
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return mode
+
+
+def describe_archive(path):
+    """Print the exchanges stored in an archive."""
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read('exchanges.json'))
+        body_sizes = {info.filename[len('bodies/'):]: (info.file_size, info.compress_size)
+                      for info in archive.infolist() if info.filename.startswith('bodies/')}
+
+    print(f"ARCHIVE: {path} ({os.path.getsize(path):,} bytes on disk)")
+    print("=" * 60)
+    for exchange in manifest['exchanges']:
+        size, _ = body_sizes[exchange['body']]
+        print(f"  {exchange['status_code']} {exchange['method']} {exchange['url']} ({size:,} bytes)")
+    raw_total = sum(size for size, _ in body_sizes.values())
+    print(f"\nExchanges: {len(manifest['exchanges'])}, unique bodies: {len(body_sizes)} ({raw_total:,} bytes decoded)")
+
+
+if __name__ == "__main__":
+    describe_archive(sys.argv[1] if len(sys.argv) > 1 else os.environ.get('VIEWIT_HTTP_ARCHIVE', DEFAULT_ARCHIVE_PATH))
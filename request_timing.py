@@ -0,0 +1,245 @@
+"""
+Per-phase request timing for the shared fetch path.
+A requests adapter swaps in urllib3 connections that time DNS, TCP connect,
+TLS handshake and time-to-first-byte; fetch_page adds download time and the
+timed_phase decorator adds parse time. Phases land in a per-request dict that
+callers save to JSON and export in Prometheus text format.
+
+Phase hooks see each record once it is complete: right after the fetch, or,
+for fetches whose parse is still to come, after the parse has been timed.
+"""
+
+import functools
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+PHASES = ['dns', 'connect', 'tls', 'ttfb', 'download', 'parse']
+
+# Callbacks run with (url, phases) whenever a fetch finishes
+PHASE_HOOKS = []
+
+_current = threading.local()
+
+
+def new_phase_record():
+    """Create an empty timing record with every phase at zero."""
+    record = {phase: 0.0 for phase in PHASES}
+    record['new_connections'] = 0
+    record['total'] = 0.0
+    return record
+
+
+def start_record():
+    """Start timing a new request on this thread and return its record."""
+    flush_phase_hooks()  # The previous request was never parsed; report it as it is
+    _current.record = new_phase_record()
+    return _current.record
+
+
+def current_record():
+    """Return the record of the request being timed on this thread, if any."""
+    return getattr(_current, 'record', None)
+
+
+def add_phase(phase, seconds, record=None):
+    """Add time to a phase of the given record, or of the current one."""
+    record = record if record is not None else current_record()
+    if record is not None:
+        record[phase] = record.get(phase, 0.0) + seconds
+
+
+def register_phase_hook(callback):
+    """Call callback(url, phases) after every timed fetch."""
+    PHASE_HOOKS.append(callback)
+
+
+def run_phase_hooks(url, record, defer=False):
+    """
+    Call the hooks for a finished fetch. With defer=True they wait until the
+    next timed_phase step (the parse) on this thread has added its time.
+    """
+    if defer:
+        _current.pending_hooks = (url, record)
+        return
+    for callback in PHASE_HOOKS:
+        callback(url, record)
+
+
+def flush_phase_hooks():
+    """Run hooks deferred by run_phase_hooks on this thread, if any."""
+    pending = getattr(_current, 'pending_hooks', None)
+    if pending is not None:
+        _current.pending_hooks = None
+        run_phase_hooks(*pending)
+
+
+@contextmanager
+def time_phase(phase, record=None):
+    """Context manager adding the elapsed time of its block to a phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(phase, time.perf_counter() - start, record)
+
+
+def timed_phase(phase):
+    """
+    Decorator adding a function's run time to a phase of the current request,
+    then running the hooks the fetch deferred to it.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                with time_phase(phase):
+                    return func(*args, **kwargs)
+            finally:
+                flush_phase_hooks()
+        return wrapper
+    return decorator
+
+
+class TimedConnectionMixin:
+    """Time DNS, TCP connect and time-to-first-byte on a urllib3 connection."""
+
+    def _new_conn(self):
+        record = current_record()
+        if record is None:
+            return super()._new_conn()
+
+        dns_host = self._dns_host
+        start = time.perf_counter()
+        try:
+            addresses = list(dict.fromkeys(info[4][0] for info in
+                                           socket.getaddrinfo(dns_host, self.port, 0, socket.SOCK_STREAM)))
+        except socket.gaierror:
+            addresses = [dns_host]  # Let urllib3 raise its usual NameResolutionError
+        resolved_at = time.perf_counter()
+        record['dns'] += resolved_at - start
+
+        # Like socket.create_connection, try each resolved address in turn
+        try:
+            for i, address in enumerate(addresses):
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (NewConnectionError, ConnectTimeoutError):
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = dns_host
+        record['connect'] += time.perf_counter() - resolved_at
+        record['new_connections'] += 1
+        return sock
+
+    def request(self, method, url, *args, **kwargs):
+        self._timing_request_start = time.perf_counter()
+        return super().request(method, url, *args, **kwargs)
+
+    def getresponse(self):
+        response = super().getresponse()
+        start = getattr(self, '_timing_request_start', None)
+        if start is not None:
+            add_phase('ttfb', time.perf_counter() - start)
+        return response
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+
+    def connect(self):
+        record = current_record()
+        if record is None:
+            return super().connect()
+
+        before = record['dns'] + record['connect']
+        start = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - start
+
+        # Whatever connect() spent beyond DNS + TCP is the TLS handshake
+        record['tls'] += max(0.0, elapsed - (record['dns'] + record['connect'] - before))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimingAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools record per-phase timings."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool
+        }
+
+
+def mount_timing_adapter(session):
+    """Route a session's http and https traffic through the timing adapter."""
+    adapter = TimingAdapter()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def write_prometheus(timed_requests, path='fetch_timings.prom', job='viewit_audit'):
+    """
+    Write per-request phase timings in Prometheus text format.
+    timed_requests is a list of (url, phases) pairs. The file is replaced
+    atomically so a node_exporter textfile collector never reads it half-written.
+    """
+    lines = [
+        '# HELP viewit_fetch_phase_seconds Time spent in each phase of a fetch.',
+        '# TYPE viewit_fetch_phase_seconds gauge'
+    ]
+    totals = {phase: 0.0 for phase in PHASES}
+
+    for url, phases in timed_requests:
+        for phase in PHASES:
+            seconds = phases.get(phase, 0.0)
+            totals[phase] += seconds
+            lines.append(f'viewit_fetch_phase_seconds{{job="{job}",url="{_escape_label(url)}",'
+                         f'phase="{phase}"}} {seconds:.6f}')
+
+    lines.append('# HELP viewit_fetch_phase_seconds_total Time spent in each phase across the run.')
+    lines.append('# TYPE viewit_fetch_phase_seconds_total counter')
+    for phase, seconds in totals.items():
+        lines.append(f'viewit_fetch_phase_seconds_total{{job="{job}",phase="{phase}"}} {seconds:.6f}')
+
+    lines.append('# HELP viewit_fetch_requests_total Requests timed in the run.')
+    lines.append('# TYPE viewit_fetch_requests_total counter')
+    lines.append(f'viewit_fetch_requests_total{{job="{job}"}} {len(timed_requests)}')
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+    return path
+
+
+def format_phases(phases):
+    """One-line human readable phase breakdown in milliseconds."""
+    return ', '.join(f"{phase} {phases.get(phase, 0.0) * 1000:.0f}ms" for phase in PHASES)
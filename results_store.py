@@ -0,0 +1,511 @@
+"""
+SQLite-backed results store shared by every crawl, analysis and browser script.
+Runs, fetches, extractions and browser verdicts live in indexed tables in one
+file, so questions across runs ("which slugs became blocked this month?") are
+answered with an index lookup instead of re-parsing loose JSON files.
+Per-slug summaries are maintained as each row is recorded, so reports read
+one row per slug however much history has accumulated.
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import time
+from urllib.parse import urlparse
+
+from crawl_frontier import REWRITE_PREFIXES, collapse_rewrites
+
+DEFAULT_DB_PATH = os.environ.get('VIEWIT_RESULTS_DB', 'results.db')
+
+# Response times are kept per slug as a histogram of 5%-wide log buckets from 1ms
+LATENCY_BUCKET_BASE = 0.001
+LATENCY_BUCKET_GROWTH = 1.05
+
+# The verdicts every tool records for a page
+CONTENT = 'content'
+LOADING = 'loading'
+BLOCKED = 'blocked'
+ERROR = 'error'
+VERDICTS = (CONTENT, LOADING, BLOCKED, ERROR)
+
+# Names tools used before they shared one vocabulary
+VERDICT_ALIASES = {'ok': CONTENT, 'not_blocked': CONTENT}
+
+# Bumped when summaries are computed differently; open_store rebuilds older ones
+SUMMARY_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    tool TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    args TEXT
+);
+
+CREATE TABLE IF NOT EXISTS fetches (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    slug TEXT NOT NULL,
+    url TEXT NOT NULL,
+    final_url TEXT,
+    status_code INTEGER,
+    verdict TEXT,
+    elapsed REAL,
+    content_length INTEGER,
+    content_hash TEXT,
+    fetched_at REAL NOT NULL,
+    error TEXT,
+    phases TEXT,
+    user_agent TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_fetches_slug_time ON fetches(slug, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_fetches_verdict_time ON fetches(verdict, fetched_at);
+CREATE INDEX IF NOT EXISTS idx_fetches_run ON fetches(run_id);
+
+CREATE TABLE IF NOT EXISTS extractions (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    fetch_id INTEGER REFERENCES fetches(id),
+    slug TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    title TEXT,
+    creator_name TEXT,
+    images_count INTEGER,
+    buttons_count INTEGER,
+    has_loading_screen INTEGER,
+    has_bot_detection INTEGER,
+    extracted_at REAL NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_extractions_slug_time ON extractions(slug, extracted_at);
+CREATE INDEX IF NOT EXISTS idx_extractions_kind_slug ON extractions(kind, slug, extracted_at);
+
+CREATE TABLE IF NOT EXISTS browser_verdicts (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    slug TEXT NOT NULL,
+    url TEXT NOT NULL,
+    final_url TEXT,
+    verdict TEXT NOT NULL,
+    reason TEXT,
+    elapsed REAL,
+    checked_at REAL NOT NULL,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_browser_slug_time ON browser_verdicts(slug, checked_at);
+CREATE INDEX IF NOT EXISTS idx_browser_verdict_time ON browser_verdicts(verdict, checked_at);
+
+-- Per-slug rollups, updated as each fetch or verdict is recorded
+CREATE TABLE IF NOT EXISTS slug_summaries (
+    slug TEXT PRIMARY KEY,
+    latest_status INTEGER,
+    latest_verdict TEXT,
+    latest_source TEXT,
+    latest_at REAL,
+    blocked_since REAL,
+    blocked_from TEXT,
+    observations INTEGER NOT NULL DEFAULT 0,
+    blocked INTEGER NOT NULL DEFAULT 0,
+    last_content_hash TEXT,
+    last_content_at REAL,
+    content_changes INTEGER NOT NULL DEFAULT 0
+);
+
+-- Latest content-page body hash per slug and comparable source (tool and user agent)
+CREATE TABLE IF NOT EXISTS content_hashes (
+    slug TEXT NOT NULL,
+    source_key TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    PRIMARY KEY (slug, source_key)
+) WITHOUT ROWID;
+
+-- Every time a slug's latest verdict turned blocked; kept when the slug recovers
+CREATE TABLE IF NOT EXISTS blocked_transitions (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL,
+    became_blocked_at REAL NOT NULL,
+    previous_verdict TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_blocked_transitions_time ON blocked_transitions(became_blocked_at);
+
+-- Navigation Timing / Web Vitals captured in browser runs (milliseconds, CLS unitless)
+CREATE TABLE IF NOT EXISTS page_timings (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    slug TEXT NOT NULL,
+    url TEXT NOT NULL,
+    final_url TEXT,
+    ttfb REAL,
+    fcp REAL,
+    lcp REAL,
+    cls REAL,
+    content_ready REAL,
+    protection REAL,
+    captured_at REAL NOT NULL,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_page_timings_slug_time ON page_timings(slug, captured_at);
+
+CREATE TABLE IF NOT EXISTS slug_latency_buckets (
+    slug TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (slug, bucket)
+) WITHOUT ROWID;
+"""
+
+
+def open_store(path=None):
+    """Open (and create if needed) the results database."""
+    conn = sqlite3.connect(path or DEFAULT_DB_PATH, timeout=30)  # Distributed workers share the file
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    _add_missing_columns(conn)
+    conn.executescript(SCHEMA)
+    _migrate_verdicts(conn)
+    _migrate_rewrite_slugs(conn)
+    if conn.execute('PRAGMA user_version').fetchone()[0] < SUMMARY_VERSION:
+        rebuild_summaries(conn)
+        conn.execute(f'PRAGMA user_version = {SUMMARY_VERSION}')
+    return conn
+
+
+def _add_missing_columns(conn):
+    """Columns added to tables that older databases already have."""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(fetches)')}
+    if columns and 'user_agent' not in columns:
+        conn.execute('ALTER TABLE fetches ADD COLUMN user_agent TEXT')
+
+
+def normalize_verdict(verdict):
+    """Map a verdict onto VERDICTS; None stays None and unknown names are rejected."""
+    if verdict is None:
+        return None
+    verdict = verdict.strip().lower()
+    if verdict.startswith('error'):
+        return ERROR
+    verdict = VERDICT_ALIASES.get(verdict, verdict)
+    if verdict not in VERDICTS:
+        raise ValueError(f"unknown verdict {verdict!r}; expected one of {', '.join(VERDICTS)}")
+    return verdict
+
+
+def _migrate_verdicts(conn):
+    """Rename verdicts stored under an old alias (an index lookup when there are none)."""
+    for alias, verdict in VERDICT_ALIASES.items():
+        conn.execute('UPDATE fetches SET verdict = ? WHERE verdict = ?', (verdict, alias))
+        conn.execute('UPDATE browser_verdicts SET verdict = ? WHERE verdict = ?', (verdict, alias))
+        conn.execute('UPDATE slug_summaries SET latest_verdict = ? WHERE latest_verdict = ?', (verdict, alias))
+        conn.execute('UPDATE slug_summaries SET blocked_from = ? WHERE blocked_from = ?', (verdict, alias))
+    conn.commit()
+
+
+def _migrate_rewrite_slugs(conn):
+    """
+    Re-slug rows stored under a rewrite prefix ('p' for /p/<slug>) before
+    slug_from_url collapsed them, then rebuild the summaries.
+    """
+    prefixes = [prefix.strip('/') for prefix in REWRITE_PREFIXES]
+    marks = ', '.join('?' * len(prefixes))
+    if not conn.execute(f'SELECT 1 FROM slug_summaries WHERE slug IN ({marks})', prefixes).fetchone():
+        return
+    for table in ('fetches', 'browser_verdicts', 'page_timings'):
+        rows = conn.execute(f'SELECT id, url FROM {table} WHERE slug IN ({marks})', prefixes).fetchall()
+        conn.executemany(f'UPDATE {table} SET slug = ? WHERE id = ?',
+                         [(slug_from_url(url), row_id) for row_id, url in rows])
+    conn.execute(f'UPDATE extractions SET slug = (SELECT slug FROM fetches WHERE fetches.id = extractions.fetch_id) '
+                 f'WHERE slug IN ({marks}) AND fetch_id IS NOT NULL', prefixes)
+    rebuild_summaries(conn)
+    conn.commit()
+
+
+def slug_from_url(url):
+    """Return the slug a URL is for, e.g. /rachelirl or /p/rachelirl -> rachelirl."""
+    path = urlparse(collapse_rewrites(url)).path.strip('/')
+    return path.split('/')[0] if path else ''
+
+
+def fetch_verdict(final_url, status_code, error=None):
+    """Cheap verdict for a fetch when the caller has no classifier result."""
+    if error or status_code is None:
+        return ERROR
+    if '/blocked' in final_url:
+        return BLOCKED
+    if '/human-check' in final_url:
+        return LOADING
+    if status_code in (401, 403, 429, 451):
+        return BLOCKED
+    if status_code >= 400:
+        return ERROR
+    return CONTENT
+
+
+def start_run(conn, tool, args=None):
+    """Record the start of a run and return its id."""
+    cursor = conn.execute('INSERT INTO runs (tool, started_at, args) VALUES (?, ?, ?)',
+                          (tool, time.time(), json.dumps(args) if args is not None else None))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def finish_run(conn, run_id):
+    conn.execute('UPDATE runs SET finished_at = ? WHERE id = ?', (time.time(), run_id))
+    conn.commit()
+
+
+def record_fetch(conn, run_id, fetched, slug=None, verdict=None, user_agent=None):
+    """
+    Store a fetcher.fetch_page result dict and return the new fetch id. Pass the
+    user_agent when a run fetches with several, so their bodies are compared
+    separately for content changes.
+    """
+    content = fetched.get('content') or b''
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    final_url = fetched.get('final_url') or fetched['url']
+
+    cursor = conn.execute(
+        'INSERT INTO fetches (run_id, slug, url, final_url, status_code, verdict, elapsed, content_length, '
+        'content_hash, fetched_at, error, phases, user_agent) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            run_id,
+            slug or slug_from_url(fetched['url']),
+            fetched['url'],
+            final_url,
+            fetched.get('status_code'),
+            normalize_verdict(verdict) or fetch_verdict(final_url, fetched.get('status_code'), fetched.get('error')),
+            fetched.get('elapsed'),
+            len(content),
+            hashlib.sha256(content).hexdigest() if content else None,
+            fetched.get('fetched_at', time.time()),
+            fetched.get('error'),
+            json.dumps(fetched['phases']) if fetched.get('phases') else None,
+            user_agent
+        )
+    )
+    row = conn.execute('SELECT f.slug, f.verdict, f.fetched_at, f.status_code, f.elapsed, f.content_hash, '
+                       'r.tool, f.user_agent FROM fetches f JOIN runs r ON r.id = f.run_id WHERE f.id = ?',
+                       (cursor.lastrowid,)).fetchone()
+    _observe(conn, row['slug'], row['verdict'], row['fetched_at'], 'http', status_code=row['status_code'],
+             elapsed=row['elapsed'], content_hash=row['content_hash'],
+             content_key=_content_key(row['tool'], row['user_agent']))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def record_extraction(conn, run_id, data, fetch_id=None, slug=None, kind='content'):
+    """Store an extraction/analysis dict (content_crawler or analyzer shape)."""
+    images = data.get('images', data.get('images_count', 0))
+    buttons = data.get('buttons', data.get('buttons_count', 0))
+    cursor = conn.execute(
+        'INSERT INTO extractions (run_id, fetch_id, slug, kind, title, creator_name, images_count, '
+        'buttons_count, has_loading_screen, has_bot_detection, extracted_at, data) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (
+            run_id,
+            fetch_id,
+            slug or slug_from_url(data.get('url', '')),
+            kind,
+            data.get('title'),
+            data.get('creator_name'),
+            len(images) if isinstance(images, list) else images,
+            len(buttons) if isinstance(buttons, list) else buttons,
+            int(bool(data.get('has_loading_screen', data.get('is_loading_screen', False)))),
+            int(bool(data.get('has_bot_detection', False))),
+            time.time(),
+            json.dumps(data, ensure_ascii=False, default=str)
+        )
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def record_browser_verdict(conn, run_id, url, verdict, final_url=None, reason=None, elapsed=None,
+                           details=None, slug=None):
+    """Store the outcome of a browser (Selenium) check."""
+    slug = slug or slug_from_url(url)
+    verdict = normalize_verdict(verdict)
+    checked_at = time.time()
+    cursor = conn.execute(
+        'INSERT INTO browser_verdicts (run_id, slug, url, final_url, verdict, reason, elapsed, checked_at, '
+        'details) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (run_id, slug, url, final_url, verdict, reason, elapsed, checked_at,
+         json.dumps(details, ensure_ascii=False, default=str) if details is not None else None)
+    )
+    _observe(conn, slug, verdict, checked_at, 'browser')
+    conn.commit()
+    return cursor.lastrowid
+
+
+def record_page_timing(conn, run_id, url, timing, slug=None):
+    """Store one page's browser timing capture (see web_vitals.capture_page_timing)."""
+    slug = slug or slug_from_url(url)
+    cursor = conn.execute(
+        'INSERT INTO page_timings (run_id, slug, url, final_url, ttfb, fcp, lcp, cls, content_ready, protection, '
+        'captured_at, details) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (run_id, slug, url, timing.get('final_url'), timing.get('ttfb'), timing.get('fcp'), timing.get('lcp'),
+         timing.get('cls'), timing.get('content_ready'), timing.get('protection'), time.time(),
+         json.dumps(timing, ensure_ascii=False, default=str))
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def page_timings(conn, slug=None, since=None):
+    """Timing captures, optionally for one slug and/or since an epoch time, oldest first."""
+    clauses, params = [], []
+    if slug is not None:
+        clauses.append('slug = ?')
+        params.append(slug)
+    if since is not None:
+        clauses.append('captured_at >= ?')
+        params.append(since)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+    return conn.execute(f'SELECT * FROM page_timings{where} ORDER BY captured_at', params).fetchall()
+
+
+def latency_bucket(seconds):
+    """Histogram bucket index for a response time."""
+    return int(math.log(max(seconds, LATENCY_BUCKET_BASE) / LATENCY_BUCKET_BASE, LATENCY_BUCKET_GROWTH))
+
+
+def _bucket_midpoint(bucket):
+    return LATENCY_BUCKET_BASE * LATENCY_BUCKET_GROWTH ** (bucket + 0.5)
+
+
+def _content_key(tool, user_agent):
+    return f"{tool}|{user_agent or ''}"
+
+
+def _observe(conn, slug, verdict, observed_at, source, status_code=None, elapsed=None, content_hash=None,
+             content_key=''):
+    """
+    Fold one observation into the slug's summary row and latency histogram.
+    Runs inside the caller's transaction, so the work per record is constant
+    no matter how much history the slug already has. A content change is a
+    content page whose body differs from the last content page fetched by the
+    same tool with the same user agent (content_key).
+    """
+    conn.execute('INSERT OR IGNORE INTO slug_summaries (slug) VALUES (?)', (slug,))
+    summary = conn.execute('SELECT latest_verdict, latest_at, last_content_hash, last_content_at FROM slug_summaries '
+                           'WHERE slug = ?', (slug,)).fetchone()
+
+    if verdict is not None:
+        conn.execute('UPDATE slug_summaries SET observations = observations + 1, blocked = blocked + ? '
+                     'WHERE slug = ?', (int(verdict == BLOCKED), slug))
+
+    # Results from slow workers can land late; only newer observations move "latest"
+    if verdict is not None and (summary['latest_at'] is None or observed_at >= summary['latest_at']):
+        conn.execute('UPDATE slug_summaries SET latest_verdict = ?, latest_source = ?, latest_at = ?, '
+                     'latest_status = COALESCE(?, latest_status) WHERE slug = ?',
+                     (verdict, source, observed_at, status_code, slug))
+        if verdict != BLOCKED:
+            conn.execute('UPDATE slug_summaries SET blocked_since = NULL, blocked_from = NULL WHERE slug = ?', (slug,))
+        elif summary['latest_verdict'] != BLOCKED:
+            conn.execute('UPDATE slug_summaries SET blocked_since = ?, blocked_from = ? WHERE slug = ?',
+                         (observed_at, summary['latest_verdict'], slug))
+            conn.execute('INSERT INTO blocked_transitions (slug, became_blocked_at, previous_verdict, source) '
+                         'VALUES (?, ?, ?, ?)', (slug, observed_at, summary['latest_verdict'], source))
+
+    if content_hash and verdict == CONTENT:
+        previous = conn.execute('SELECT content_hash, observed_at FROM content_hashes '
+                                'WHERE slug = ? AND source_key = ?', (slug, content_key)).fetchone()
+        if previous is None or observed_at >= previous['observed_at']:
+            conn.execute('INSERT OR REPLACE INTO content_hashes (slug, source_key, content_hash, observed_at) '
+                         'VALUES (?, ?, ?, ?)', (slug, content_key, content_hash, observed_at))
+            conn.execute('UPDATE slug_summaries SET content_changes = content_changes + ? WHERE slug = ?',
+                         (int(previous is not None and previous['content_hash'] != content_hash), slug))
+        if summary['last_content_at'] is None or observed_at >= summary['last_content_at']:
+            conn.execute('UPDATE slug_summaries SET last_content_hash = ?, last_content_at = ? WHERE slug = ?',
+                         (content_hash, observed_at, slug))
+
+    if elapsed:
+        conn.execute('INSERT INTO slug_latency_buckets (slug, bucket, count) VALUES (?, ?, 1) '
+                     'ON CONFLICT (slug, bucket) DO UPDATE SET count = count + 1',
+                     (slug, latency_bucket(elapsed)))
+
+
+def rebuild_summaries(conn):
+    """Recompute every slug summary from the raw history (for databases that predate them)."""
+    conn.execute('DELETE FROM slug_summaries')
+    conn.execute('DELETE FROM slug_latency_buckets')
+    conn.execute('DELETE FROM blocked_transitions')
+    conn.execute('DELETE FROM content_hashes')
+    rows = conn.execute(
+        """
+        SELECT f.slug, f.verdict, f.fetched_at AS observed_at, 'http' AS source, f.status_code, f.elapsed,
+               f.content_hash, r.tool, f.user_agent
+        FROM fetches f JOIN runs r ON r.id = f.run_id
+        UNION ALL
+        SELECT slug, verdict, checked_at, 'browser', NULL, NULL, NULL, NULL, NULL FROM browser_verdicts
+        ORDER BY observed_at
+        """
+    ).fetchall()
+    for row in rows:
+        _observe(conn, row['slug'], row['verdict'], row['observed_at'], row['source'],
+                 status_code=row['status_code'], elapsed=row['elapsed'], content_hash=row['content_hash'],
+                 content_key=_content_key(row['tool'], row['user_agent']))
+    conn.commit()
+    return len(rows)
+
+
+def median_response_time(conn, slug):
+    """Median HTTP response time for a slug, read from its latency histogram (within 5%)."""
+    buckets = conn.execute('SELECT bucket, count FROM slug_latency_buckets WHERE slug = ? ORDER BY bucket',
+                           (slug,)).fetchall()
+    total = sum(row['count'] for row in buckets)
+    seen = 0
+    for row in buckets:
+        seen += row['count']
+        if seen * 2 >= total:
+            return _bucket_midpoint(row['bucket'])
+    return None
+
+
+def slug_summaries(conn):
+    """Every slug's materialized summary, with blocked rate and median response time."""
+    summaries = []
+    for row in conn.execute('SELECT * FROM slug_summaries ORDER BY slug').fetchall():
+        summary = dict(row)
+        summary['blocked_rate'] = row['blocked'] / row['observations'] if row['observations'] else 0.0
+        summary['median_response_time'] = median_response_time(conn, row['slug'])
+        summaries.append(summary)
+    return summaries
+
+
+def slugs_became_blocked(conn, since):
+    """
+    Slugs whose verdict changed to blocked at or after `since` (epoch seconds),
+    including slugs that have recovered since. Returns rows of (slug,
+    became_blocked_at, previous_verdict, source, latest_verdict).
+    """
+    return conn.execute(
+        'SELECT t.slug, t.became_blocked_at, t.previous_verdict, t.source, s.latest_verdict '
+        'FROM blocked_transitions t LEFT JOIN slug_summaries s ON s.slug = t.slug '
+        'WHERE t.became_blocked_at >= ? ORDER BY t.became_blocked_at',
+        (since,)
+    ).fetchall()
+
+
+def latest_fetch(conn, slug):
+    return conn.execute('SELECT * FROM fetches WHERE slug = ? ORDER BY fetched_at DESC LIMIT 1',
+                        (slug,)).fetchone()
+
+
+def latest_extraction(conn, slug, kind=None):
+    if kind is None:
+        return conn.execute('SELECT * FROM extractions WHERE slug = ? ORDER BY extracted_at DESC LIMIT 1',
+                            (slug,)).fetchone()
+    return conn.execute('SELECT * FROM extractions WHERE kind = ? AND slug = ? ORDER BY extracted_at DESC LIMIT 1',
+                        (kind, slug)).fetchone()
+
+
+def latest_browser_verdict(conn, slug):
+    return conn.execute('SELECT * FROM browser_verdicts WHERE slug = ? ORDER BY checked_at DESC LIMIT 1',
+                        (slug,)).fetchone()
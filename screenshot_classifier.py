@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Screenshot fingerprints for browser verdicts.
+Browser checks used to decide blocked/loading/content from "/blocked" in the
+URL and a run of element queries, which misses block pages rendered under the
+original URL (Chrome's "This site can't be reached" / ERR_QUIC page). Here each
+page gets one screenshot, downscaled to 17x16 grayscale for a difference hash,
+and that 256-bit hash is matched by Hamming distance against a small cache of
+known page states. A hit settles the verdict; a miss falls back to the DOM
+classifier and the result is learned, so the next page in that state is a hit.
+
+    python screenshot_classifier.py --list
+    python screenshot_classifier.py --label blocked shot.png [shot.png ...]
+    python screenshot_classifier.py --seed rachelirl_selenium_result.html   # render saved pages and learn them
+"""
+
+import argparse
+import io
+import json
+import os
+import time
+
+DEFAULT_STATES_PATH = 'screen_states.json'
+HASH_WIDTH = 17  # 17x16 pixels give 16x16 = 256 left/right comparisons
+HASH_HEIGHT = 16
+MATCH_DISTANCE = 10  # Max differing bits (of 256); near-blank pages differ by little more than this
+MAX_STATES = 64
+
+_pillow_missing_reported = False
+
+
+def _load_pillow():
+    global _pillow_missing_reported
+    try:
+        from PIL import Image
+        return Image
+    except ImportError:
+        if not _pillow_missing_reported:
+            print("Pillow not available. Install with: pip install Pillow")
+            _pillow_missing_reported = True
+        return None
+
+
+def screenshot_hash(png_bytes):
+    """Difference hash of a PNG screenshot as an int, or None without Pillow."""
+    Image = _load_pillow()
+    if Image is None:
+        return None
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        small = image.convert('L').resize((HASH_WIDTH, HASH_HEIGHT), Image.BILINEAR)
+        pixels = small.tobytes()  # One byte per pixel in 'L' mode
+    value = 0
+    for row in range(HASH_HEIGHT):
+        for col in range(HASH_WIDTH - 1):
+            left = pixels[row * HASH_WIDTH + col]
+            value = (value << 1) | (left > pixels[row * HASH_WIDTH + col + 1])
+    return value
+
+
+def load_screen_states(path=DEFAULT_STATES_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            states = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        states = []
+    for state in states:
+        state['hash'] = int(state['hash'], 16)
+    return states
+
+
+def save_screen_states(states, path=DEFAULT_STATES_PATH):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump([dict(state, hash=f"{state['hash']:064x}") for state in states], f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def match_state(states, value, max_distance=MATCH_DISTANCE):
+    """Closest known state within max_distance bits as (state, distance), or (None, None)."""
+    best, best_distance = None, None
+    for state in states:
+        distance = (state['hash'] ^ value).bit_count()
+        if distance <= max_distance and (best_distance is None or distance < best_distance):
+            best, best_distance = state, distance
+    return best, best_distance
+
+
+def learn_state(states, value, verdict, reason, url=None):
+    """Add a hash with its verdict; a near-identical known state just counts another hit."""
+    state, _ = match_state(states, value)
+    if state is not None and state['verdict'] == verdict:
+        state['hits'] += 1
+        state['last_seen'] = time.time()
+        return state
+    if state is not None:
+        # Same picture, different DOM verdict: the screenshot cannot tell them apart, so drop it
+        states.remove(state)
+        return None
+    if len(states) >= MAX_STATES:
+        states.remove(min(states, key=lambda s: (s['hits'], s['last_seen'])))
+    state = {'hash': value, 'verdict': verdict, 'reason': reason, 'example_url': url, 'hits': 1,
+             'last_seen': time.time()}
+    states.append(state)
+    return state
+
+
+def classify_screenshot(driver, states):
+    """
+    One screenshot and a lookup. Returns (verdict, reason, hash); verdict is None
+    when no known state matches (hash is None too when Pillow is missing).
+    """
+    value = screenshot_hash(driver.get_screenshot_as_png())
+    if value is None:
+        return None, None, None
+    state, distance = match_state(states, value)
+    if state is None:
+        return None, None, value
+    state['hits'] += 1
+    state['last_seen'] = time.time()
+    return state['verdict'], f"screenshot matches {state['reason']} ({distance} bits off)", value
+
+
+def learn_screenshot(driver, states, verdict, reason, value=None):
+    """
+    Remember the current page as verdict. Pass the hash classify_screenshot
+    returned so the state learned is the same picture that was looked up.
+    """
+    if value is None:
+        value = screenshot_hash(driver.get_screenshot_as_png())
+    if value is not None:
+        learn_state(states, value, verdict, reason, url=driver.current_url)
+    return value
+
+
+def short_hash(value):
+    """First 16 hex digits, enough to tell states apart in printed output."""
+    return f"{value:064x}"[:16]
+
+
+def print_states(states):
+    print(f"KNOWN SCREEN STATES ({len(states)})")
+    print("=" * 60)
+    for state in sorted(states, key=lambda s: (s['verdict'], -s['hits'])):
+        print(f"   {short_hash(state['hash'])}  {state['verdict']:<8} hits {state['hits']:>4}  {state['reason']}"
+              f"{'  e.g. ' + state['example_url'] if state.get('example_url') else ''}")
+
+
+def label_screenshots(paths, verdict, states):
+    """Learn PNG files (e.g. saved from a manual run) as a known state."""
+    for path in paths:
+        with open(path, 'rb') as f:
+            value = screenshot_hash(f.read())
+        if value is None:
+            return
+        learn_state(states, value, verdict, f'labelled {verdict}', url=path)
+        print(f"   {path}: {short_hash(value)} -> {verdict}")
+
+
+def seed_from_html(paths, states):
+    """Render saved HTML pages in headless Chrome and learn what the DOM classifier says about them."""
+    from tiered_fetch import classify_page, open_browser
+
+    driver = open_browser()
+    try:
+        for path in paths:
+            driver.get(f"file://{os.path.abspath(path)}")
+            html = driver.page_source
+            verdict, reason, _ = classify_page('', 200, html)
+            value = learn_screenshot(driver, states, verdict, reason)
+            if value is None:
+                return
+            print(f"   {path}: {short_hash(value)} -> {verdict} ({reason})")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the known screenshot states used for browser verdicts.")
+    parser.add_argument('--states', default=DEFAULT_STATES_PATH, help="state cache path")
+    parser.add_argument('--list', action='store_true', help="print the known states")
+    parser.add_argument('--label', metavar='VERDICT', help="learn the given PNG files as this verdict")
+    parser.add_argument('--seed', action='store_true', help="render the given saved HTML files and learn them")
+    parser.add_argument('files', nargs='*')
+    args = parser.parse_args()
+
+    states = load_screen_states(args.states)
+    if args.label:
+        label_screenshots(args.files, args.label, states)
+    elif args.seed:
+        try:
+            seed_from_html(args.files, states)
+        except ImportError:
+            print("Selenium not available. Install with: pip install selenium")
+    if args.label or args.seed:
+        save_screen_states(states, args.states)
+        print(f"\n[SAVE] Screen states saved to: {args.states}")
+    print_states(states)
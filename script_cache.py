@@ -0,0 +1,154 @@
+"""
+Fingerprint cache for page scripts.
+Most pages ship the same Next.js chunks and inline bootstrap scripts. Each
+script gets a fingerprint (the content-hashed src of an external bundle, or
+the length, kind, head and tail of an inline body) and a persistent index maps
+fingerprints to their analysis. Known scripts reuse the stored analysis, so a
+warm crawl neither copies nor scans their bodies; only new ones are analyzed.
+
+Fingerprints read a bounded slice of the body, so their cost does not grow
+with the script. Inline scripts of the same length and kind that match at both
+ends share a fingerprint; the analysis (kind, length, preview) is taken from
+those ends anyway.
+"""
+
+import hashlib
+import json
+import os
+
+DEFAULT_INDEX_PATH = 'script_index.json'
+PREVIEW_CHARS = 200
+KEY_CHARS = 512  # Head and tail of an inline body that go into its fingerprint
+
+# Inline script kinds, checked in order against the start of the body
+SCRIPT_KINDS = [
+    ('next_flight', 'self.__next_f'),
+    ('json_ld', '{"@context"'),
+    ('next_data', '{"props"'),
+]
+
+
+def load_script_index(path=DEFAULT_INDEX_PATH):
+    """
+    Load the persistent index (fingerprint -> analysis), or start an empty one.
+    path=None starts an index that lives in memory only and is never saved.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    except (TypeError, FileNotFoundError, json.JSONDecodeError):
+        entries = {}
+    # Indexes written before analyses were stored hold bare kinds; those entries are dropped
+    entries = {fingerprint: entry for fingerprint, entry in entries.items() if isinstance(entry, dict)}
+    # 'fingerprints' memoizes body -> fingerprint for this process, so a repeat skips the hash too
+    return {'path': path, 'entries': entries, 'fingerprints': {}, 'dirty': False, 'hits': 0, 'misses': 0}
+
+
+def save_script_index(index):
+    """Write the index back if a new fingerprint was added."""
+    if not index['dirty'] or index['path'] is None:
+        return
+    tmp_path = f"{index['path']}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index['entries'], f, ensure_ascii=False)
+    os.replace(tmp_path, index['path'])
+    index['dirty'] = False
+
+
+def script_kind(text):
+    """Kind of an inline script, from the start of its body."""
+    head = text[:KEY_CHARS].lstrip()
+    for name, marker in SCRIPT_KINDS:
+        if head.startswith(marker):
+            return name
+    return 'inline'
+
+
+def fingerprint_script(text):
+    """'<kind>:<hash>' of an inline body's length, head and tail."""
+    ends = text if len(text) <= 2 * KEY_CHARS else text[:KEY_CHARS] + text[-KEY_CHARS:]
+    digest = hashlib.blake2b(f"{len(text)}:{ends}".encode('utf-8', errors='surrogatepass'), digest_size=16)
+    return f"{script_kind(text)}:{digest.hexdigest()}"
+
+
+def _memo_fingerprint(index, text):
+    """fingerprint_script through the index's in-process memo, keyed on the same slices it hashes."""
+    key = str(text) if len(text) <= 2 * KEY_CHARS else (len(text), text[:KEY_CHARS], text[-KEY_CHARS:])
+    fingerprint = index['fingerprints'].get(key)
+    if fingerprint is None:
+        fingerprint = index['fingerprints'][key] = fingerprint_script(text)
+    return fingerprint
+
+
+def _script_body(script):
+    """The script's text node as-is (no get_text() join/copy); '' for external scripts."""
+    if script.string is not None:
+        return script.string
+    return ''.join(script.strings)
+
+
+def analyze_script(text):
+    """Analysis stored for an inline script: kind, length and a short preview."""
+    body = text.strip()
+    return {
+        'kind': script_kind(body),
+        'length': len(body),
+        'preview': body[:PREVIEW_CHARS] + '...' if len(body) > PREVIEW_CHARS else body
+    }
+
+
+def script_analysis(index, script):
+    """
+    Return (fingerprint, analysis, is_new) for a <script> tag, analyzing it only
+    if the index has no analysis for its fingerprint. index may be None to
+    analyze without the lookup (every script then counts as new).
+    """
+    src = script.get('src')
+    if src:
+        fingerprint = 'src:' + src.split('?')[0]
+        body = None
+    else:
+        body = _script_body(script)
+        if not body or body.isspace():
+            return None, None, False
+        fingerprint = _memo_fingerprint(index, body) if index is not None else fingerprint_script(body)
+
+    entry = index['entries'].get(fingerprint) if index is not None else None
+    if entry is not None and (body is None or 'preview' in entry):
+        index['hits'] += 1
+        return fingerprint, entry, False
+
+    analysis = {'kind': 'external', 'src': src} if src else analyze_script(body)
+    if index is None:
+        return fingerprint, analysis, True
+    # An entry without a preview was added by count_new_scripts: the script is known, its analysis is filled in
+    is_new = entry is None
+    index['hits' if entry is not None else 'misses'] += 1
+    index['entries'][fingerprint] = analysis
+    index['dirty'] = True
+    return fingerprint, analysis, is_new
+
+
+def count_new_scripts(index, fingerprints):
+    """
+    Add fingerprints from an extraction made without the index (e.g. in a parse
+    worker) and return how many were new. The kind comes from the fingerprint;
+    the rest of the analysis is filled in when a crawl next meets the script.
+    """
+    new = 0
+    for fingerprint in fingerprints:
+        if fingerprint in index['entries']:
+            index['hits'] += 1
+            continue
+        index['misses'] += 1
+        kind = 'external' if fingerprint.startswith('src:') else fingerprint.split(':', 1)[0]
+        index['entries'][fingerprint] = {'kind': kind}
+        index['dirty'] = True
+        new += 1
+    return new
+
+
+def format_index_stats(index):
+    lookups = index['hits'] + index['misses']
+    rate = index['hits'] / lookups if lookups else 0.0
+    return f"{index['hits']}/{lookups} scripts known ({rate:.0%} hit rate), {len(index['entries'])} in index"
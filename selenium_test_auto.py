@@ -6,6 +6,9 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 import time
+from results_store import BLOCKED, CONTENT, ERROR, finish_run, open_store, record_browser_verdict, start_run
+
+TARGET_URL = "http://localhost:3000/josh"
 
 def test_bot_protection():
     print("Testing Bot Protection with Python Selenium")
@@ -22,9 +25,11 @@ def test_bot_protection():
     service = Service(ChromeDriverManager().install())
     driver = webdriver.Chrome(service=service, options=chrome_options)
     
+    verdict = ERROR
+    current_url = None
     try:
         print("Navigating to http://localhost:3000/josh...")
-        driver.get("http://localhost:3000/josh")
+        driver.get(TARGET_URL)
         
         # Wait a moment for page to load
         time.sleep(3)
@@ -41,6 +46,7 @@ def test_bot_protection():
         if "This site can't be reached" in page_title or "404" in page_title:
             print("✅ SUCCESS: Bot was blocked!")
             print("🔒 Selenium got the error page - protection is working!")
+            verdict = BLOCKED
             
         # Check if we got redirected to human-check
         elif "/human-check" in current_url:
@@ -54,6 +60,7 @@ def test_bot_protection():
             
             print("✅ Redirected back to /josh")
             print("❌ FAILED: Bot was not blocked - got through human-check")
+            verdict = CONTENT
             
         # Check if we can see Josh content
         elif "/josh" in current_url:
@@ -65,11 +72,14 @@ def test_bot_protection():
                 
                 if "josh" in josh_text.lower():
                     print("❌ FAILED: Bot was not blocked - can see Josh content!")
+                    verdict = CONTENT
                 else:
                     print("✅ SUCCESS: Bot was blocked - no Josh content visible")
+                    verdict = BLOCKED
                     
             except:
                 print("❌ FAILED: Bot was not blocked - page loaded successfully")
+                verdict = CONTENT
         
         else:
             print(f"❓ Unexpected URL: {current_url}")
@@ -85,6 +95,11 @@ def test_bot_protection():
     finally:
         print("\n🎯 Test complete! Closing browser...")
         driver.quit()
+        
+        store = open_store()
+        run_id = start_run(store, 'selenium_test_auto')
+        record_browser_verdict(store, run_id, TARGET_URL, verdict, final_url=current_url)
+        finish_run(store, run_id)
 
 if __name__ == "__main__":
     test_bot_protection()
@@ -4,12 +4,10 @@ Simple Python script to test rachel link access with specific user agent.
 Run this script to test the rachel endpoints.
 """
 
-import requests
-import time
-
-# Configuration
-BASE_URL = "https://www.viewit.bio"  # The actual domain
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36"
+from fetcher import BASE_URL, USER_AGENT, load_managed_slugs, make_session, probe_url
+from rate_control import (PACING_INTERVAL, fetch_with_retry, new_rate_controller, print_controller_summary,
+                          run_controlled)
+from results_store import finish_run, open_store, record_fetch, start_run
 
 def test_rachel_link():
     """Test accessing the rachel link with the specified user agent."""
@@ -30,28 +28,36 @@ def test_rachel_link():
     print(f"User-Agent: {USER_AGENT}")
     print("=" * 80)
     
+    store = open_store()
+    run_id = start_run(store, 'simple_rachel_test', {'endpoints': endpoints})
+    session = make_session(headers)
+    # One request at a time, so the controller paces the gaps between them
+    controller = new_rate_controller(pacing=PACING_INTERVAL)
+    
     for endpoint in endpoints:
         url = f"{BASE_URL}{endpoint}"
         print(f"\nTesting: {url}")
         
-        try:
-            start_time = time.time()
-            response = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
-            end_time = time.time()
-            
-            print(f"Status Code: {response.status_code}")
-            print(f"Response Time: {end_time - start_time:.2f} seconds")
-            print(f"Final URL: {response.url}")
-            print(f"Content Length: {len(response.content)} bytes")
+        # Paced and retried on errors/429/5xx instead of a fixed sleep
+        fetched = fetch_with_retry(url, controller, session=session)
+        record_fetch(store, run_id, fetched)
+        
+        if fetched['error']:
+            print(f"ERROR: Request failed after {fetched['attempts']} attempts: {fetched['error']}")
+        else:
+            print(f"Status Code: {fetched['status_code']}")
+            print(f"Response Time: {fetched['elapsed']:.2f} seconds")
+            print(f"Final URL: {fetched['final_url']}")
+            print(f"Content Length: {len(fetched['content'])} bytes")
             
             # Check for redirects
-            if response.history:
-                print(f"Redirects ({len(response.history)}):")
-                for i, hist_resp in enumerate(response.history):
-                    print(f"  {i+1}. {hist_resp.status_code} -> {hist_resp.url}")
+            if fetched['history']:
+                print(f"Redirects ({len(fetched['history'])}):")
+                for i, hop in enumerate(fetched['history']):
+                    print(f"  {i+1}. {hop['status_code']} -> {hop['url']}")
             
             # Check for bot detection
-            content = response.text.lower()
+            content = fetched['text'].lower()
             bot_indicators = ['botd', 'bot detection', 'human verification', 'captcha', 'verification']
             found_indicators = [indicator for indicator in bot_indicators if indicator in content]
             
@@ -63,14 +69,89 @@ def test_rachel_link():
             # Save response to file
             filename = f"response_{endpoint.replace('/', '_')}.html"
             with open(filename, 'w', encoding='utf-8') as f:
-                f.write(response.text)
+                f.write(fetched['text'])
             print(f"Response saved to: {filename}")
-            
-        except requests.exceptions.RequestException as e:
-            print(f"ERROR: Request failed: {e}")
         
         print("-" * 40)
-        time.sleep(1)  # Small delay between requests
+    
+    finish_run(store, run_id)
+    print_controller_summary(controller)
+
+def probe_rachel_links(endpoints=None, scan=True, max_bytes=16384):
+    """Probe status, redirect chain and indicators without downloading full pages."""
+    
+    endpoints = endpoints or ["/rachel", "/rachelirl", "/rachsotiny"]
+    indicators = ['botd', 'bot detection', 'human verification', 'captcha', 'verification'] if scan else None
+    session = make_session({
+        'User-Agent': USER_AGENT,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Connection': 'keep-alive',
+    })
+    
+    print("Probing Rachel Links with User Agent:")
+    print(f"User-Agent: {USER_AGENT}")
+    print(f"Indicator scan: {'first ' + format(max_bytes, ',') + ' bytes' if scan else 'OFF'}")
+    print("=" * 80)
+    
+    total_bytes = 0
+    store = open_store()
+    run_id = start_run(store, 'simple_rachel_test', {'endpoints': endpoints, 'probe': True, 'scan': scan})
+    controller = new_rate_controller()
+    
+    def probe(url, session=None, headers=None):
+        return probe_url(url, session=session, indicators=indicators, max_bytes=max_bytes)
+    
+    # Probes run concurrently, as many per host as the rate controller currently allows
+    results = run_controlled([f"{BASE_URL}{endpoint}" for endpoint in endpoints],
+                             lambda url: fetch_with_retry(url, controller, session=session, fetch=probe),
+                             controller)
+    
+    for endpoint, result in zip(endpoints, results):
+        total_bytes += result['bytes_read']
+        record_fetch(store, run_id, result)
+        
+        if result['error']:
+            print(f"{endpoint}: ERROR - {result['error']}")
+            continue
+        
+        hops = ' -> '.join(f"{hop['status_code']} {hop['url'].replace(BASE_URL, '')}" for hop in result['chain'])
+        flags = []
+        if '/blocked' in result['final_url']:
+            flags.append('BLOCKED')
+        if '/human-check' in result['final_url']:
+            flags.append('HUMAN-CHECK')
+        if result['rewrite']:
+            flags.append(f"REWRITE {result['rewrite']}")
+        if result['indicators_found']:
+            flags.append(f"INDICATORS {', '.join(result['indicators_found'])}")
+        
+        print(f"{endpoint}: {result['status_code']} in {result['elapsed']:.2f}s [{hops}] {' '.join(flags)}")
+    
+    finish_run(store, run_id)
+    print("-" * 40)
+    print(f"Probed {len(results)} pages, {total_bytes:,} body bytes read")
+    print_controller_summary(controller)
+    return results
 
 if __name__ == "__main__":
-    test_rachel_link()
+    import argparse
+    parser = argparse.ArgumentParser(description="Test rachel link access with a specific user agent.")
+    parser.add_argument('--probe', action='store_true',
+                        help="HEAD/ranged probes only: status, redirects and indicators without full bodies")
+    parser.add_argument('--all', action='store_true', help="probe every managed slug from middleware.ts")
+    parser.add_argument('--no-scan', action='store_true', help="skip the indicator scan (HEAD requests only)")
+    parser.add_argument('--max-bytes', type=int, default=16384, help="body prefix to scan for indicators")
+    parser.add_argument('--monitor', action='store_true',
+                        help="keep probing every managed slug and serve rolling latency stats (see synthetic_monitor)")
+    parser.add_argument('--interval', type=int, default=60, help="seconds between monitor rounds")
+    args = parser.parse_args()
+    
+    if args.monitor:
+        from synthetic_monitor import run_monitor
+        run_monitor(load_managed_slugs(), interval=args.interval)
+    elif args.probe or args.all:
+        endpoints = [f"/{slug}" for slug in load_managed_slugs()] if args.all else None
+        probe_rachel_links(endpoints, scan=not args.no_scan, max_bytes=args.max_bytes)
+    else:
+        test_rachel_link()
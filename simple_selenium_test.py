@@ -7,6 +7,12 @@ from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 import json
+from fetcher import BASE_URL
+from results_store import (BLOCKED, CONTENT, ERROR, finish_run, open_store, record_browser_verdict,
+                           record_page_timing, start_run)
+from screenshot_classifier import load_screen_states, save_screen_states
+from tiered_fetch import classify_browser_page
+from web_vitals import capture_page_timing, install_timing_observer
 
 def test_bot_protection():
     print("🤖 Testing Bot Protection with Python Selenium")
@@ -28,7 +34,7 @@ def test_bot_protection():
     
     try:
         print("📍 Navigating to http://localhost:3000/rachelirl...")
-        driver.get("https://www.viewit.bio/rachelirl")
+        driver.get(f"{BASE_URL}/rachelirl")
         
         # Wait for page to load
         print("⏳ Waiting for page to load...")
@@ -186,7 +192,7 @@ def test_bot_protection():
         time.sleep(2)  # Give time to see results
         driver.quit()
 
-def test_multiple_pages():
+def test_multiple_pages(store=None, run_id=None):
     """Test multiple pages to see if protection is consistent"""
     pages_to_test = ["/rachelirl", "/josh"]
     
@@ -194,6 +200,7 @@ def test_multiple_pages():
     print("=" * 60)
     
     results = {}
+    screen_states = load_screen_states()
     
     for page in pages_to_test:
         print(f"\n🧪 Testing page: {page}")
@@ -210,15 +217,30 @@ def test_multiple_pages():
         service = Service(ChromeDriverManager().install())
         driver = webdriver.Chrome(service=service, options=chrome_options)
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        install_timing_observer(driver)
         
+        url = f"{BASE_URL}/{page}"
+        current_url = None
+        verdict = ERROR
+        start_time = time.time()
         try:
-            driver.get(f"https://www.viewit.bio/{page}")
-            time.sleep(5)
+            # Loads the page, waits for the loading screen to go and records what it cost
+            timing = capture_page_timing(driver, url)
+            if store is not None:
+                record_page_timing(store, run_id, url, timing)
+            if not timing['blocked'] and timing['protection'] is not None:
+                print(f"   Time to content: {timing['time_to_content']:.0f} ms "
+                      f"({timing['protection']:.0f} ms in the protection flow)")
             
             current_url = driver.current_url
             page_title = driver.title
             
-            if "/blocked" in current_url:
+            # URL first, then a known screenshot, then the DOM (which also catches
+            # block pages rendered under the original URL)
+            verdict, reason, method = classify_browser_page(driver, screen_states)
+            print(f"   Verdict: {verdict} via {method} ({reason})")
+            
+            if verdict == BLOCKED:
                 results[page] = "BLOCKED"
                 print(f"✅ {page}: Bot was blocked!")
             else:
@@ -226,11 +248,18 @@ def test_multiple_pages():
                 print(f"❌ {page}: Bot was NOT blocked!")
                 
         except Exception as e:
+            verdict = ERROR
             results[page] = f"ERROR: {str(e)}"
             print(f"💥 {page}: Error - {str(e)}")
             
         finally:
             driver.quit()
+        
+        if store is not None:
+            record_browser_verdict(store, run_id, url, verdict, final_url=current_url,
+                                   elapsed=time.time() - start_time, reason='selenium multi-page test')
+    
+    save_screen_states(screen_states)
     
     print("\n" + "="*60)
     print("📊 FINAL RESULTS SUMMARY:")
@@ -241,19 +270,29 @@ def test_multiple_pages():
     
     return results
 
-if __name__ == "__main__":
+def main():
+    """Run the detailed single-page test and the multi-page test, recording both."""
     print("🚀 Starting comprehensive bot protection test...")
     
+    store = open_store()
+    run_id = start_run(store, 'simple_selenium_test')
+    
     # Test single page in detail
     print("\n1️⃣ DETAILED SINGLE PAGE TEST:")
     single_result = test_bot_protection()
+    record_browser_verdict(store, run_id, f"{BASE_URL}/rachelirl",
+                           BLOCKED if single_result else CONTENT, reason='selenium detailed test')
     
     # Test multiple pages
     print("\n2️⃣ MULTIPLE PAGES TEST:")
-    multiple_results = test_multiple_pages()
+    multiple_results = test_multiple_pages(store, run_id)
+    finish_run(store, run_id)
     
     print("\n🎯 FINAL VERDICT:")
     if single_result and all(result == "BLOCKED" for result in multiple_results.values()):
         print("🛡️ Bot protection is working PERFECTLY!")
     else:
-        print("⚠️ Bot protection needs improvement!")
\ No newline at end of file
+        print("⚠️ Bot protection needs improvement!")
+
+if __name__ == "__main__":
+    main()
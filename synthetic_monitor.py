@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Continuous synthetic monitor for the managed slugs.
+Every interval each slug is probed (HEAD/ranged, no full bodies) and the
+sample goes into a fixed-size per-slug ring buffer and a log-bucket latency
+histogram, so memory stays flat however long the monitor runs. Rolling
+p50/p95/p99 latency, status-code mix and blocked rate over the ring are served
+as text, JSON and Prometheus metrics from a local HTTP endpoint, and threshold
+alerts are printed (and appended to an alert log) when they fire and resolve.
+
+    python synthetic_monitor.py --interval 60 --port 9108
+    curl localhost:9108/          # text table
+    curl localhost:9108/metrics   # Prometheus
+"""
+
+import argparse
+import json
+import math
+import threading
+import time
+from array import array
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fetcher import BASE_URL, load_managed_slugs, make_session, probe_url
+from rate_control import fetch_with_retry, new_rate_controller, run_controlled
+from results_store import (BLOCKED, ERROR, LATENCY_BUCKET_BASE, LATENCY_BUCKET_GROWTH, fetch_verdict, finish_run,
+                           latency_bucket, open_store, record_fetch, start_run)
+
+RING_SIZE = 240  # samples per slug; 4 hours at the default interval
+DEFAULT_INTERVAL = 60
+DEFAULT_PORT = 9108
+ALERT_LOG_PATH = 'monitor_alerts.log'
+MIN_SAMPLES_FOR_ALERT = 5
+ALERT_WINDOW = 15  # most recent samples the alert rules look at
+
+# Alert rules: name -> (description, check(stats) -> bool)
+P95_LIMIT_SECONDS = 2.0
+REGRESSION_FACTOR = 3.0
+BLOCKED_RATE_LIMIT = 0.5
+ERROR_RATE_LIMIT = 0.2
+ALERT_RULES = {
+    'p95_latency': (f"p95 latency over {P95_LIMIT_SECONDS:.1f}s",
+                    lambda stats: stats['p95'] is not None and stats['p95'] > P95_LIMIT_SECONDS),
+    'latency_regression': (f"p95 latency over {REGRESSION_FACTOR:.0f}x the slug's earlier median",
+                           lambda stats: (stats['p95'] is not None and stats['baseline_p50'] is not None
+                                          and stats['p95'] > REGRESSION_FACTOR * stats['baseline_p50'])),
+    'blocked_rate': (f"blocked rate over {BLOCKED_RATE_LIMIT:.0%}",
+                     lambda stats: stats['blocked_rate'] > BLOCKED_RATE_LIMIT),
+    'error_rate': (f"error rate over {ERROR_RATE_LIMIT:.0%}",
+                   lambda stats: stats['error_rate'] > ERROR_RATE_LIMIT),
+}
+
+
+def new_slug_monitor(ring_size=RING_SIZE):
+    """Preallocated ring buffer plus an all-time latency histogram for one slug."""
+    return {
+        'times': array('d', [0.0]) * ring_size,
+        'latencies': array('d', [0.0]) * ring_size,
+        'statuses': array('H', [0]) * ring_size,  # 0 = no response
+        'verdicts': [None] * ring_size,
+        'next': 0,
+        'count': 0,
+        'histogram': {},
+        'firing': set()
+    }
+
+
+def record_sample(monitor, observed_at, latency, status_code, verdict):
+    index = monitor['next']
+    monitor['times'][index] = observed_at
+    monitor['latencies'][index] = latency
+    monitor['statuses'][index] = status_code or 0
+    monitor['verdicts'][index] = verdict
+    monitor['next'] = (index + 1) % len(monitor['times'])
+    monitor['count'] = min(monitor['count'] + 1, len(monitor['times']))
+    if status_code:
+        bucket = latency_bucket(latency)
+        monitor['histogram'][bucket] = monitor['histogram'].get(bucket, 0) + 1
+
+
+def _recent_indexes(monitor):
+    """Ring positions from newest to oldest."""
+    size = len(monitor['times'])
+    return [(monitor['next'] - 1 - i) % size for i in range(monitor['count'])]
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def _histogram_median(histogram):
+    total = sum(histogram.values())
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen * 2 >= total:
+            return LATENCY_BUCKET_BASE * LATENCY_BUCKET_GROWTH ** (bucket + 0.5)
+    return None
+
+
+def slug_stats(monitor, window=None):
+    """
+    Rolling stats over the newest `window` samples (default: the whole ring).
+    baseline_p50 is the median of the older samples still in the ring, which
+    the latency regression rule compares against.
+    """
+    ring_indexes = _recent_indexes(monitor)
+    indexes = ring_indexes[:window] if window else ring_indexes
+    latencies = sorted(monitor['latencies'][i] for i in indexes if monitor['statuses'][i])
+    earlier = sorted(monitor['latencies'][i] for i in ring_indexes[len(indexes):] if monitor['statuses'][i])
+    verdicts = [monitor['verdicts'][i] for i in indexes]
+    samples = len(indexes)
+    return {
+        'samples': samples,
+        'p50': _percentile(latencies, 0.50),
+        'p95': _percentile(latencies, 0.95),
+        'p99': _percentile(latencies, 0.99),
+        'baseline_p50': _percentile(earlier, 0.50) if len(earlier) >= MIN_SAMPLES_FOR_ALERT else None,
+        'all_time_p50': _histogram_median(monitor['histogram']),
+        'status_mix': dict(Counter(monitor['statuses'][i] or 'none' for i in indexes)),
+        'blocked_rate': verdicts.count(BLOCKED) / samples if samples else 0.0,
+        'error_rate': verdicts.count(ERROR) / samples if samples else 0.0,
+        'last_at': monitor['times'][indexes[0]] if indexes else None
+    }
+
+
+def evaluate_alerts(slug, monitor, alert_log=ALERT_LOG_PATH):
+    """Fire or resolve each rule on the most recent samples; returns the transitions."""
+    stats = slug_stats(monitor, ALERT_WINDOW)
+    if stats['samples'] < MIN_SAMPLES_FOR_ALERT:
+        return []
+    transitions = []
+    for name, (description, check) in ALERT_RULES.items():
+        active = check(stats)
+        if active and name not in monitor['firing']:
+            monitor['firing'].add(name)
+            transitions.append(('FIRING', name, description))
+        elif not active and name in monitor['firing']:
+            monitor['firing'].discard(name)
+            transitions.append(('RESOLVED', name, description))
+
+    for state, name, description in transitions:
+        p95 = f"{stats['p95'] * 1000:.0f}ms" if stats['p95'] is not None else 'n/a'
+        line = (f"{time.strftime('%Y-%m-%d %H:%M:%S')} [ALERT {state}] {slug}: {description} "
+                f"(p95 {p95}, blocked {stats['blocked_rate']:.0%}, errors {stats['error_rate']:.0%})")
+        print(line)
+        if alert_log:
+            with open(alert_log, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+    return transitions
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.0f}ms" if seconds is not None else '-'
+
+
+def format_status_text(monitors):
+    lines = [f"{'SLUG':<24} {'N':>4} {'P50':>7} {'P95':>7} {'P99':>7} {'BLOCKED':>8} {'ERRORS':>7}  STATUS MIX / ALERTS"]
+    for slug, monitor in sorted(monitors.items()):
+        stats = slug_stats(monitor)
+        mix = ' '.join(f"{code}:{count}" for code, count in sorted(stats['status_mix'].items(), key=str))
+        alerts = f"  !! {', '.join(sorted(monitor['firing']))}" if monitor['firing'] else ''
+        lines.append(f"{slug:<24} {stats['samples']:>4} {_ms(stats['p50']):>7} {_ms(stats['p95']):>7} "
+                     f"{_ms(stats['p99']):>7} {stats['blocked_rate']:>8.0%} {stats['error_rate']:>7.0%}  {mix}{alerts}")
+    return '\n'.join(lines) + '\n'
+
+
+def format_prometheus(monitors, job='viewit_monitor'):
+    lines = ['# HELP viewit_monitor_latency_seconds Rolling probe latency quantiles per slug.',
+             '# TYPE viewit_monitor_latency_seconds gauge']
+    rates = []
+    for slug, monitor in sorted(monitors.items()):
+        stats = slug_stats(monitor)
+        for quantile in ('p50', 'p95', 'p99'):
+            if stats[quantile] is not None:
+                lines.append(f'viewit_monitor_latency_seconds{{job="{job}",slug="{slug}",'
+                             f'quantile="0.{quantile[1:]}"}} {stats[quantile]:.6f}')
+        rates.append((slug, stats, monitor['firing']))
+    lines += ['# HELP viewit_monitor_blocked_ratio Share of recent probes that were blocked.',
+              '# TYPE viewit_monitor_blocked_ratio gauge']
+    lines += [f'viewit_monitor_blocked_ratio{{job="{job}",slug="{slug}"}} {stats["blocked_rate"]:.4f}'
+              for slug, stats, _ in rates]
+    lines += ['# HELP viewit_monitor_status_total Recent probes by status code.',
+              '# TYPE viewit_monitor_status_total gauge']
+    lines += [f'viewit_monitor_status_total{{job="{job}",slug="{slug}",code="{code}"}} {count}'
+              for slug, stats, _ in rates for code, count in sorted(stats['status_mix'].items(), key=str)]
+    lines += ['# HELP viewit_monitor_alert_firing Alert rules currently firing.',
+              '# TYPE viewit_monitor_alert_firing gauge']
+    lines += [f'viewit_monitor_alert_firing{{job="{job}",slug="{slug}",alert="{name}"}} 1'
+              for slug, _, firing in rates for name in sorted(firing)]
+    return '\n'.join(lines) + '\n'
+
+
+def start_status_server(monitors, lock, port=DEFAULT_PORT, host='127.0.0.1'):
+    """Serve / (text), /json and /metrics (Prometheus) from a background thread."""
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                if self.path.startswith('/metrics'):
+                    body, content_type = format_prometheus(monitors), 'text/plain; version=0.0.4'
+                elif self.path.startswith('/json'):
+                    stats = {slug: dict(slug_stats(monitor), alerts=sorted(monitor['firing']))
+                             for slug, monitor in monitors.items()}
+                    body, content_type = json.dumps(stats, indent=2, default=str), 'application/json'
+                else:
+                    body, content_type = format_status_text(monitors), 'text/plain; charset=utf-8'
+            payload = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_monitor(slugs, interval=DEFAULT_INTERVAL, port=DEFAULT_PORT, rounds=None, record=False, base_url=BASE_URL):
+    """Probe every slug each interval until interrupted (or for `rounds` rounds)."""
+    monitors = {slug: new_slug_monitor() for slug in slugs}
+    lock = threading.Lock()
+    session = make_session()
+    controller = new_rate_controller()
+    server = start_status_server(monitors, lock, port) if port else None
+    store = open_store() if record else None
+    run_id = start_run(store, 'synthetic_monitor', {'slugs': len(slugs), 'interval': interval}) if record else None
+
+    def probe(url, session=None, headers=None):
+        return probe_url(url, session=session)
+
+    def check(slug):
+        # No retries: a slow or failed probe is exactly what the monitor should see
+        return slug, fetch_with_retry(f"{base_url.rstrip('/')}/{slug}", controller, session=session,
+                                      max_retries=0, fetch=probe)
+
+    print("SYNTHETIC MONITOR")
+    print("=" * 60)
+    print(f"Slugs: {len(slugs)}, interval: {interval}s, ring: {RING_SIZE} samples per slug")
+    if server:
+        print(f"Status: http://127.0.0.1:{port}/ (also /json, /metrics)")
+    print("=" * 60)
+
+    completed = 0
+    try:
+        while rounds is None or completed < rounds:
+            round_start = time.time()
+            for slug, result in run_controlled(slugs, check, controller):
+                verdict = fetch_verdict(result['final_url'], result['status_code'], result['error'])
+                with lock:
+                    record_sample(monitors[slug], time.time(), result['elapsed'], result['status_code'], verdict)
+                    evaluate_alerts(slug, monitors[slug])
+                if store is not None:
+                    record_fetch(store, run_id, result, slug=slug, verdict=verdict)
+            completed += 1
+
+            with lock:
+                worst = max(monitors.items(), key=lambda item: slug_stats(item[1], ALERT_WINDOW)['p95'] or 0.0)
+                firing = sum(len(monitor['firing']) for monitor in monitors.values())
+            worst_p95 = slug_stats(worst[1], ALERT_WINDOW)['p95']
+            print(f"[{time.strftime('%H:%M:%S')}] Round {completed}: {len(slugs)} probes in "
+                  f"{time.time() - round_start:.1f}s, worst p95 {worst[0]} {_ms(worst_p95)}, {firing} alerts firing")
+
+            if rounds is None or completed < rounds:
+                time.sleep(max(0.0, interval - (time.time() - round_start)))
+    except KeyboardInterrupt:
+        print("\nStopping monitor")
+    finally:
+        if server:
+            server.shutdown()
+        if store is not None:
+            finish_run(store, run_id)
+            store.close()
+
+    print()
+    print(format_status_text(monitors), end='')
+    return monitors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Probe every managed slug on a schedule and serve rolling stats.")
+    parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL, help="seconds between probe rounds")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="status endpoint port (0 to disable)")
+    parser.add_argument('--rounds', type=int, help="stop after this many rounds")
+    parser.add_argument('--record', action='store_true', help="also store every probe in the results store")
+    parser.add_argument('--slugs', nargs='+', help="slugs to monitor (default: managed slugs from middleware.ts)")
+    args = parser.parse_args()
+
+    run_monitor(args.slugs or load_managed_slugs(), interval=args.interval, port=args.port, rounds=args.rounds,
+                record=args.record)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Tiered page fetcher: plain HTTP first, headless browser only when needed.
+Each HTTP response goes through a cheap classifier; only pages that stay
+ambiguous (loading shell, human check) are escalated to the browser tier.
+"""
+
+import json
+import sys
+import time
+
+from fetcher import BASE_URL, USER_AGENT, fetch_page, load_managed_slugs, make_session
+from nextjs_payload import extract_payload_content
+from results_store import (BLOCKED, CONTENT, ERROR, LOADING, finish_run, open_store, record_browser_verdict,
+                           record_fetch, start_run)
+from screenshot_classifier import classify_screenshot, learn_screenshot, load_screen_states, save_screen_states
+from crawl_journal import (close_journal, is_completed, journal_done, journal_failed, journal_start, open_journal,
+                           print_resume_summary)
+
+# Verdicts the HTTP tier cannot settle on its own
+AMBIGUOUS_VERDICTS = {LOADING}
+
+BLOCKED_URL_MARKERS = ['/blocked']
+CHALLENGE_URL_MARKERS = ['/human-check']
+
+JOURNAL_PATH = 'tiered_fetch.journal'
+BLOCKED_STATUS_CODES = {401, 403, 429, 451}
+BLOCKED_TEXT_MARKERS = ["This site can't be reached", 'ERR_QUIC_PROTOCOL_ERROR', 'Access denied']
+LOADING_TEXT_MARKERS = ['Loading...', 'animate-spin']
+
+
+def classify_page(final_url, status_code, html_content):
+    """
+    Classify a fetched page as content, loading, blocked or error.
+    Returns (verdict, reason, payload) where payload is the embedded Next.js
+    extraction, or None when the page was settled before parsing.
+    """
+    if status_code is None:
+        return ERROR, 'no response', None
+
+    if any(marker in final_url for marker in BLOCKED_URL_MARKERS):
+        return BLOCKED, 'redirected to blocked page', None
+    if status_code in BLOCKED_STATUS_CODES:
+        return BLOCKED, f'status {status_code}', None
+    if status_code >= 400:
+        return ERROR, f'status {status_code}', None
+    if any(marker in final_url for marker in CHALLENGE_URL_MARKERS):
+        return LOADING, 'human check challenge', None
+
+    head = html_content[:4096]
+    for marker in BLOCKED_TEXT_MARKERS:
+        if marker in head:
+            return BLOCKED, f'blocked marker: {marker}', None
+
+    payload = extract_payload_content(html_content, final_url)
+    if payload['creator_name'] and not payload['browser_only_fields']:
+        source = 'server HTML' if payload['server_html_fields'] else 'embedded payload'
+        return CONTENT, f'content in {source}', payload
+
+    for marker in LOADING_TEXT_MARKERS:
+        if marker in html_content:
+            return LOADING, f'loading marker: {marker}', payload
+
+    if '<img' in html_content or '<h1' in html_content:
+        return CONTENT, 'content in server HTML', payload
+
+    return LOADING, 'no content found over HTTP', payload
+
+
+def new_tier_stats():
+    """Create empty per-tier counters and latency samples."""
+    return {
+        'http': {'count': 0, 'latencies': []},
+        'browser': {'count': 0, 'latencies': [], 'launches': 0},
+        'verdicts': {},
+        'escalations': 0
+    }
+
+
+def open_browser(user_agent=USER_AGENT):
+    """Start a headless Chrome session for the browser tier."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument(f'--user-agent={user_agent}')
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    return webdriver.Chrome(options=chrome_options)
+
+
+def classify_browser_page(driver, screen_states=None):
+    """
+    Verdict for the page the browser is showing, as (verdict, reason, method).
+    The URL check comes first, so a /blocked redirect is never overridden by a
+    screenshot that happens to look like a known state. Then a known screenshot
+    settles the verdict; otherwise the DOM is classified and the screenshot
+    (the same one that was looked up) is learned with that verdict.
+    """
+    current_url = driver.current_url
+    if any(marker in current_url for marker in BLOCKED_URL_MARKERS):
+        return BLOCKED, 'redirected to blocked page', 'url'
+
+    value = None
+    if screen_states is not None:
+        verdict, reason, value = classify_screenshot(driver, screen_states)
+        if verdict is not None and verdict != LOADING:
+            return verdict, reason, 'screenshot'
+
+    verdict, reason, _ = classify_page(current_url, 200, driver.page_source)
+    if screen_states is not None and value is not None:
+        learn_screenshot(driver, screen_states, verdict, reason, value=value)
+    return verdict, reason, 'dom'
+
+
+def browser_fetch(driver, url, wait=10, screen_states=None):
+    """
+    Load a URL in the browser until the loading shell goes away, then classify it
+    (see classify_browser_page for how screen_states are used).
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    driver.get(url)
+    try:
+        WebDriverWait(driver, wait).until(
+            lambda d: "Loading..." not in d.page_source or "/blocked" in d.current_url
+        )
+    except Exception:
+        pass  # Classify whatever rendered before the timeout
+
+    verdict, reason, method = classify_browser_page(driver, screen_states)
+    return {
+        'final_url': driver.current_url,
+        'title': driver.title,
+        'html_length': len(driver.page_source),
+        'verdict': verdict,
+        'reason': reason,
+        'method': method
+    }
+
+
+def fetch_tiered(url, stats, session=None, browser_state=None, store=None, run_id=None):
+    """
+    Fetch a page over HTTP and escalate to the browser only if the verdict is ambiguous.
+    browser_state is a dict holding a lazily started driver shared across calls and
+    optionally 'screen_states'; pass None to disable the browser tier. With a
+    results store both tiers are recorded.
+    """
+    http_result = fetch_page(url, session=session)
+    stats['http']['count'] += 1
+    stats['http']['latencies'].append(http_result['elapsed'])
+
+    verdict, reason, payload = classify_page(http_result['final_url'], http_result['status_code'],
+                                             http_result['text'])
+    result = {
+        'url': url,
+        'tier': 'http',
+        'verdict': verdict,
+        'reason': reason,
+        'status_code': http_result['status_code'],
+        'final_url': http_result['final_url'],
+        'http_elapsed': http_result['elapsed'],
+        'error': http_result['error'],
+        'payload': payload,
+        'browser_result': None
+    }
+    if store is not None:
+        record_fetch(store, run_id, http_result, verdict=verdict)
+
+    if verdict in AMBIGUOUS_VERDICTS and browser_state is not None and not browser_state.get('disabled'):
+        stats['escalations'] += 1
+        try:
+            if browser_state.get('driver') is None:
+                browser_state['driver'] = open_browser()
+                stats['browser']['launches'] += 1
+
+            start_time = time.time()
+            browser_result = browser_fetch(browser_state['driver'], url,
+                                           screen_states=browser_state.get('screen_states'))
+            browser_result['elapsed'] = time.time() - start_time
+
+            stats['browser']['count'] += 1
+            stats['browser']['latencies'].append(browser_result['elapsed'])
+            result.update({'tier': 'browser', 'verdict': browser_result['verdict'],
+                           'reason': browser_result['reason'], 'browser_result': browser_result})
+            if store is not None:
+                record_browser_verdict(store, run_id, url, browser_result['verdict'],
+                                       final_url=browser_result['final_url'], reason=browser_result['reason'],
+                                       elapsed=browser_result['elapsed'], details=browser_result)
+        except ImportError:
+            print("Selenium not available. Install with: pip install selenium")
+            browser_state['disabled'] = True
+        except Exception as e:
+            result['browser_result'] = {'error': str(e)}
+
+    stats['verdicts'][result['verdict']] = stats['verdicts'].get(result['verdict'], 0) + 1
+    return result
+
+
+def summarize_latencies(latencies):
+    """Return count, mean, p50 and p95 for a list of latencies in seconds."""
+    if not latencies:
+        return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0}
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'p50': ordered[len(ordered) // 2],
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    }
+
+
+def run_tiered_sweep(slugs, use_browser=True, resume=False):
+    """
+    Fetch every slug through the tiers and print per-tier counters.
+    With resume=True slugs finished by an interrupted sweep are taken from the journal.
+    """
+    print("TIERED FETCH SWEEP")
+    print("=" * 60)
+    print(f"Slugs: {len(slugs)}")
+    print(f"Browser tier: {'ENABLED' if use_browser else 'DISABLED'}")
+    print("=" * 60)
+
+    stats = new_tier_stats()
+    session = make_session()
+    browser_state = {'screen_states': load_screen_states()} if use_browser else None
+    results = []
+    store = open_store()
+    run_id = start_run(store, 'tiered_fetch', {'slugs': len(slugs), 'use_browser': use_browser, 'resume': resume})
+    journal = open_journal(JOURNAL_PATH, resume=resume)
+    if resume:
+        print_resume_summary(journal, [f"{BASE_URL}/{slug}" for slug in slugs])
+
+    try:
+        for slug in slugs:
+            url = f"{BASE_URL}/{slug}"
+            if is_completed(journal, url):
+                result = journal['completed'][url]
+                results.append(result)
+                stats['verdicts'][result['verdict']] = stats['verdicts'].get(result['verdict'], 0) + 1
+                continue
+
+            journal_start(journal, url)
+            result = fetch_tiered(url, stats, session=session, browser_state=browser_state, store=store,
+                                  run_id=run_id)
+            result.pop('payload', None)
+            results.append(result)
+            if result['error'] or (result['browser_result'] or {}).get('error'):
+                journal_failed(journal, url, result['error'] or result['browser_result']['error'])
+            else:
+                journal_done(journal, url, result)
+            print(f"  /{slug}: {result['verdict'].upper()} via {result['tier']} ({result['reason']})")
+    finally:
+        close_journal(journal)
+        if browser_state and browser_state.get('driver') is not None:
+            browser_state['driver'].quit()
+            save_screen_states(browser_state['screen_states'])
+
+    summary = {
+        'http': summarize_latencies(stats['http']['latencies']),
+        'browser': summarize_latencies(stats['browser']['latencies']),
+        'browser_launches': stats['browser']['launches'],
+        'escalations': stats['escalations'],
+        'escalation_rate': stats['escalations'] / len(slugs) if slugs else 0.0,
+        'verdicts': stats['verdicts']
+    }
+
+    print(f"\nTIER SUMMARY:")
+    for tier in ('http', 'browser'):
+        tier_summary = summary[tier]
+        print(f"  {tier.upper()}: {tier_summary['count']} fetches, "
+              f"mean {tier_summary['mean']:.2f}s, p50 {tier_summary['p50']:.2f}s, p95 {tier_summary['p95']:.2f}s")
+    print(f"  Escalated to browser: {summary['escalations']}/{len(slugs)} ({summary['escalation_rate']:.0%})")
+    print(f"  Verdicts: {summary['verdicts']}")
+
+    with open('tiered_fetch_results.json', 'w', encoding='utf-8') as f:
+        json.dump({'summary': summary, 'results': results, 'timestamp': time.time()}, f, indent=2,
+                  ensure_ascii=False)
+    print(f"\n[SAVE] Results saved to: tiered_fetch_results.json")
+    finish_run(store, run_id)
+
+    return summary
+
+
+if __name__ == "__main__":
+    run_tiered_sweep(load_managed_slugs(), use_browser='--no-browser' not in sys.argv, resume='--resume' in sys.argv)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the crawl, analysis, probe, monitor, browser, vitals and report tools.
+
+    python viewit.py crawl --follow-links --check-assets
+    python viewit.py analyze
+    python viewit.py probe --all
+    python viewit.py monitor --interval 60
+    python viewit.py browser-test --suite js-loader
+    python viewit.py vitals --runs 3
+    python viewit.py report --days 7
+    python viewit.py bench-imports
+
+Each subcommand imports its tool module (and requests, bs4 or Selenium behind
+it) only when it runs, so --help and quick probes never load the browser
+stack. --base-url, --results-db and --http-mode apply to every tool through
+the VIEWIT_* environment variables the modules already read.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Module behind each subcommand; browser-test picks one per suite
+COMMAND_MODULES = {
+    'crawl': 'content_crawler',
+    'analyze': 'rachelirl_analyzer',
+    'probe': 'simple_rachel_test',
+    'monitor': 'synthetic_monitor',
+    'vitals': 'web_vitals',
+    'report': 'rachelirl_final_analysis',
+}
+BROWSER_SUITES = {
+    'full': 'simple_selenium_test',
+    'js-loader': 'rachelirl_js_loader',
+    'local': 'selenium_test_auto',
+}
+BENCH_REPEAT = 5
+
+
+def _optional(args, *names):
+    """Keyword arguments for the options given on the command line, so tool defaults stay in the tools."""
+    return {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+
+
+def cmd_crawl(args):
+    from content_crawler import crawl_rachel_links
+    crawl_rachel_links(profile=args.profile, resume=args.resume, follow_links=args.follow_links,
+                       check_images=args.check_assets, **_optional(args, 'max_depth', 'max_pages'))
+
+
+def cmd_analyze(args):
+    from rachelirl_analyzer import analyze_rachelirl
+    analyze_rachelirl(profile=args.profile)
+
+
+def cmd_probe(args):
+    from simple_rachel_test import probe_rachel_links, test_rachel_link
+    if args.full:
+        test_rachel_link()
+        return
+    endpoints = None
+    if args.all:
+        from fetcher import load_managed_slugs
+        endpoints = [f"/{slug}" for slug in load_managed_slugs()]
+    probe_rachel_links(endpoints, scan=not args.no_scan, **_optional(args, 'max_bytes'))
+
+
+def cmd_monitor(args):
+    from fetcher import load_managed_slugs
+    from synthetic_monitor import run_monitor
+    run_monitor(args.slugs or load_managed_slugs(), record=args.record,
+                **_optional(args, 'interval', 'port', 'rounds'))
+
+
+def cmd_browser_test(args):
+    try:
+        if args.suite == 'full':
+            from simple_selenium_test import main
+        elif args.suite == 'js-loader':
+            from rachelirl_js_loader import main
+        else:
+            from selenium_test_auto import test_bot_protection as main
+    except ImportError as e:
+        print(f"{e.name} not available. Install with: pip install selenium webdriver-manager")
+        sys.exit(1)
+    main()
+
+
+def cmd_vitals(args):
+    from web_vitals import capture_slugs, report_timings
+    if args.report:
+        report_timings(args.days, args.slugs)
+        return
+    from fetcher import load_managed_slugs
+    capture_slugs(args.slugs or load_managed_slugs(), runs=args.runs, headless=not args.visible)
+
+
+def cmd_report(args):
+    from rachelirl_final_analysis import analyze_rachelirl_findings, generate_audit_report
+    print("VIEWIT AUDIT REPORT")
+    print("=" * 60)
+    generate_audit_report(rebuild=args.rebuild, **_optional(args, 'days'))
+    if args.rachelirl_files:
+        analyze_rachelirl_findings()
+
+
+def _time_command(code, repeat):
+    """Best wall time of a fresh interpreter running code, or None if it fails."""
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-c', code], capture_output=True, cwd=os.path.dirname(__file__) or '.')
+        elapsed = time.perf_counter() - start_time
+        if completed.returncode != 0:
+            return None
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def cmd_bench_imports(args):
+    """Startup cost of each subcommand: a fresh interpreter importing the CLI plus that tool."""
+    print("IMPORT-TIME BENCHMARK")
+    print("=" * 60)
+    baseline = _time_command('pass', args.repeat)
+    print(f"Bare interpreter: {baseline * 1000:.0f} ms (subtracted below; best of {args.repeat})\n")
+
+    targets = [('--help', 'import viewit')]
+    targets += [(command, f'import viewit, {module}') for command, module in COMMAND_MODULES.items()]
+    targets += [(f'browser-test --suite {suite}', f'import viewit, {module}') for suite, module in BROWSER_SUITES.items()]
+    targets.append(('(before: eager Selenium import)', 'import selenium.webdriver, webdriver_manager.chrome'))
+
+    results = {}
+    for label, code in targets:
+        elapsed = _time_command(code, args.repeat)
+        results[label] = None if elapsed is None else elapsed - baseline
+        shown = 'not installed' if elapsed is None else f"{(elapsed - baseline) * 1000:7.0f} ms"
+        print(f"   {label:<36} {shown:>14}")
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='viewit', description="ViewIt crawl, analysis and protection tools.")
+    parser.add_argument('--base-url', help="origin to test (sets VIEWIT_BASE_URL)")
+    parser.add_argument('--results-db', help="results store path (sets VIEWIT_RESULTS_DB)")
+    parser.add_argument('--http-mode', choices=['record', 'replay'], help="record or replay HTTP (sets VIEWIT_HTTP_MODE)")
+    parser.add_argument('--http-archive', help="archive for --http-mode (sets VIEWIT_HTTP_ARCHIVE)")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    crawl = subcommands.add_parser('crawl', help="crawl pages and extract their content")
+    crawl.add_argument('--profile', action='store_true', help="profile each page's parse/extract")
+    crawl.add_argument('--resume', action='store_true', help="skip pages an interrupted run already crawled")
+    crawl.add_argument('--follow-links', action='store_true', help="also crawl on-site links found on each page")
+    crawl.add_argument('--max-depth', type=int, help="link hops from the start pages")
+    crawl.add_argument('--max-pages', type=int, help="stop after this many pages")
+    crawl.add_argument('--check-assets', action='store_true', help="check every distinct image once after the crawl")
+    crawl.set_defaults(handler=cmd_crawl)
+
+    analyze = subcommands.add_parser('analyze', help="deep analysis of the rachelirl page")
+    analyze.add_argument('--profile', action='store_true', help="profile the parse/analysis step")
+    analyze.set_defaults(handler=cmd_analyze)
+
+    probe = subcommands.add_parser('probe', help="HEAD/ranged probes: status, redirects and indicators")
+    probe.add_argument('--all', action='store_true', help="probe every managed slug from middleware.ts")
+    probe.add_argument('--no-scan', action='store_true', help="skip the indicator scan (HEAD requests only)")
+    probe.add_argument('--max-bytes', type=int, help="body prefix to scan for indicators")
+    probe.add_argument('--full', action='store_true', help="full GETs of the rachel pages instead of probes")
+    probe.set_defaults(handler=cmd_probe)
+
+    monitor = subcommands.add_parser('monitor', help="probe slugs on a schedule and serve rolling latency stats")
+    monitor.add_argument('--interval', type=int, help="seconds between probe rounds")
+    monitor.add_argument('--port', type=int, help="status endpoint port (0 to disable)")
+    monitor.add_argument('--rounds', type=int, help="stop after this many rounds")
+    monitor.add_argument('--record', action='store_true', help="also store every probe in the results store")
+    monitor.add_argument('--slugs', nargs='+', help="slugs to monitor (default: managed slugs)")
+    monitor.set_defaults(handler=cmd_monitor)
+
+    browser = subcommands.add_parser('browser-test', help="Selenium bot-protection checks")
+    browser.add_argument('--suite', choices=list(BROWSER_SUITES), default='full',
+                         help="full: single + multi-page test; js-loader: rachelirl JS loading; local: dev server")
+    browser.set_defaults(handler=cmd_browser_test)
+
+    vitals = subcommands.add_parser('vitals', help="Navigation Timing / Web Vitals and protection-path cost per slug")
+    vitals.add_argument('--runs', type=int, default=1, help="captures per slug")
+    vitals.add_argument('--visible', action='store_true', help="use a visible browser window")
+    vitals.add_argument('--report', action='store_true', help="only report stored captures")
+    vitals.add_argument('--days', type=int, default=30, help="window for --report")
+    vitals.add_argument('--slugs', nargs='+', help="slugs to capture (default: managed slugs)")
+    vitals.set_defaults(handler=cmd_vitals)
+
+    report = subcommands.add_parser('report', help="audit report from the results store")
+    report.add_argument('--days', type=int, help="window for newly blocked slugs")
+    report.add_argument('--rebuild', action='store_true', help="recompute slug summaries from raw history")
+    report.add_argument('--rachelirl-files', action='store_true', help="also print the legacy rachelirl file analysis")
+    report.set_defaults(handler=cmd_report)
+
+    bench = subcommands.add_parser('bench-imports', help="measure each subcommand's import time")
+    bench.add_argument('--repeat', type=int, default=BENCH_REPEAT, help="runs per measurement (best is kept)")
+    bench.set_defaults(handler=cmd_bench_imports)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    for option, variable in (('base_url', 'VIEWIT_BASE_URL'), ('results_db', 'VIEWIT_RESULTS_DB'),
+                             ('http_mode', 'VIEWIT_HTTP_MODE'), ('http_archive', 'VIEWIT_HTTP_ARCHIVE')):
+        if getattr(args, option):
+            os.environ[variable] = getattr(args, option)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Navigation Timing and Web Vitals capture for browser runs.
+The Selenium checks only say whether a bot was blocked; this measures what
+the protection flow (redirects such as /human-check, the BotD loading spinner,
+then hydration of the real content) costs a visitor. An observer installed
+before navigation (Chrome DevTools Page.addScriptToEvaluateOnNewDocument)
+notes when the spinner goes away; after the page settles, one async script
+call per page returns Navigation Timing, paint entries, LCP and CLS.
+
+Per capture (milliseconds from the final document's navigation start):
+    protection = time spent in earlier documents (client-side redirects)
+               + server redirects + time the loading spinner was on screen
+Earlier documents are counted only when the observer saw them: each document
+it starts in appends its URL and timeOrigin to sessionStorage, so the cost is
+the gap between the first and the final document, both on the browser clock.
+    direct     = time to content minus protection, i.e. roughly when the page
+                 would have shown its content without the protection flow
+Captures go to the results store, so reports aggregate per slug across runs.
+
+    python web_vitals.py --runs 3              # capture managed slugs (headless)
+    python web_vitals.py --visible rachelirl   # real browser window, like the Selenium tests
+    python web_vitals.py --report --days 30
+"""
+
+import argparse
+import json
+import time
+
+from fetcher import BASE_URL, USER_AGENT, load_managed_slugs
+from results_store import finish_run, open_store, page_timings, record_page_timing, start_run
+
+SPINNER_SELECTOR = '.animate-spin'
+CAPTURE_TIMEOUT = 15  # Seconds to wait for the spinner to go away before capturing anyway
+DOCUMENTS_KEY = '__viewitDocs'  # sessionStorage list of the documents the observer started in
+CLOCK_SLACK_MS = 50  # Documents start in other renderer processes; allow for their clocks differing a little
+
+# Runs at the start of every document: LCP/CLS observers and the spinner-gone mark
+OBSERVER_SCRIPT = """
+(() => {
+  if (window.__viewitTiming) return;
+  const t = window.__viewitTiming = {lcp: null, cls: 0, contentReady: null, spinnerSeen: false};
+  if (window.top === window) {
+    try {
+      const docs = JSON.parse(sessionStorage.getItem('%s') || '[]');
+      docs.push({url: location.href, timeOrigin: performance.timeOrigin});
+      sessionStorage.setItem('%s', JSON.stringify(docs.slice(-10)));
+    } catch (e) {}
+  }
+  try {
+    new PerformanceObserver((list) => {
+      for (const e of list.getEntries()) t.lcp = e.renderTime || e.loadTime || e.startTime;
+    }).observe({type: 'largest-contentful-paint', buffered: true});
+    new PerformanceObserver((list) => {
+      for (const e of list.getEntries()) if (!e.hadRecentInput) t.cls += e.value;
+    }).observe({type: 'layout-shift', buffered: true});
+  } catch (e) {}
+  const check = () => {
+    if (document.querySelector('%s')) {
+      t.spinnerSeen = true;
+      t.contentReady = null;
+    } else if (t.contentReady === null && document.body && document.body.children.length) {
+      t.contentReady = performance.now();
+    }
+  };
+  new MutationObserver(check).observe(document, {childList: true, subtree: true});
+})();
+""" % (DOCUMENTS_KEY, DOCUMENTS_KEY, SPINNER_SELECTOR)
+
+# One call per page: waits (up to arguments[0] ms) for the spinner to go, then returns everything
+CAPTURE_SCRIPT = """
+const timeout = arguments[0];
+const done = arguments[arguments.length - 1];
+const t = window.__viewitTiming || {lcp: null, cls: 0, contentReady: null, spinnerSeen: false, missing: true};
+if (t.missing) {
+  // No early observer (not Chrome): buffered entries still give LCP and CLS
+  try {
+    new PerformanceObserver((list) => {
+      for (const e of list.getEntries()) t.lcp = e.renderTime || e.loadTime || e.startTime;
+    }).observe({type: 'largest-contentful-paint', buffered: true});
+    new PerformanceObserver((list) => {
+      for (const e of list.getEntries()) if (!e.hadRecentInput) t.cls += e.value;
+    }).observe({type: 'layout-shift', buffered: true});
+  } catch (e) {}
+}
+const started = performance.now();
+let documents = [];
+try { documents = JSON.parse(sessionStorage.getItem('%s') || '[]'); } catch (e) {}
+const finish = () => {
+  const nav = performance.getEntriesByType('navigation')[0] || {};
+  const paints = {};
+  for (const p of performance.getEntriesByType('paint')) paints[p.name] = p.startTime;
+  const spinner = !!document.querySelector('%s');
+  done({
+    url: location.href,
+    timeOrigin: performance.timeOrigin,
+    type: nav.type || null,
+    redirectCount: nav.redirectCount || 0,
+    redirect: nav.redirectEnd ? nav.redirectEnd - nav.redirectStart : 0,
+    dns: nav.domainLookupEnd - nav.domainLookupStart,
+    connect: nav.connectEnd - nav.connectStart,
+    ttfb: nav.responseStart,
+    response: nav.responseEnd - nav.responseStart,
+    domContentLoaded: nav.domContentLoadedEventEnd,
+    load: nav.loadEventEnd,
+    transferSize: nav.transferSize,
+    fp: paints['first-paint'] ?? null,
+    fcp: paints['first-contentful-paint'] ?? null,
+    lcp: t.lcp,
+    cls: t.cls,
+    contentReady: spinner ? null : t.contentReady,
+    spinnerSeen: t.spinnerSeen || spinner,
+    spinnerStillShown: spinner,
+    earlyObserver: !t.missing,
+    documents: documents
+  });
+};
+const poll = () => {
+  const spinner = document.querySelector('%s');
+  if ((!spinner && (t.missing || t.contentReady !== null)) || performance.now() - started > timeout) {
+    requestAnimationFrame(() => setTimeout(finish, 0));  // Let the frame that shows content paint
+  } else {
+    setTimeout(poll, 50);
+  }
+};
+poll();
+""" % (DOCUMENTS_KEY, SPINNER_SELECTOR, SPINNER_SELECTOR)
+
+
+def open_capture_browser(headless=True):
+    """Chrome with the same anti-automation options as the Selenium tests."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument(f'--user-agent={USER_AGENT}')
+    if headless:
+        chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    driver = webdriver.Chrome(options=chrome_options)
+    install_timing_observer(driver)
+    return driver
+
+
+def install_timing_observer(driver):
+    """Register the observer for every document this driver loads; False where DevTools is unavailable."""
+    try:
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': OBSERVER_SCRIPT})
+        return True
+    except Exception:
+        return False
+
+
+def _start_navigation(driver):
+    """
+    Clear the document list (when the current page shares the target's origin)
+    and return the browser clock now, so documents from earlier captures are ignored.
+    """
+    return driver.execute_script(
+        "try { sessionStorage.removeItem(arguments[0]); } catch (e) {}"
+        "return performance.timeOrigin + performance.now();", DOCUMENTS_KEY)
+
+
+def _earlier_documents(raw, navigation_start):
+    """Time from the first document of this navigation to the final one; 0 when only one was seen."""
+    documents = [doc for doc in raw.get('documents') or []
+                 if doc['timeOrigin'] >= navigation_start - CLOCK_SLACK_MS]
+    if len(documents) < 2:
+        return 0.0
+    return max(0.0, raw['timeOrigin'] - documents[0]['timeOrigin'])
+
+
+def capture_page_timing(driver, url, timeout=CAPTURE_TIMEOUT):
+    """
+    Load url and return its timing dict (milliseconds; see the module docstring for the derived fields).
+    Raises TimeoutError if the capture script does not finish in time.
+    """
+    from selenium.common.exceptions import TimeoutException
+
+    driver.set_script_timeout(timeout + 5)
+    navigation_start = _start_navigation(driver)
+    started = time.monotonic()
+    driver.get(url)
+    try:
+        raw = driver.execute_async_script(CAPTURE_SCRIPT, timeout * 1000)
+    except TimeoutException:
+        raise TimeoutError(f"timing capture for {url} did not finish within {timeout + 5}s")
+    except Exception:
+        # The page navigated away mid-capture (e.g. BotD sending us to /blocked): measure the new
+        # document with whatever is left of the timeout
+        remaining = max(0.0, timeout - (time.monotonic() - started))
+        try:
+            raw = driver.execute_async_script(CAPTURE_SCRIPT, remaining * 1000)
+        except TimeoutException:
+            raise TimeoutError(f"timing capture for {url} did not finish within {timeout + 5}s")
+
+    earlier_documents = _earlier_documents(raw, navigation_start)
+    # With a spinner, content is ready when it goes away; without one, at the largest paint
+    if raw['spinnerSeen']:
+        content_ready = raw['contentReady']
+    else:
+        content_ready = raw['lcp'] if raw['lcp'] is not None else raw['contentReady']
+    spinner = content_ready - raw['fcp'] if raw['spinnerSeen'] and None not in (content_ready, raw['fcp']) else 0.0
+    protection = earlier_documents + raw['redirect'] + spinner
+    time_to_content = earlier_documents + content_ready if content_ready is not None else None
+
+    return {
+        'url': url,
+        'final_url': raw['url'],
+        'blocked': '/blocked' in raw['url'],
+        'ttfb': raw['ttfb'],
+        'fcp': raw['fcp'],
+        'lcp': raw['lcp'],
+        'cls': raw['cls'],
+        'content_ready': content_ready,
+        'spinner': spinner,
+        'redirect': raw['redirect'],
+        'earlier_documents': earlier_documents,
+        'protection': protection if content_ready is not None else None,
+        'time_to_content': time_to_content,
+        'direct': time_to_content - protection if time_to_content is not None else None,
+        'raw': raw
+    }
+
+
+def _percentile(values, fraction):
+    ordered = sorted(value for value in values if value is not None)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize_timings(rows):
+    """Per-slug medians and p75s over timing rows from the results store; blocked captures are counted apart."""
+    by_slug = {}
+    for row in rows:
+        details = json.loads(row['details'])
+        entry = by_slug.setdefault(row['slug'], {'captures': 0, 'blocked': 0, 'samples': []})
+        entry['captures'] += 1
+        if details.get('blocked'):
+            entry['blocked'] += 1
+        else:
+            entry['samples'].append(details)
+
+    summary = {}
+    for slug, entry in by_slug.items():
+        samples = entry['samples']
+        stats = {'captures': entry['captures'], 'blocked': entry['blocked']}
+        for metric in ('ttfb', 'fcp', 'lcp', 'cls', 'time_to_content', 'protection', 'direct', 'spinner',
+                       'earlier_documents'):
+            values = [sample.get(metric) for sample in samples]
+            stats[metric] = _percentile(values, 0.5)
+            stats[f'{metric}_p75'] = _percentile(values, 0.75)
+        summary[slug] = stats
+    return summary
+
+
+def _ms(value):
+    return f"{value:7.0f}" if value is not None else "      -"
+
+
+def print_timing_report(summary):
+    print(f"\nPROTECTION PATH COST PER SLUG (medians in ms over unblocked captures):")
+    print(f"   {'slug':<24} {'runs':>4} {'TTFB':>7} {'FCP':>7} {'LCP':>7} {'CLS':>6} "
+          f"{'content':>7} {'direct':>7} {'added':>7}")
+    ordered = sorted(summary.items(), key=lambda item: -(item[1]['protection'] or 0))
+    for slug, stats in ordered:
+        runs = f"{stats['captures'] - stats['blocked']}/{stats['captures']}"
+        cls = f"{stats['cls']:6.3f}" if stats['cls'] is not None else "     -"
+        print(f"   /{slug:<23} {runs:>4} {_ms(stats['ttfb'])} {_ms(stats['fcp'])} {_ms(stats['lcp'])} {cls} "
+              f"{_ms(stats['time_to_content'])} {_ms(stats['direct'])} {_ms(stats['protection'])}")
+
+    measured = [stats for stats in summary.values() if stats['protection'] is not None]
+    if measured:
+        added = _percentile([stats['protection'] for stats in measured], 0.5)
+        content = _percentile([stats['time_to_content'] for stats in measured], 0.5)
+        print(f"\n   Across {len(measured)} slugs the protection path adds a median {added:.0f} ms "
+              f"({added / content:.0%} of the {content:.0f} ms to content)")
+    blocked = sum(stats['blocked'] for stats in summary.values())
+    if blocked:
+        print(f"   {blocked} captures ended on /blocked (bot path) and are left out of the timings")
+
+
+def capture_slugs(slugs, runs=1, headless=True, base_url=BASE_URL):
+    """Capture every slug `runs` times, store each capture and print the per-slug report."""
+    print("WEB VITALS CAPTURE")
+    print("=" * 60)
+    print(f"Slugs: {len(slugs)}, runs: {runs}, browser: {'headless' if headless else 'visible'}")
+    print("=" * 60)
+
+    store = open_store()
+    run_id = start_run(store, 'web_vitals', {'slugs': len(slugs), 'runs': runs, 'headless': headless})
+    try:
+        driver = open_capture_browser(headless)
+    except ImportError:
+        print("Selenium not available. Install with: pip install selenium")
+        return None
+
+    try:
+        for round_number in range(runs):
+            for slug in slugs:
+                url = f"{base_url.rstrip('/')}/{slug}"
+                try:
+                    timing = capture_page_timing(driver, url)
+                except Exception as e:
+                    print(f"   /{slug}: ERROR {e}")
+                    continue
+                record_page_timing(store, run_id, url, timing, slug=slug)
+                if timing['blocked']:
+                    print(f"   /{slug}: BLOCKED (redirected to {timing['final_url']})")
+                else:
+                    print(f"   /{slug}: content {_ms(timing['time_to_content']).strip()} ms, "
+                          f"protection {_ms(timing['protection']).strip()} ms, LCP {_ms(timing['lcp']).strip()} ms")
+    finally:
+        driver.quit()
+        finish_run(store, run_id)
+
+    summary = summarize_timings(page_timings(store, since=time.time() - 86400 * 30))
+    print_timing_report({slug: summary[slug] for slug in slugs if slug in summary})
+    print(f"\n[SAVE] Timings stored in the results store (run {run_id})")
+    return summary
+
+
+def report_timings(days=30, slugs=None):
+    store = open_store()
+    summary = summarize_timings(page_timings(store, since=time.time() - days * 86400))
+    print("WEB VITALS REPORT")
+    print("=" * 60)
+    print(f"Captures from the last {days} days")
+    if slugs:
+        summary = {slug: summary[slug] for slug in slugs if slug in summary}
+    if not summary:
+        print("   No timing captures yet. Run: python web_vitals.py --runs 3")
+        return summary
+    print_timing_report(summary)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capture Navigation Timing and Web Vitals per slug.")
+    parser.add_argument('slugs', nargs='*', help="slugs to capture (default: managed slugs)")
+    parser.add_argument('--runs', type=int, default=1, help="captures per slug")
+    parser.add_argument('--visible', action='store_true', help="use a visible browser window")
+    parser.add_argument('--report', action='store_true', help="only print the per-slug report from stored captures")
+    parser.add_argument('--days', type=int, default=30, help="window for --report")
+    args = parser.parse_args()
+
+    if args.report:
+        report_timings(args.days, args.slugs)
+    else:
+        capture_slugs(args.slugs or load_managed_slugs(), runs=args.runs, headless=not args.visible)